@@ -0,0 +1,203 @@
+"""
+質問のJSONLファイルをパイプライン（検索 → 取得 → プロンプト生成 → 応答生成）で
+一括処理するバッチ実行用のエントリーポイント。
+
+入力の各行は {"id": ..., "query": "..."}（id は省略可、省略時は行番号）または
+質問文字列のJSON。結果は質問が完了するたびに出力ファイルへ1行ずつ追記し、
+再実行時は出力ファイルに成功済みの結果がある質問を読み飛ばして再開する。
+
+使い方:
+    uv run batch.py queries.jsonl results.jsonl --concurrency 8 --fetch-concurrency 4
+
+質問の id はログのトレースIDとして使われる。--metrics-output を指定すると、
+終了時にステージ・クローラー・キャッシュのメトリクスをPrometheusのテキスト形式で保存する。
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Set
+
+from main import configure_observability, create_pipeline
+from src.instrumentation import render_prometheus
+from src.pipeline import STAGES, Pipeline
+
+
+def read_queries(path: Path) -> Iterator[Dict[str, Any]]:
+    """入力ファイルから質問を1件ずつ読み込む"""
+    with path.open("r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"query": record}
+            record.setdefault("id", line_number)
+            yield record
+
+
+def load_completed(path: Path) -> Set[str]:
+    """出力ファイルから成功済みの質問のIDを読み込む（途中で切れた行は無視）"""
+    completed: Set[str] = set()
+    if not path.exists():
+        return completed
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not record.get("error"):
+                completed.add(str(record.get("id")))
+    return completed
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近傍順位法によるパーセンタイル"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class BatchRunner:
+    """質問をワーカーで並列に処理し、完了した順に結果を書き出す"""
+
+    def __init__(self, pipeline: Pipeline, output: Path, concurrency: int):
+        self.pipeline = pipeline
+        self.output = output
+        self.concurrency = concurrency
+        self.timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self.latencies: List[float] = []
+        self.succeeded = 0
+        self.failed = 0
+
+    async def _worker(self, queue: asyncio.Queue, out):
+        while True:
+            record = await queue.get()
+            if record is None:
+                return
+            start = time.perf_counter()
+            result = await self.pipeline.answer(
+                record["query"], trace_id=str(record["id"])
+            )
+            latency = time.perf_counter() - start
+
+            self.latencies.append(latency)
+            for stage, seconds in result.timings.items():
+                self.timings[stage].append(seconds)
+            if result.error:
+                # エラー内容は質問の id をトレースIDとしてパイプラインがログに出力する
+                self.failed += 1
+            else:
+                self.succeeded += 1
+
+            # 質問が完了するたびに追記する（途中で停止しても完了分は残る）
+            out.write(
+                json.dumps(
+                    {"id": record["id"], **result.to_dict(), "latency": latency},
+                    ensure_ascii=False,
+                )
+                + "\n"
+            )
+            out.flush()
+            done = self.succeeded + self.failed
+            if done % 10 == 0:
+                print(f"{done}件完了（失敗 {self.failed}件）")
+
+    async def run(self, records: Iterator[Dict[str, Any]], completed: Set[str]):
+        """未完了の質問をすべて処理する"""
+        # キューの長さを制限し、入力ファイル全体をメモリに読み込まないようにする
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        with self.output.open("a", encoding="utf-8") as out:
+            # 前回の実行が行の途中で止まっていた場合は改行してから追記する
+            if out.tell() > 0 and not self.output.read_bytes().endswith(b"\n"):
+                out.write("\n")
+            workers = [
+                asyncio.create_task(self._worker(queue, out))
+                for _ in range(self.concurrency)
+            ]
+            skipped = 0
+            for record in records:
+                if str(record["id"]) in completed:
+                    skipped += 1
+                    continue
+                await queue.put(record)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        if skipped:
+            print(f"完了済みの{skipped}件を読み飛ばしました")
+
+    def report(self, elapsed: float) -> str:
+        """スループットとステージごとのレイテンシのパーセンタイル"""
+        done = self.succeeded + self.failed
+        lines = [
+            f"処理件数: {done}（成功 {self.succeeded} / 失敗 {self.failed}）",
+            f"経過時間: {elapsed:.1f}秒 / スループット: {done / elapsed * 60:.1f} 件/分"
+            if elapsed > 0
+            else f"経過時間: {elapsed:.1f}秒",
+            f"{'stage':<10} {'p50':>8} {'p95':>8} {'p99':>8} {'n':>6}",
+        ]
+        for name, values in [*self.timings.items(), ("total", self.latencies)]:
+            lines.append(
+                f"{name:<10} {percentile(values, 50):>8.2f} {percentile(values, 95):>8.2f} "
+                f"{percentile(values, 99):>8.2f} {len(values):>6}"
+            )
+        return "\n".join(lines)
+
+
+async def run_batch(args: argparse.Namespace):
+    configure_observability(args.log_format, metrics=args.metrics_output is not None)
+    completed = load_completed(args.output)
+    pipeline = create_pipeline(
+        stage_concurrency={
+            "search": args.search_concurrency,
+            "fetch": args.fetch_concurrency,
+            "prompt": args.prompt_concurrency,
+            "generate": args.generate_concurrency,
+        },
+        verbose=args.verbose,
+    )
+    runner = BatchRunner(pipeline, args.output, args.concurrency)
+    start = time.perf_counter()
+    try:
+        await runner.run(read_queries(args.input), completed)
+    finally:
+        await pipeline.close()
+    print(f"\n{runner.report(time.perf_counter() - start)}")
+    if args.metrics_output is not None:
+        args.metrics_output.write_text(render_prometheus(), encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input", type=Path, help="質問のJSONLファイル")
+    parser.add_argument("output", type=Path, help="結果を追記するJSONLファイル")
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="同時に処理する質問数"
+    )
+    parser.add_argument("--search-concurrency", type=int, default=3)
+    parser.add_argument("--fetch-concurrency", type=int, default=4)
+    parser.add_argument("--prompt-concurrency", type=int, default=4)
+    parser.add_argument("--generate-concurrency", type=int, default=4)
+    parser.add_argument("--verbose", action="store_true", help="質問ごとの進捗を表示")
+    parser.add_argument(
+        "--log-format", choices=["text", "json", "plain"], default="text"
+    )
+    parser.add_argument(
+        "--metrics-output",
+        type=Path,
+        help="メトリクスを保存するファイル（Prometheus形式）",
+    )
+    asyncio.run(run_batch(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/bench_extraction.py
+"""
+HTML本文抽出のマイクロベンチマーク。
+
+保存済みページのコーパス（*.html）に対して、従来の XPath（//body//text()）による
+抽出と src.extraction.extract_content を比較し、処理速度（入力文字数/秒）と
+メモリ使用量を表示する。各手法は別プロセスで実行し、最大RSSの増加量を計測する。
+
+使い方:
+    python benchmarks/bench_extraction.py --corpus path/to/pages --max-chars 1000
+"""
+
+import argparse
+import multiprocessing
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.extraction import extract_content  # noqa: E402
+
+DEFAULT_CORPUS_DIR = Path(__file__).resolve().parent / "corpus"
+
+
+def xpath_extract(html: str, max_chars: int) -> str:
+    """従来のContentSpider.parseと同じXPathによる抽出"""
+    from parsel import Selector
+
+    selector = Selector(text=html)
+    texts = selector.xpath("//body//text()").getall()
+    cleaned_text = [text.strip() for text in texts if text.strip()]
+    return "\n".join(cleaned_text)[:max_chars]
+
+
+def lxml_extract(html: str, max_chars: int) -> str:
+    """src.extraction による抽出"""
+    return extract_content(html, max_chars=max_chars).text
+
+
+METHODS = {"xpath": xpath_extract, "extract_content": lxml_extract}
+
+
+def generate_corpus(count: int = 50, seed: int = 0) -> list[str]:
+    """コーパスがない場合に使う合成ページ（ナビ・スクリプト・本文を含む）"""
+    rng = random.Random(seed)
+    words = ["検索", "結果", "content", "page", "データ", "example", "記事", "text"]
+    pages = []
+    for _ in range(count):
+        nav = "".join(f"<li><a href='#'>menu {i}</a></li>" for i in range(50))
+        script = "<script>" + "var x = 1;" * 2000 + "</script>"
+        paragraphs = "".join(
+            "<p>" + " ".join(rng.choice(words) for _ in range(80)) + "</p>"
+            for _ in range(rng.randint(20, 200))
+        )
+        pages.append(
+            f"<html><head><title>t</title>{script}</head><body>"
+            f"<nav><ul>{nav}</ul></nav><main><article>{paragraphs}</article></main>"
+            f"<footer>{nav}</footer></body></html>"
+        )
+    return pages
+
+
+def load_corpus(corpus_dir: Path) -> list[str]:
+    """コーパスディレクトリから保存済みページを読み込む"""
+    if not corpus_dir.is_dir():
+        return []
+    return [
+        path.read_text(encoding="utf-8", errors="replace")
+        for path in sorted(corpus_dir.glob("*.html"))
+    ]
+
+
+def run_method(name: str, pages: list[str], max_chars: int, repeat: int, queue):
+    """1つの手法を計測して結果をキューに入れる（別プロセスで実行）"""
+    method = METHODS[name]
+    method(pages[0], max_chars)  # ウォームアップ（遅延インポートを含む）
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    output_chars = 0
+    for _ in range(repeat):
+        for page in pages:
+            output_chars += len(method(page, max_chars))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put(
+        {
+            "elapsed": elapsed,
+            "output_chars": output_chars,
+            "python_peak_kb": peak / 1024,
+            "rss_growth_kb": rss_after - rss_before,
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--max-chars", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        print(f"コーパスが見つからないため合成ページを使用します: {args.corpus}")
+        pages = generate_corpus()
+    input_chars = sum(len(page) for page in pages) * args.repeat
+    print(
+        f"ページ数: {len(pages)} / 入力: {input_chars:,} 文字 / max_chars: {args.max_chars}\n"
+    )
+
+    context = multiprocessing.get_context("spawn")
+    print(
+        f"{'method':<16} {'chars/sec':>14} {'ms/page':>9} {'py peak KB':>11} {'RSS +KB':>9}"
+    )
+    for name in METHODS:
+        queue = context.Queue()
+        process = context.Process(
+            target=run_method, args=(name, pages, args.max_chars, args.repeat, queue)
+        )
+        process.start()
+        result = queue.get()
+        process.join()
+
+        per_page_ms = result["elapsed"] * 1000 / (len(pages) * args.repeat)
+        print(
+            f"{name:<16} {input_chars / result['elapsed']:>14,.0f} {per_page_ms:>9.2f} "
+            f"{result['python_peak_kb']:>11,.0f} {result['rss_growth_kb']:>9,}"
+        )
+
+
+if __name__ == "__main__":
+    main()
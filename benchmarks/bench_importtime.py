@@ -0,0 +1,93 @@
+# benchmarks/bench_importtime.py
+"""
+モジュールのインポート時間のベンチマーク。
+
+各モジュールを `python -X importtime` の新しいプロセスでインポートし、
+累積インポート時間の中央値と、自身のインポート時間が大きいモジュールを表示する。
+選択したクローラー以外のバックエンド（Scrapy/Twisted）が読み込まれないことは
+tests/test_importtime.py で確認する。
+
+使い方:
+    python benchmarks/bench_importtime.py --repeat 5 --max-ms 500
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_MODULES = [
+    "main",
+    "src.pipeline",
+    "src.web_search",
+    "src.crawlers.crawler_factory",
+]
+
+
+def _run(code: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    """リポジトリのルートで新しいPythonプロセスを実行する"""
+    # インポート時に環境変数に依存しないことも確認するため、Bingの設定は外す
+    env = {k: v for k, v in os.environ.items() if not k.startswith("BING_SEARCH_V7")}
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    return subprocess.run(
+        command + ["-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """-X importtime の出力を モジュール名 -> (自身の時間, 累積時間)（マイクロ秒）にする"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure(module: str, repeat: int) -> tuple[float, dict[str, tuple[int, int]]]:
+    """モジュールの累積インポート時間の中央値（ミリ秒）と最後の計測の内訳"""
+    samples = []
+    timings = {}
+    for _ in range(repeat):
+        timings = parse_importtime(_run(f"import {module}", importtime=True).stderr)
+        samples.append(timings[module][1] / 1000)
+    return statistics.median(samples), timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="内訳を表示するモジュール数")
+    parser.add_argument(
+        "--max-ms", type=float, help="これを超えるモジュールがあれば終了コード1"
+    )
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<32} {'median ms':>10}")
+    for module in args.modules:
+        median_ms, timings = measure(module, args.repeat)
+        over = args.max_ms is not None and median_ms > args.max_ms
+        failed |= over
+        print(f"{module:<32} {median_ms:>10.1f}{'  (上限超過)' if over else ''}")
+        heaviest = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)
+        for name, (self_us, _) in heaviest[: args.top]:
+            print(f"    {name:<28} {self_us / 1000:>10.1f}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+# benchmarks/bench_pipeline.py
+"""
+パイプライン全体（検索 → 取得 → プロンプト生成 → 応答生成）のベンチマーク。
+
+Bing・Firecrawl・OpenAI・静的サイト群をローカルのスタンドイン（fake_services.py）で
+置き換え、main.py の設定のパイプラインを指定した同時実行数で実行する。
+キャッシュが空の状態（cold）と、同じ質問を再実行した状態（warm）それぞれについて、
+スループット、ステージごとの p50/p95/p99、最大RSSを表示する。
+
+--output で結果をJSONに保存し、--baseline で以前の結果と比較できる
+（スループットの低下または total の p95 の悪化が --max-regression を超えたら終了コード1）。
+
+使い方:
+    python benchmarks/bench_pipeline.py --queries 50 --concurrency 8 --crawler aiohttp
+    python benchmarks/bench_pipeline.py --output base.json
+    python benchmarks/bench_pipeline.py --baseline base.json --max-regression 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main as app  # noqa: E402
+from batch import BatchRunner, percentile  # noqa: E402
+from fake_services import ServiceConfig, start_in_subprocess  # noqa: E402
+from src.instrumentation import configure_logging  # noqa: E402
+from src.pipeline import STAGES, Pipeline  # noqa: E402
+from src.web_search import BingConfig, BingSearchCache  # noqa: E402
+
+PHASES = ("cold", "warm")
+
+
+def create_pipeline(
+    args: argparse.Namespace, api_port: int, cache_dir: Path
+) -> Pipeline:
+    """スタンドインを向き、キャッシュを一時ディレクトリに置いたパイプラインを生成"""
+    base_url = f"http://127.0.0.1:{api_port}"
+    crawler_config = {
+        **app.CRAWLER_CONFIG,
+        "api_url": f"{base_url}/v1/scrape",
+        "delay": args.delay,
+        "content_cache_dir": cache_dir / "content",
+    }
+    return Pipeline(
+        crawler_type=args.crawler,
+        crawler_config=crawler_config,
+        fetch_config=app.PIPELINE_CONFIG,
+        ranking_config=app.RANKING_CONFIG,
+        prompt_config=app.PROMPT_CONFIG,
+        dedup_config={
+            **app.DEDUP_CONFIG,
+            "index_path": cache_dir / "content" / "simhash_index.sqlite",
+        },
+        openai_api_key="bench",
+        openai_api_url=f"{base_url}/v1/chat/completions",
+        bing_config=BingConfig(
+            subscription_key="bench", endpoint=f"{base_url}/", qps=args.bing_qps
+        ),
+        bing_cache=BingSearchCache(cache_dir=cache_dir / "bing_search"),
+        stage_concurrency={stage: args.stage_concurrency for stage in STAGES},
+        answer_cache_config={
+            **app.ANSWER_CACHE_CONFIG,
+            "enabled": not args.no_answer_cache,
+            "cache_dir": cache_dir / "answers",
+        },
+        verbose=False,
+    )
+
+
+def max_rss_mb() -> float:
+    """このプロセスの最大RSS（MB、Linuxでは ru_maxrss がKB単位）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(runner: BatchRunner, elapsed: float) -> Dict[str, Any]:
+    """フェーズの結果（スループットとステージごとのパーセンタイル）"""
+    done = runner.succeeded + runner.failed
+    stages = {
+        name: {
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+        for name, values in [*runner.timings.items(), ("total", runner.latencies)]
+    }
+    return {
+        "queries": done,
+        "failed": runner.failed,
+        "elapsed": elapsed,
+        "throughput_qpm": done / elapsed * 60 if elapsed > 0 else 0.0,
+        "stages": stages,
+        "max_rss_mb": max_rss_mb(),
+    }
+
+
+async def run_phases(args: argparse.Namespace, api_port: int) -> Dict[str, Any]:
+    queries = [
+        {"id": i, "query": f"benchmark query {args.seed}-{i}"}
+        for i in range(args.queries)
+    ]
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="bench-pipeline-") as tmp:
+        tmp_dir = Path(tmp)
+        pipeline = create_pipeline(args, api_port, tmp_dir / "cache")
+        try:
+            # cold: キャッシュが空の状態 / warm: 同じ質問の再実行（各キャッシュにヒット）
+            for phase in PHASES:
+                if args.tracemalloc:
+                    tracemalloc.reset_peak()
+                runner = BatchRunner(
+                    pipeline, tmp_dir / f"{phase}.jsonl", args.concurrency
+                )
+                start = time.perf_counter()
+                await runner.run(iter(queries), completed=set())
+                results[phase] = summarize(runner, time.perf_counter() - start)
+                if args.tracemalloc:
+                    results[phase]["traced_peak_mb"] = (
+                        tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                    )
+        finally:
+            await pipeline.close()
+    return results
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    lines = []
+    for phase, result in results.items():
+        lines.append(
+            f"[{phase}] {result['queries']}件（失敗 {result['failed']}件） "
+            f"{result['elapsed']:.1f}秒 / {result['throughput_qpm']:.1f} 件/分 / "
+            f"最大RSS {result['max_rss_mb']:.0f}MB"
+            + (
+                f" / tracemallocピーク {result['traced_peak_mb']:.0f}MB"
+                if "traced_peak_mb" in result
+                else ""
+            )
+        )
+        lines.append(f"  {'stage':<10} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for name, stats in result["stages"].items():
+            lines.append(
+                f"  {name:<10} {stats['p50']:>8.3f} {stats['p95']:>8.3f} "
+                f"{stats['p99']:>8.3f}"
+            )
+    return "\n".join(lines)
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float
+) -> list[str]:
+    """ベースラインと比べて悪化した指標"""
+    regressions = []
+    for phase in PHASES:
+        if phase not in baseline["results"]:
+            continue
+        current, base = results[phase], baseline["results"][phase]
+        throughput = current["throughput_qpm"] / base["throughput_qpm"] - 1
+        if throughput < -max_regression:
+            regressions.append(f"{phase}: スループット {throughput:+.0%}")
+        p95 = current["stages"]["total"]["p95"] / base["stages"]["total"]["p95"] - 1
+        if p95 > max_regression:
+            regressions.append(f"{phase}: total p95 {p95:+.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="同時に処理する質問数"
+    )
+    parser.add_argument(
+        "--stage-concurrency", type=int, default=8, help="ステージごとの同時実行数"
+    )
+    parser.add_argument(
+        "--crawler", default="aiohttp", choices=["aiohttp", "scrapy", "firecrawl"]
+    )
+    parser.add_argument(
+        "--delay", type=float, default=0, help="同じホストへのリクエスト間隔（秒）"
+    )
+    parser.add_argument("--bing-qps", type=float, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-answer-cache",
+        action="store_true",
+        help="応答キャッシュを無効にする（warm でも応答を生成する）",
+    )
+    for field in fields(ServiceConfig):
+        if field.name != "seed":
+            parser.add_argument(
+                f"--{field.name.replace('_', '-')}",
+                type=type(field.default),
+                default=field.default,
+            )
+    parser.add_argument(
+        "--tracemalloc", action="store_true", help="Pythonのメモリ確保のピークも計測"
+    )
+    parser.add_argument("--output", type=Path, help="結果を保存するJSONファイル")
+    parser.add_argument("--baseline", type=Path, help="比較する以前の結果（JSON）")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    configure_logging("text", logging.WARNING)
+    service_config = ServiceConfig(
+        **{field.name: getattr(args, field.name) for field in fields(ServiceConfig)}
+    )
+    server, api_port = start_in_subprocess(service_config)
+    if args.tracemalloc:
+        tracemalloc.start()
+    try:
+        results = asyncio.run(run_phases(args, api_port))
+    finally:
+        server.terminate()
+
+    print(format_results(results))
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "args": vars(args) | {"output": None, "baseline": None},
+                    "results": results,
+                },
+                ensure_ascii=False,
+                indent=2,
+                default=str,
+            ),
+            encoding="utf-8",
+        )
+
+    if args.baseline:
+        regressions = compare(
+            results,
+            json.loads(args.baseline.read_text(encoding="utf-8")),
+            args.max_regression,
+        )
+        for regression in regressions:
+            print(f"悪化: {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
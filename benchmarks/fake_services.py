@@ -0,0 +1,233 @@
+# benchmarks/fake_services.py
+"""
+ベンチマーク用のローカルのスタンドイン（Bing・Firecrawl・OpenAI・静的サイト群）。
+
+実際のAPIの代わりに、以下を別プロセスのaiohttpサーバーとして起動する。
+    GET  /v7.0/search          Bing Web Search v7 と同じ形式の webPages.value
+    POST /v1/scrape            Firecrawl の scrape と同じ形式の data.markdown
+    POST /v1/chat/completions  OpenAI Chat Completions（stream: true ならSSE）
+    GET  /page/{id}            静的サイト（サイトごとに別のループバックアドレス = 別ホスト）
+
+レイテンシ・ページサイズ・エラー率は ServiceConfig で指定し、乱数のシードを
+固定することで同じ設定なら同じ結果（検索結果のURLとページ内容）になる。
+"""
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import random
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+WORDS = "検索 結果 ページ データ 記事 search content example latency cache network python".split()
+
+
+@dataclass
+class ServiceConfig:
+    """スタンドインの動作設定（時間は秒）"""
+
+    seed: int = 0
+    sites: int = 8  # 静的サイトの数（それぞれ別のホストとして扱われる）
+    pages_per_site: int = 200
+    results_per_query: int = 10
+    bing_latency: float = 0.05
+    site_latency: float = 0.2  # ページ取得のレイテンシの中央値
+    site_latency_sigma: float = 0.5  # 対数正規分布のばらつき
+    page_bytes: int = 50_000  # ページサイズの目安
+    error_rate: float = 0.05  # サイト・Firecrawlが500を返す確率
+    firecrawl_overhead: float = 0.3  # Firecrawlの処理時間（サイトのレイテンシに加算）
+    openai_ttft: float = 0.3
+    openai_tokens: int = 60
+    openai_token_interval: float = 0.01
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+class FakeServices:
+    """スタンドインのハンドラー群（ポートの割り当ては start() で行う）"""
+
+    def __init__(self, config: ServiceConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.site_origins: List[str] = []  # サイトごとの http://host:port
+
+    def _latency(self, median: float) -> float:
+        return median * self.rng.lognormvariate(0, self.config.site_latency_sigma)
+
+    def _failed(self) -> bool:
+        return self.rng.random() < self.config.error_rate
+
+    def _paragraphs(self, site: int, page: int) -> List[str]:
+        """ページの本文（サイトとページ番号から決まる）"""
+        rng = random.Random(f"{self.config.seed}:{site}:{page}")
+        paragraphs: List[str] = []
+        size = 0
+        while size < self.config.page_bytes:
+            paragraph = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120)))
+            paragraphs.append(f"{paragraph} (site {site} page {page})")
+            size += len(paragraphs[-1].encode("utf-8")) + 7
+        return paragraphs
+
+    def _result_pages(self, query: str) -> List[tuple[int, int]]:
+        """クエリに対する検索結果の (サイト, ページ番号)"""
+        h = _stable_hash(query)
+        return [
+            (
+                (h + j) % self.config.sites,
+                (h // 7 + j * 31) % self.config.pages_per_site,
+            )
+            for j in range(self.config.results_per_query)
+        ]
+
+    async def bing_search(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.config.bing_latency)
+        query = request.query.get("q", "")
+        count = int(request.query.get("count", self.config.results_per_query))
+        value = [
+            {
+                "name": f"{query} - site {site} page {page}",
+                "url": f"{self.site_origins[site]}/page/{page}",
+                "snippet": f"{query} に関するページ {page}",
+            }
+            for site, page in self._result_pages(query)[:count]
+        ]
+        return web.json_response({"webPages": {"value": value}})
+
+    def _site_handler(self, site: int):
+        async def handler(request: web.Request) -> web.Response:
+            page = int(request.match_info["page"])
+            await asyncio.sleep(self._latency(self.config.site_latency))
+            if self._failed():
+                return web.Response(status=500, text="internal error")
+            body = "".join(f"<p>{p}</p>" for p in self._paragraphs(site, page))
+            html = (
+                f"<html><head><title>site {site} page {page}</title></head>"
+                f"<body><nav><a href='/'>home</a></nav><article>{body}</article>"
+                "</body></html>"
+            )
+            return web.Response(text=html, content_type="text/html")
+
+        return handler
+
+    async def robots(self, request: web.Request) -> web.Response:
+        return web.Response(text="User-agent: *\nAllow: /\n")
+
+    async def firecrawl_scrape(self, request: web.Request) -> web.Response:
+        url = (await request.json())["url"]
+        await asyncio.sleep(
+            self.config.firecrawl_overhead + self._latency(self.config.site_latency)
+        )
+        if self._failed():
+            return web.json_response(
+                {"success": False, "error": "scrape failed"}, status=500
+            )
+        parts = urlsplit(url)
+        site = self.site_origins.index(f"{parts.scheme}://{parts.netloc}")
+        page = parts.path.rsplit("/", 1)[-1]
+        paragraphs = self._paragraphs(site, int(page))
+        return web.json_response(
+            {
+                "success": True,
+                "data": {
+                    "markdown": "\n\n".join(paragraphs),
+                    "metadata": {
+                        "title": f"site {site} page {page}",
+                        "description": "",
+                        "statusCode": 200,
+                        "sourceURL": url,
+                    },
+                },
+            }
+        )
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        prompt_tokens = sum(len(m["content"]) for m in payload["messages"]) // 4
+        tokens = [f"token{i} " for i in range(self.config.openai_tokens)]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+        }
+        await asyncio.sleep(self.config.openai_ttft)
+        if not payload.get("stream"):
+            message = {"role": "assistant", "content": "".join(tokens)}
+            return web.json_response(
+                {"choices": [{"index": 0, "message": message}], "usage": usage}
+            )
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.config.openai_token_interval)
+            chunk = {"choices": [{"index": 0, "delta": {"content": token}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(
+            f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode()
+        )
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def start(self) -> Dict[str, Any]:
+        """サーバーを起動し、APIのポートとサイトのポートを返す"""
+        api = web.Application()
+        api.router.add_get("/v7.0/search", self.bing_search)
+        api.router.add_post("/v1/scrape", self.firecrawl_scrape)
+        api.router.add_post("/v1/chat/completions", self.chat_completions)
+        api_runner = web.AppRunner(api, access_log=None)
+        await api_runner.setup()
+        api_site = web.TCPSite(api_runner, "127.0.0.1", 0)
+        await api_site.start()
+
+        for site in range(self.config.sites):
+            app = web.Application()
+            app.router.add_get("/robots.txt", self.robots)
+            app.router.add_get("/page/{page}", self._site_handler(site))
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            # Scrapyはポートを区別せずホスト名ごとに同時接続数を制限するため、
+            # サイトごとに 127.0.0.x のアドレスを使う（使えない環境では 127.0.0.1）
+            host = f"127.0.0.{site % 250 + 2}"
+            try:
+                await web.TCPSite(runner, host, 0).start()
+            except OSError:
+                host = "127.0.0.1"
+                await web.TCPSite(runner, host, 0).start()
+            self.site_origins.append(f"http://{host}:{runner.addresses[-1][1]}")
+        return {
+            "api_port": api_runner.addresses[0][1],
+            "site_origins": self.site_origins,
+        }
+
+
+def _serve(config: Dict[str, Any], ready):
+    async def run():
+        ports = await FakeServices(ServiceConfig(**config)).start()
+        ready.send(ports)
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+def start_in_subprocess(config: ServiceConfig) -> tuple[multiprocessing.Process, int]:
+    """
+    スタンドインを別プロセスで起動する（計測対象のプロセスのCPU・メモリに影響しない）。
+
+    Returns:
+        tuple[Process, int]: サーバーのプロセスと、Bing・Firecrawl・OpenAIのポート
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_serve, args=(asdict(config), sender), daemon=True
+    )
+    process.start()
+    ports = receiver.recv()
+    return process, ports["api_port"]
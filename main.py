@@ -1,8 +1,11 @@
-from src.web_search import bing_web_search
-from src.chatgpt import openai_generate_response
-from src.crawlers.crawler_factory import CrawlerFactory
+from src import instrumentation
+from src.instrumentation import configure_logging
+from src.pipeline import Pipeline
+from src.web_search import BingConfig
+from typing import Dict, Optional
 import asyncio
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 # 環境変数を読み込む
@@ -15,109 +18,140 @@ CRAWLER_CONFIG = {
     "respect_robots": True,
     "delay": 2,
     "api_url": "http://localhost:3002/v1/scrape",  # Firecrawl API URL
-    "timeout": 60,
+    "timeout": 30,  # 1回の取得全体の上限（秒）
+    "connect_timeout": 5,  # 接続確立までの上限（秒）
+    "read_timeout": 15,  # 受信の間隔の上限（秒）
+    "connection_limit": 100,  # Firecrawl接続プールの最大接続数
+    "connection_limit_per_host": 10,  # ホストごとの最大接続数
+    "dns_cache_ttl": 300,  # DNSキャッシュの有効期間（秒）
+    "max_bytes": 2 * 1024 * 1024,  # 読み込む本文の最大バイト数（超えるページは拒否）
+    "js_fallback": os.getenv(
+        "JS_FALLBACK"
+    ),  # aiohttp: "firecrawl" でJS描画ページを再取得
+    "content_cache": True,  # 取得したページをキャッシュする
+    "content_cache_freshness": 60 * 60,  # 再検証なしで使用する期間（秒）
+    "scheduler": True,  # ホストごとのスケジューラーで取得間隔と同時実行数を制御する
+    "per_host_limit": 2,  # ホストごとの同時リクエスト数
+    "concurrency_initial": 5,  # 全体の同時リクエスト数の初期値（AIMDで増減）
+    "concurrency_max": 32,  # 全体の同時リクエスト数の上限
+    "target_latency": 5.0,  # 同時リクエスト数を増やす目安のレイテンシ（秒）
+    # 本文抽出のワーカープロセス数（未設定ならCPU数、0 ならイベントループ上で抽出）
+    "extraction_workers": (
+        int(os.environ["EXTRACTION_WORKERS"])
+        if os.getenv("EXTRACTION_WORKERS")
+        else None
+    ),
+    "extraction_inline_bytes": 64 * 1024,  # これ未満のページはその場で抽出する
+    "extraction_max_pending": 64,  # プールに投入中の抽出の上限（超えたら空きを待つ）
+    "resilience": True,  # 一時的な失敗の再試行・遅い取得のヘッジ・サーキットブレーカー
+    "retry_attempts": 3,  # 最初の試行を含む最大試行回数
+    "hedge_quantile": 0.95,  # このパーセンタイルを超えた取得は2つ目の取得を開始する
+    "breaker_failures": 5,  # ブレーカーを開く連続失敗回数（ホストごと・Firecrawl）
+    "breaker_reset": 30,  # ブレーカーを開いておく時間（秒）
+}
+# 取得パイプラインの設定
+PIPELINE_CONFIG = {
+    # "streaming": 完了順に取り込み予算内で打ち切る / "all": 全ページの完了を待つ
+    "mode": os.getenv("FETCH_MODE", "streaming"),
+    "latency_budget": float(os.getenv("FETCH_LATENCY_BUDGET", "15")),  # 秒
+    "target_pages": int(os.getenv("FETCH_TARGET_PAGES", "6")),  # 十分とみなすページ数
+}
+# チャンク選択の設定
+RANKING_CONFIG = {
+    "token_budget": int(os.getenv("SOURCE_TOKEN_BUDGET", "3000")),  # 全ソース合計
+    "chunk_chars": 500,  # チャンクの目安の文字数
+}
+# プロンプトの設定
+PROMPT_CONFIG = {
+    "model": "gpt-4o-mini",
+    "total_budget": int(os.getenv("PROMPT_TOKEN_BUDGET", "4000")),
+    "per_source_budget": int(os.getenv("PROMPT_SOURCE_TOKEN_BUDGET", "800")),
+}
+# 重複検出の設定
+DEDUP_CONFIG = {
+    "max_distance": 3,  # 重複とみなすSimHashの最大ハミング距離
+    "index_path": Path("cache/content/simhash_index.sqlite"),
+}
+# 応答キャッシュの設定
+ANSWER_CACHE_CONFIG = {
+    "enabled": os.getenv("ANSWER_CACHE", "1") != "0",
+    "cache_dir": Path("cache/answers"),
+    "ttl": 60 * 60,  # 応答を再利用する期間（秒）
+    "max_bytes": 64 * 1024 * 1024,  # ディスクキャッシュ全体の最大サイズ
+    "memory_max_entries": 256,
+    "near_duplicates": False,  # True なら末尾の句読点だけが異なる質問にも同じ応答を使う
 }
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
 
 
-async def fetch_webpage_content(
-    url: str, semaphore: asyncio.Semaphore
-) -> tuple[str, str, str]:
-    """ウェブページのコンテンツを取得"""
-    async with semaphore:  # 同時接続数を制限
-        crawler = CrawlerFactory.create_crawler(CRAWLER_TYPE, CRAWLER_CONFIG)
-        try:
-            result = await crawler.fetch_content(url)
-            content = result.content if not result.error else ""
-            title = result.title if hasattr(result, "title") else ""
-            error = result.error if hasattr(result, "error") else ""
-            return content, title, error
-        finally:
-            await crawler.cleanup()  # awaitを追加
-
-
-async def process_urls(urls: list) -> list:
-    """URLリストを並列で処理"""
-    semaphore = asyncio.Semaphore(5)  # 同時に処理するURL数を制限
-    tasks = []
-
-    for i, url in enumerate(urls, 1):
-        print(f"\n[{i}/{len(urls)}] 取得中: {url}")
-        task = asyncio.create_task(fetch_webpage_content(url, semaphore))
-        tasks.append((url, task))
-
-    results = []
-    for url, task in tasks:
-        content, title, error = await task
-        if error:
-            print(f"エラー ({url}): {error}")
-        results.append(content)
-
-    return results
+def create_pipeline(
+    stage_concurrency: Optional[Dict[str, int]] = None, verbose: bool = True
+) -> Pipeline:
+    """このファイルの設定でパイプラインを生成（バッチ実行・サーバーからも使用）"""
+    return Pipeline(
+        crawler_type=CRAWLER_TYPE,
+        crawler_config=CRAWLER_CONFIG,
+        fetch_config=PIPELINE_CONFIG,
+        ranking_config=RANKING_CONFIG,
+        prompt_config=PROMPT_CONFIG,
+        dedup_config=DEDUP_CONFIG,
+        openai_api_key=OPENAI_API_KEY,
+        openai_api_url=OPENAI_API_URL,
+        bing_config=BingConfig.from_env(),
+        stage_concurrency=stage_concurrency,
+        answer_cache_config=ANSWER_CACHE_CONFIG,
+        verbose=verbose,
+    )
+
+
+def configure_observability(log_format: str = "text", metrics: bool = False):
+    """
+    ログと計測を設定する（バッチ実行・サーバーからも使用）。
+    環境変数 LOG_FORMAT・LOG_LEVEL・OTEL_TRACES があればそちらを優先する。
+    """
+    configure_logging(
+        os.getenv("LOG_FORMAT", log_format), os.getenv("LOG_LEVEL", "INFO")
+    )
+    otel = os.getenv("OTEL_TRACES", "").lower() in ("1", "true")
+    instrumentation.configure(enabled=metrics or otel, otel=otel)
 
 
 async def main():
     """メイン関数"""
+    # 対話実行では進捗をメッセージのみで表示する
+    configure_observability(log_format="plain")
     user_query = input("質問を入力してください: ")
     print("\nウェブ検索を実行しています...\n")
 
-    try:
-        # Azure Web Search APIを呼び出す
-        search_results = bing_web_search(user_query)
-        web_pages = search_results.get("webPages", {}).get("value", [])
-
-        if not web_pages:
-            print("検索結果が見つかりませんでした。")
-            return
-
-        # URLリストを作成
-        urls = [page.get("url") for page in web_pages]
+    answer_started = False
 
-        # 並列処理でコンテンツを取得
-        contents = await process_urls(urls)
+    def print_delta(delta: str):
+        nonlocal answer_started
+        if not answer_started:
+            print("\n💡 **AI応答**\n")
+            answer_started = True
+        print(delta, end="", flush=True)
 
-        # 検索結果とコンテンツを組み合わせる
-        detailed_summaries = [
-            {
-                "title": page.get("name"),
-                "url": page.get("url"),
-                "snippet": page.get("snippet"),
-                "content": content[:1000]
-                if content
-                else "コンテンツを取得できませんでした",
-            }
-            for page, content in zip(web_pages, contents)
-        ]
-
-        # OpenAIのプロンプトを生成
-        prompt = (
-            f"以下は '{user_query}' に関するウェブ検索の結果です。各ソースの情報を総合的に分析し、"
-            f"矛盾する情報がある場合はそれを指摘し、情報の信頼性も考慮して回答してください:\n\n"
-        )
-
-        for summary in detailed_summaries:
-            prompt += (
-                f"ソース: {summary['url']}\n"
-                f"タイトル: {summary['title']}\n"
-                f"概要: {summary['snippet']}\n"
-                f"内容: {summary['content']}\n\n"
+    pipeline = create_pipeline()
+    try:
+        # 検索 → 取得 → プロンプト生成 → 応答生成（トークンを受信次第表示する）
+        result = await pipeline.answer(user_query, on_delta=print_delta)
+        if result.error:
+            # エラー内容はパイプラインがログに出力する
+            return
+        print()
+
+        if result.cached:
+            print("\n(キャッシュされた応答)")
+        elif result.ttft is not None:
+            print(
+                f"\n(最初のトークンまで: {result.ttft:.2f}秒 / "
+                f"生成時間: {result.timings['generate']:.2f}秒)"
             )
-
-        print("\nOpenAI GPTモデルに応答をリクエストしています...\n")
-
-        # OpenAI GPT APIを呼び出す
-        ai_response = openai_generate_response(
-            OPENAI_API_KEY=OPENAI_API_KEY, OPENAI_API_URL=OPENAI_API_URL, prompt=prompt
-        )
-
-        # 応答を表示
-        answer = ai_response["choices"][0]["message"]["content"]
-        print("\n💡 **AI応答**\n")
-        print(answer)
-
-    except Exception as e:
-        print(f"エラーが発生しました: {str(e)}")
+    finally:
+        # 共有クライアント（接続プール・常駐Scrapyエンジン）を停止
+        await pipeline.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+"""
+パイプラインをHTTP APIとして提供するサーバーのエントリーポイント。
+
+Bing・クローラー・OpenAIのクライアントとメモリキャッシュはプロセス内で共有し、
+リクエストごとに作り直さない。
+
+エンドポイント:
+    POST /answer         {"query": "..."} -> 応答とソース（JSON）
+    POST /answer/stream  {"query": "..."} -> 応答の差分をServer-Sent Eventsで返す
+    GET  /healthz        処理中のリクエスト数、ステージ・ホストごとの待ち行列の長さ、
+                         検索・取得の合流（singleflight）の統計
+    GET  /metrics        ステージ・クローラー・キャッシュ・生成のメトリクス（Prometheus形式）
+
+リクエストヘッダー X-Request-ID があれば、その値をログのトレースIDとして使う。
+
+使い方:
+    uv run server.py --host 0.0.0.0 --port 8080
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+from main import configure_observability, create_pipeline
+from src.instrumentation import render_prometheus
+from src.pipeline import Pipeline
+
+PIPELINE_KEY = web.AppKey("pipeline", Pipeline)
+STATE_KEY = web.AppKey("state", dict)
+# ヘルスチェック・メトリクス収集はシャットダウン中も受け付け、処理中の数に含めない
+UNTRACKED_PATHS = {"/healthz", "/metrics"}
+
+logger = logging.getLogger(__name__)
+
+
+def _error(status: int, message: str) -> web.Response:
+    return web.json_response({"error": message}, status=status)
+
+
+async def _read_query(request: web.Request) -> str:
+    """リクエストボディから質問を取り出す（不正な場合は400）"""
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text="JSONのボディが必要です")
+    query = body.get("query") if isinstance(body, dict) else None
+    if not isinstance(query, str) or not query.strip():
+        raise web.HTTPBadRequest(text="query を指定してください")
+    return query.strip()
+
+
+def _trace_id(request: web.Request) -> Optional[str]:
+    """呼び出し側が指定したトレースID（X-Request-ID）"""
+    return request.headers.get("X-Request-ID") or None
+
+
+@web.middleware
+async def track_inflight(request: web.Request, handler):
+    """処理中のリクエスト数を数え、シャットダウン中は新しい質問を受け付けない"""
+    state = request.app[STATE_KEY]
+    if request.path in UNTRACKED_PATHS:
+        return await handler(request)
+    if state["draining"]:
+        return _error(503, "シャットダウン中です")
+    state["inflight"] += 1
+    try:
+        return await handler(request)
+    finally:
+        state["inflight"] -= 1
+
+
+async def answer(request: web.Request) -> web.Response:
+    """質問に対する応答を一括で返す"""
+    query = await _read_query(request)
+    result = await request.app[PIPELINE_KEY].answer(query, trace_id=_trace_id(request))
+    return web.json_response(
+        result.to_dict(), status=502 if result.error else 200, dumps=_dumps
+    )
+
+
+async def answer_stream(request: web.Request) -> web.StreamResponse:
+    """
+    質問に対する応答をServer-Sent Eventsで返す。
+    応答の差分ごとに {"type": "delta", "text": ...} を送り、最後に
+    {"type": "done", ...}（ソースと所要時間）を送る。
+    """
+    query = await _read_query(request)
+    pipeline = request.app[PIPELINE_KEY]
+    deltas: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(
+        pipeline.answer(query, on_delta=deltas.put_nowait, trace_id=_trace_id(request))
+    )
+    task.add_done_callback(lambda _: deltas.put_nowait(None))
+
+    response = web.StreamResponse(
+        headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+    )
+    await response.prepare(request)
+    try:
+        while (delta := await deltas.get()) is not None:
+            await _send_event(response, {"type": "delta", "text": delta})
+        result = task.result().to_dict()
+        result.pop("answer")
+        await _send_event(response, {"type": "done", **result})
+    except (ConnectionResetError, asyncio.CancelledError):
+        # クライアントが切断した場合は生成を中止する
+        task.cancel()
+        raise
+    await response.write_eof()
+    return response
+
+
+async def _send_event(response: web.StreamResponse, data: Dict[str, Any]):
+    await response.write(f"data: {_dumps(data)}\n\n".encode("utf-8"))
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False)
+
+
+async def healthz(request: web.Request) -> web.Response:
+    """稼働状態と待ち行列の長さ"""
+    state = request.app[STATE_KEY]
+    return web.json_response(
+        {
+            "status": "draining" if state["draining"] else "ok",
+            "inflight": state["inflight"],
+            "queues": request.app[PIPELINE_KEY].queue_depth(),
+        },
+        status=503 if state["draining"] else 200,
+    )
+
+
+async def metrics(request: web.Request) -> web.Response:
+    """メトリクスをPrometheusのテキスト形式で返す"""
+    return web.Response(
+        text=render_prometheus(), content_type="text/plain", charset="utf-8"
+    )
+
+
+async def on_shutdown(app: web.Application):
+    """シャットダウン開始時に新しい質問の受け付けを止める（処理中のものは完了を待つ）"""
+    app[STATE_KEY]["draining"] = True
+    logger.info("シャットダウン中: 処理中のリクエスト %d件", app[STATE_KEY]["inflight"])
+
+
+def create_app(args: argparse.Namespace) -> web.Application:
+    app = web.Application(middlewares=[track_inflight])
+    app[STATE_KEY] = {"draining": False, "inflight": 0}
+
+    async def pipeline_ctx(app: web.Application):
+        # 共有クライアントはサーバーの起動から終了まで使い回す
+        app[PIPELINE_KEY] = create_pipeline(
+            stage_concurrency={
+                "search": args.search_concurrency,
+                "fetch": args.fetch_concurrency,
+                "prompt": args.prompt_concurrency,
+                "generate": args.generate_concurrency,
+            },
+            verbose=args.verbose,
+        )
+        yield
+        # 実行中のクロールを流し切ってから接続プールを閉じる
+        await app[PIPELINE_KEY].close()
+
+    app.cleanup_ctx.append(pipeline_ctx)
+    app.on_shutdown.append(on_shutdown)
+    app.router.add_post("/answer", answer)
+    app.router.add_post("/answer/stream", answer_stream)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--search-concurrency", type=int, default=3)
+    parser.add_argument("--fetch-concurrency", type=int, default=8)
+    parser.add_argument("--prompt-concurrency", type=int, default=4)
+    parser.add_argument("--generate-concurrency", type=int, default=8)
+    parser.add_argument(
+        "--shutdown-timeout",
+        type=float,
+        default=60,
+        help="シャットダウン時に処理中のリクエストの完了を待つ秒数",
+    )
+    parser.add_argument("--verbose", action="store_true", help="質問ごとの進捗を表示")
+    parser.add_argument(
+        "--log-format", choices=["text", "json", "plain"], default="json"
+    )
+    parser.add_argument(
+        "--no-metrics", action="store_true", help="スパン・メトリクスを記録しない"
+    )
+    args = parser.parse_args()
+    configure_observability(args.log_format, metrics=not args.no_metrics)
+    web.run_app(
+        create_app(args),
+        host=args.host,
+        port=args.port,
+        shutdown_timeout=args.shutdown_timeout,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# src/answer_cache.py
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from .cache import CacheStats, DiskCache, MemoryCache
+from .instrumentation import counter
+
+# キャッシュの設定
+CACHE_DIR = Path("cache/answers")
+CACHE_DURATION = 60 * 60  # 1時間（秒単位）
+CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64MB
+MEMORY_CACHE_MAX_ENTRIES = 256
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """
+    質問を正規化する（全角・半角の統一（NFKC）、大文字・小文字の統一、
+    連続する空白の圧縮と前後の空白の除去）
+    """
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def loose_query(query: str) -> str:
+    """
+    近似一致用の質問の形（正規化した質問から末尾の句読点を除く）。
+    「東京の天気は？」と「東京の天気は」のように末尾の句読点だけが異なる質問を同一視する。
+    演算子・記号・単語の区切りは意味を変えうるため残す（「C++」と「C」、「a-b」と「ab」は別の質問）。
+    """
+    loose = normalize_query(query)
+    while loose and unicodedata.category(loose[-1]).startswith("P"):
+        loose = loose[:-1].rstrip()
+    return loose
+
+
+def source_fingerprint(urls: List[Optional[str]], contents: List[str]) -> str:
+    """ソース（URLと取得した本文）のハッシュ値。ソースが変われば応答のキャッシュも無効になる"""
+    digest = hashlib.sha256()
+    for url, content in zip(urls, contents):
+        digest.update((url or "").encode("utf-8"))
+        digest.update(b"\0")
+        digest.update((content or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    """応答のキャッシュキー（完全一致用と近似一致用）"""
+
+    exact: str
+    near: str
+
+
+class AnswerCache:
+    """
+    生成した応答のキャッシュ。
+    キーは正規化した質問・モデルと生成パラメータ・ソースのハッシュ値で、
+    BingSearchCache と同じくメモリ層（L1）と DiskCache（L2）の2層構成。
+    near_duplicates が有効な場合は、末尾の句読点だけが異なる質問でも同じ応答を使う。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = CACHE_DIR,
+        cache_duration: int = CACHE_DURATION,
+        max_bytes: int = CACHE_MAX_BYTES,
+        memory_max_entries: int = MEMORY_CACHE_MAX_ENTRIES,
+        near_duplicates: bool = False,
+    ):
+        """
+        Parameters:
+            cache_dir (Path): キャッシュファイルを保存するディレクトリ
+            cache_duration (int): キャッシュの有効期間（秒）
+            max_bytes (int): ディスクキャッシュ全体の最大サイズ（バイト）
+            memory_max_entries (int): メモリ層に保持する最大エントリ数
+            near_duplicates (bool): 近似一致（末尾の句読点の違い）でも応答を使うかどうか
+        """
+        self.cache_duration = cache_duration
+        self.near_duplicates = near_duplicates
+        self.memory = MemoryCache(max_entries=memory_max_entries, ttl=cache_duration)
+        self.store = DiskCache(Path(cache_dir), ttl=cache_duration, max_bytes=max_bytes)
+        self.stats = CacheStats()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "AnswerCache":
+        """設定（cache_dir, ttl, max_bytes, memory_max_entries, near_duplicates）から生成"""
+        return cls(
+            cache_dir=Path(config.get("cache_dir", CACHE_DIR)),
+            cache_duration=config.get("ttl", CACHE_DURATION),
+            max_bytes=config.get("max_bytes", CACHE_MAX_BYTES),
+            memory_max_entries=config.get(
+                "memory_max_entries", MEMORY_CACHE_MAX_ENTRIES
+            ),
+            near_duplicates=config.get("near_duplicates", False),
+        )
+
+    @staticmethod
+    def key(query: str, params: Dict[str, Any], fingerprint: str) -> AnswerKey:
+        """
+        キャッシュキーを生成（DiskCacheでハッシュ化される）
+
+        Parameters:
+            query (str): ユーザーの質問
+            params (Dict[str, Any]): モデルと生成・プロンプトのパラメータ
+            fingerprint (str): source_fingerprint() の値
+        """
+        params_json = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return AnswerKey(
+            exact=json.dumps(
+                ["exact", normalize_query(query), params_json, fingerprint],
+                ensure_ascii=False,
+            ),
+            near=json.dumps(
+                ["near", loose_query(query), params_json, fingerprint],
+                ensure_ascii=False,
+            ),
+        )
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        """メモリ層、ディスク層の順に探す"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry
+        try:
+            disk_entry = self.store.get_fresh_entry(key)
+            if disk_entry is None:
+                return None
+            entry = json.loads(disk_entry.value)
+        except json.JSONDecodeError:
+            # キャッシュが破損している場合は削除
+            self.store.delete(key)
+            return None
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("応答キャッシュの読み込み中にエラーが発生しました: %s", e)
+            return None
+
+        # ディスクの残り有効期間だけメモリ層に保持する
+        remaining = self.cache_duration - (time.time() - disk_entry.created_at)
+        self.memory.set(key, entry, ttl=max(remaining, 0))
+        return entry
+
+    def get(self, key: AnswerKey) -> Optional[Dict[str, Any]]:
+        """
+        キャッシュされた応答を取得
+
+        Returns:
+            Optional[Dict[str, Any]]: {"answer", "query", "created_at"}、または None
+        """
+        entry = self._get(key.exact)
+        result = "hit"
+        if entry is None and self.near_duplicates:
+            entry = self._get(key.near)
+            result = "near_hit"
+        if entry is None:
+            self.stats.misses += 1
+            counter("answer_cache_requests_total", result="miss")
+            return None
+        self.stats.hits += 1
+        counter("answer_cache_requests_total", result=result)
+        return entry
+
+    def set(self, key: AnswerKey, query: str, answer: str):
+        """応答を保存（近似一致が有効な場合は近似一致用のキーにも保存する）"""
+        entry = {"answer": answer, "query": query, "created_at": time.time()}
+        value = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        keys = [key.exact, key.near] if self.near_duplicates else [key.exact]
+        for cache_key in keys:
+            self.memory.set(cache_key, entry, size=len(value))
+            try:
+                self.store.set(cache_key, value)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("応答キャッシュの保存中にエラーが発生しました: %s", e)
@@ -0,0 +1,355 @@
+# src/cache.py
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+# 最終アクセス時刻を更新する間隔（秒）。LRUの精度をこの粒度に落とし、
+# キャッシュヒットのたびにインデックスへ書き込まないようにする
+ACCESS_TIME_RESOLUTION = 60.0
+
+
+@dataclass
+class CacheEntry:
+    """キャッシュエントリ（値と保存時刻）"""
+
+    value: bytes
+    created_at: float
+
+
+@dataclass
+class CacheStats:
+    """キャッシュ層ごとのヒット・ミス数"""
+
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class MemoryCache:
+    """
+    プロセス内のLRU/TTLキャッシュ。デコード済みの値をそのまま保持する。
+    エントリ数（max_entries）と合計サイズ（max_bytes）の両方で上限を設定できる。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        """
+        Parameters:
+            max_entries (int): 保持する最大エントリ数
+            max_bytes (Optional[int]): 保持する値の合計サイズの上限（バイト）
+            ttl (Optional[float]): エントリの有効期間（秒）。None なら期限なし
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        # key -> (value, size, expires_at)
+        self._entries: "OrderedDict[str, tuple[Any, int, Optional[float]]]" = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """値を取得（最近使用したエントリとして扱う）"""
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        value, _, expires_at = item
+        if expires_at is not None and time.monotonic() > expires_at:
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        size: int = 0,
+        ttl: Optional[float] = None,
+    ):
+        """
+        値を保存
+
+        Parameters:
+            size (int): 値のサイズ（バイト）。max_bytes の計算に使用
+            ttl (Optional[float]): このエントリの有効期間（秒）。省略時は self.ttl
+        """
+        self.delete(key)
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (value, size, expires_at)
+        self.total_bytes += size
+
+        # 上限を超えている間、最も古いエントリから削除
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.total_bytes > self.max_bytes
+        ):
+            _, (_, old_size, _) = self._entries.popitem(last=False)
+            self.total_bytes -= old_size
+
+    def delete(self, key: str):
+        """エントリを削除"""
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.total_bytes -= item[1]
+
+    def clear(self):
+        """すべてのエントリを削除"""
+        self._entries.clear()
+        self.total_bytes = 0
+
+
+class DiskCache:
+    """
+    ハッシュ化したキーでシャーディングされたファイルと、
+    SQLiteインデックスによるサイズ上限付きのディスクキャッシュ。
+
+    値は <directory>/<hash[:2]>/<hash[2:4]>/<hash> に一時ファイルからの
+    リネームで原子的に書き込み、保存時刻・最終アクセス時刻・サイズを
+    インデックス（WALモード）に保持する。インデックスはプロセス間で共有でき、
+    合計サイズが max_bytes を超えると最終アクセスが古い順に削除する（LRU）。
+    合計サイズはトリガーで更新する集計行に保持し、書き込みのたびに全体を集計しない。
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        compress: bool = False,
+    ):
+        """
+        Parameters:
+            directory (Path): キャッシュを保存するディレクトリ
+            ttl (Optional[float]): エントリの有効期間（秒）。None なら期限なし
+            max_bytes (Optional[int]): キャッシュ全体の最大サイズ（バイト）
+            compress (bool): 値をzlibで圧縮して保存するかどうか
+        """
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._index_path = self.directory / "index.sqlite"
+        self._local = threading.local()
+        self._init_index()
+
+    @staticmethod
+    def hash_key(key: str) -> str:
+        """キーをファイル名に使えるハッシュ値に変換"""
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        """スレッド・プロセスごとのインデックス接続を取得"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self._index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_index(self):
+        """インデックスのテーブルと、合計サイズを保持する集計行・トリガーを作成"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " size INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed_at"
+                " ON entries (accessed_at)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta ("
+                " name TEXT PRIMARY KEY,"
+                " value INTEGER NOT NULL)"
+            )
+            # 既存のインデックスは初回のみ集計して合計サイズを初期化する
+            conn.execute(
+                "INSERT OR IGNORE INTO meta (name, value)"
+                " SELECT 'total_size', COALESCE(SUM(size), 0) FROM entries"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_size_insert"
+                " AFTER INSERT ON entries BEGIN"
+                " UPDATE meta SET value = value + NEW.size"
+                " WHERE name = 'total_size'; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_size_update"
+                " AFTER UPDATE OF size ON entries BEGIN"
+                " UPDATE meta SET value = value + NEW.size - OLD.size"
+                " WHERE name = 'total_size'; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS entries_size_delete"
+                " AFTER DELETE ON entries BEGIN"
+                " UPDATE meta SET value = value - OLD.size"
+                " WHERE name = 'total_size'; END"
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _path(self, hashed: str) -> Path:
+        """ハッシュ値からシャーディングされたファイルパスを生成"""
+        return self.directory / hashed[:2] / hashed[2:4] / hashed
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """
+        有効期限に関係なくエントリを取得する（再検証用）。
+
+        Returns:
+            Optional[CacheEntry]: エントリ、または None
+        """
+        hashed = self.hash_key(key)
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT created_at, accessed_at FROM entries WHERE key = ?", (hashed,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        try:
+            value = self._path(hashed).read_bytes()
+            if self.compress:
+                value = zlib.decompress(value)
+        except (OSError, zlib.error):
+            # ファイルが失われているか破損している場合は削除
+            self._delete(conn, hashed)
+            return None
+
+        now = time.time()
+        if now - row[1] >= ACCESS_TIME_RESOLUTION:
+            conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ?", (now, hashed)
+            )
+        return CacheEntry(value=value, created_at=row[0])
+
+    def get_fresh_entry(self, key: str) -> Optional[CacheEntry]:
+        """
+        有効期限内のエントリを取得
+
+        Returns:
+            Optional[CacheEntry]: エントリ、または None
+        """
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.time() - entry.created_at > self.ttl:
+            self.delete(key)  # 期限切れのキャッシュを削除
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        キャッシュから値を取得
+
+        Returns:
+            Optional[bytes]: キャッシュされた値、または None
+        """
+        entry = self.get_fresh_entry(key)
+        return entry.value if entry is not None else None
+
+    def set(self, key: str, value: bytes):
+        """値をキャッシュに保存（一時ファイルからのリネームで原子的に書き込む）"""
+        hashed = self.hash_key(key)
+        data = zlib.compress(value) if self.compress else value
+        path = self._path(hashed)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        now = time.time()
+        conn = self._connect()
+        # INSERT OR REPLACE は削除トリガーを起動しないため、UPSERTで更新する
+        conn.execute(
+            "INSERT INTO entries (key, created_at, accessed_at, size)"
+            " VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (key) DO UPDATE SET created_at = excluded.created_at,"
+            " accessed_at = excluded.accessed_at, size = excluded.size",
+            (hashed, now, now, len(data)),
+        )
+        if self.max_bytes is not None:
+            self._evict(conn)
+
+    def touch(self, key: str):
+        """エントリの保存時刻を現在時刻に更新（再検証で変更がなかった場合など）"""
+        now = time.time()
+        self._connect().execute(
+            "UPDATE entries SET created_at = ?, accessed_at = ? WHERE key = ?",
+            (now, now, self.hash_key(key)),
+        )
+
+    def delete(self, key: str):
+        """エントリを削除"""
+        self._delete(self._connect(), self.hash_key(key))
+
+    def _delete(self, conn: sqlite3.Connection, hashed: str):
+        conn.execute("DELETE FROM entries WHERE key = ?", (hashed,))
+        self._path(hashed).unlink(missing_ok=True)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """合計サイズが上限を超えている間、最終アクセスが古いエントリから削除"""
+        total = self._total_size(conn)
+        while total > self.max_bytes:
+            rows = conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for hashed, size in rows:
+                self._delete(conn, hashed)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    @staticmethod
+    def _total_size(conn: sqlite3.Connection) -> int:
+        return conn.execute(
+            "SELECT value FROM meta WHERE name = 'total_size'"
+        ).fetchone()[0]
+
+    def total_size(self) -> int:
+        """キャッシュ全体のサイズ（バイト）"""
+        return self._total_size(self._connect())
+
+    def clear(self):
+        """すべてのエントリを削除"""
+        conn = self._connect()
+        for (hashed,) in conn.execute("SELECT key FROM entries").fetchall():
+            self._delete(conn, hashed)
@@ -1,5 +1,57 @@
 # src/chatgpt.py
-import requests
+import json
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+import aiohttp
+from .instrumentation import counter, observe, span
+from .resilience import (
+    REQUESTS_TIMEOUT,
+    RetryPolicy,
+    client_timeout,
+    retry_sync,
+    retry_async,
+)
+
+SYSTEM_PROMPT = "You are a helpful assistant."
+MAX_TOKENS = 500  # 応答の最大トークン数
+
+
+def generation_params(model: str) -> Dict[str, Any]:
+    """プロンプト以外の生成パラメータ（応答キャッシュのキーにも使用）"""
+    return {
+        "model": model,
+        "system": SYSTEM_PROMPT,
+        "max_tokens": MAX_TOKENS,
+        "n": 1,
+        "stop": None,
+        "temperature": 0.7,
+    }
+
+
+def _build_payload(prompt: str, model: str, stream: bool = False) -> Dict[str, Any]:
+    """Chat Completions APIのリクエストボディを生成"""
+    data = generation_params(model)
+    data["messages"] = [
+        {"role": "system", "content": data.pop("system")},
+        {"role": "user", "content": prompt},
+    ]
+    if stream:
+        data["stream"] = True
+        # 最後のチャンクでトークン使用量を受け取る
+        data["stream_options"] = {"include_usage": True}
+    return data
+
+
+def _record_usage(usage: Optional[Dict[str, Any]], model: str):
+    """APIが返したトークン使用量をカウンターに加算"""
+    if not usage:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            counter("openai_tokens_total", tokens, model=model, kind=kind)
 
 
 def openai_generate_response(
@@ -15,21 +67,234 @@ def openai_generate_response(
     Returns:
         dict: APIからのJSONレスポンス。
     """
+    import requests
+
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {OPENAI_API_KEY}",
     }
-    data = {
-        "model": model,
-        "messages": [
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt},
-        ],
-        "max_tokens": 500,
-        "n": 1,
-        "stop": None,
-        "temperature": 0.7,
-    }
-    response = requests.post(OPENAI_API_URL, headers=headers, json=data)
-    response.raise_for_status()
-    return response.json()
+    data = _build_payload(prompt, model)
+
+    def call() -> Dict[str, Any]:
+        response = requests.post(
+            OPENAI_API_URL, headers=headers, json=data, timeout=REQUESTS_TIMEOUT
+        )
+        response.raise_for_status()
+        return response.json()
+
+    with span("openai_generate", model=model, stream="false"):
+        result = retry_sync(call, RetryPolicy(), name="openai")
+    _record_usage(result.get("usage"), model)
+    return result
+
+
+@dataclass
+class GenerationMetrics:
+    """1回の生成呼び出しの計測結果"""
+
+    model: str
+    stream: bool
+    ttft: Optional[float] = None  # 最初のトークンまでの時間（秒）
+    total_time: Optional[float] = None  # 生成完了までの時間（秒）
+    chunks: int = 0  # 受信したコンテンツ差分の数
+    prompt_tokens: Optional[int] = None  # APIが返した入力トークン数
+    completion_tokens: Optional[int] = None  # APIが返した出力トークン数
+
+
+class ChatCompletionStream:
+    """SSE（stream: true）で受信したコンテンツ差分を順に返す非同期イテレーター"""
+
+    def __init__(self, client: "AsyncOpenAIClient", prompt: str, model: str):
+        self.client = client
+        self.prompt = prompt
+        self.metrics = GenerationMetrics(model=model, stream=True)
+        self._parts: List[str] = []
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[str]:
+        """SSEのdata行を解析してコンテンツ差分をyieldする"""
+        start = time.perf_counter()
+        payload = _build_payload(self.prompt, self.metrics.model, stream=True)
+        try:
+            async with await self.client._post(payload) as response:
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:") :].strip()
+                    if data == "[DONE]":
+                        break
+
+                    chunk = json.loads(data)
+                    usage = chunk.get("usage")
+                    if usage:
+                        self.metrics.prompt_tokens = usage.get("prompt_tokens")
+                        self.metrics.completion_tokens = usage.get("completion_tokens")
+                    choices = chunk.get("choices") or []
+                    delta = (
+                        choices[0].get("delta", {}).get("content") if choices else None
+                    )
+                    if not delta:
+                        continue
+
+                    if self.metrics.ttft is None:
+                        self.metrics.ttft = time.perf_counter() - start
+                    self.metrics.chunks += 1
+                    self._parts.append(delta)
+                    yield delta
+        finally:
+            self.metrics.total_time = time.perf_counter() - start
+            self.client.metrics.append(self.metrics)
+            self._record_metrics()
+
+    def _record_metrics(self):
+        """計測結果をメトリクスに記録（ジェネレーターをまたぐためスパンは使わない）"""
+        model = self.metrics.model
+        observe(
+            "openai_generate_seconds",
+            self.metrics.total_time,
+            model=model,
+            stream="true",
+        )
+        if self.metrics.ttft is not None:
+            observe("openai_ttft_seconds", self.metrics.ttft, model=model)
+        counter("openai_stream_chunks_total", self.metrics.chunks, model=model)
+        _record_usage(
+            {
+                "prompt_tokens": self.metrics.prompt_tokens,
+                "completion_tokens": self.metrics.completion_tokens,
+            },
+            model,
+        )
+
+    @property
+    def text(self) -> str:
+        """これまでに受信した応答テキスト"""
+        return "".join(self._parts)
+
+    def to_response(self) -> Dict[str, Any]:
+        """非ストリーミング応答と同じ形式（choices[0].message.content）に変換"""
+        return {
+            "model": self.metrics.model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": self.text},
+                }
+            ],
+        }
+
+
+class AsyncOpenAIClient:
+    """
+    共有aiohttpセッションを使用する非同期OpenAIクライアント。
+    呼び出しごとに最初のトークンまでの時間（TTFT）と生成時間を記録する。
+    一時的なエラーは応答の受信を始める前に限り再試行する（費用がかかるためヘッジは行わない）。
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        api_url: str,
+        model: str = "gpt-4o-mini",
+        timeout: int = 60,
+        connection_limit: int = 20,
+        metrics_history: int = 100,
+        retry: Optional[RetryPolicy] = None,
+    ):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.model = model
+        # 生成中のトークンの間隔は短いため、読み込みのタイムアウトで停止した接続を検出する
+        self.timeout = client_timeout(total=timeout)
+        self.retry = retry or RetryPolicy()
+        self.connection_limit = connection_limit
+        self.session: Optional[aiohttp.ClientSession] = None
+        # 直近の呼び出しの計測結果
+        self.metrics: deque = deque(maxlen=metrics_history)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """共有セッションを取得（未生成なら生成）"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.connection_limit, ttl_dns_cache=300
+                ),
+                timeout=self.timeout,
+            )
+        return self.session
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+
+    async def _post(self, payload: Dict[str, Any]) -> aiohttp.ClientResponse:
+        """
+        APIにPOSTし、成功したレスポンスを返す（呼び出し側で async with して解放する）。
+        接続エラー・タイムアウト・429/5xxはレスポンスの受信前なので再試行する。
+        """
+
+        async def call() -> aiohttp.ClientResponse:
+            response = await self._get_session().post(
+                self.api_url, headers=self._headers(), json=payload
+            )
+            if response.status >= 400:
+                response.release()
+                response.raise_for_status()
+            return response
+
+        return await retry_async(call, self.retry, name="openai")
+
+    def stream(self, prompt: str, model: Optional[str] = None) -> ChatCompletionStream:
+        """
+        応答をストリーミングで生成する。
+
+        Returns:
+            ChatCompletionStream: コンテンツ差分を返す非同期イテレーター。
+                反復完了後に metrics と to_response() を参照できる。
+        """
+        return ChatCompletionStream(self, prompt, model or self.model)
+
+    async def generate(
+        self, prompt: str, model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        応答を一括で生成する。
+
+        Returns:
+            dict: APIからのJSONレスポンス（choices[0].message.content に応答）
+        """
+        metrics = GenerationMetrics(model=model or self.model, stream=False)
+        start = time.perf_counter()
+        try:
+            async with span("openai_generate", model=metrics.model, stream="false"):
+                async with await self._post(
+                    _build_payload(prompt, metrics.model)
+                ) as response:
+                    result = await response.json()
+            metrics.ttft = time.perf_counter() - start
+            metrics.chunks = 1
+            usage = result.get("usage") or {}
+            metrics.prompt_tokens = usage.get("prompt_tokens")
+            metrics.completion_tokens = usage.get("completion_tokens")
+            _record_usage(usage, metrics.model)
+            return result
+        finally:
+            metrics.total_time = time.perf_counter() - start
+            self.metrics.append(metrics)
+
+    async def close(self):
+        """セッションのクリーンアップ"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -0,0 +1,175 @@
+# src/crawlers/aiohttp_crawler.py
+import asyncio
+import logging
+import re
+from typing import Dict, Any, Optional
+import aiohttp
+from .base_crawler import (
+    BaseCrawler,
+    CrawlResult,
+    PooledSessionMixin,
+    conditional_headers,
+)
+from ..extraction import ExtractedContent, format_content
+from ..extraction_pool import ExtractionError, get_extraction_pool
+
+READ_CHUNK_SIZE = 64 * 1024
+# 読み込み途中で抽出を試す最初の位置（以降は読み込み量が倍になるごとに試す）
+FIRST_EXTRACT_CHECKPOINT = 128 * 1024
+MIN_TEXT_CHARS = 200  # これより本文が短いページはJSで描画されている可能性がある
+
+# クライアントサイドで描画されるページに典型的なマウントポイント・記述
+JS_RENDERED_PATTERN = re.compile(
+    rb"<div[^>]+id=[\"'](?:root|app|__next|__nuxt|svelte)[\"'][^>]*>\s*</div>"
+    rb"|enable\s+javascript|javascript\s+(?:is\s+)?required",
+    re.IGNORECASE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def looks_js_rendered(body: bytes, text: str) -> bool:
+    """本文がほとんどなく、JSで描画されるページの特徴があるかどうか"""
+    if len(text) >= MIN_TEXT_CHARS:
+        return False
+    return bool(JS_RENDERED_PATTERN.search(body)) or body.count(b"<script") >= 5
+
+
+class AiohttpCrawler(PooledSessionMixin, BaseCrawler):
+    """aiohttpで直接HTMLを取得するクローラーの実装
+
+    接続プールを共有するセッションでページを取得し、ヘッダーで対象外の
+    コンテンツタイプやサイズのページを拒否したうえで、本文をストリーミングで
+    読み込んで（max_bytes まで、抽出が max_chars に達したらそこまで）本文抽出にかける。
+    JSで描画されるページと判定した場合は、設定があればFirecrawlで取得し直す。
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        super().__init__(config)
+        self.fallback: Optional[BaseCrawler] = None
+        self.extraction = get_extraction_pool(self.config)
+
+    def _session_headers(self) -> Dict[str, str]:
+        """ブラウザに近いリクエストヘッダー"""
+        return {
+            "User-Agent": self.config.get(
+                "user_agent",
+                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            ),
+            "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "en",
+        }
+
+    async def _extract(
+        self, body: bytes, content_type: Optional[str]
+    ) -> ExtractedContent:
+        """抽出プールで本文を抽出（小さなページはその場で抽出される）"""
+        return await self.extraction.extract(
+            body, content_type, max_chars=self.policy.max_chars
+        )
+
+    async def _read_body(
+        self, response: aiohttp.ClientResponse
+    ) -> tuple[bytes, ExtractedContent, bool]:
+        """
+        本文をストリーミングで読み込みながら抽出する。
+        max_bytes に達するか、途中までの本文で抽出が max_chars に達した時点で
+        残りを読まずに打ち切る（抽出は読み込み量が倍になるごとに試すため、
+        全体の抽出コストは最後の1回の高々2倍に収まる）。
+
+        Returns:
+            tuple[bytes, ExtractedContent, bool]: 読み込んだ本文、抽出結果、
+                本文の途中で打ち切ったかどうか
+        """
+        content_type = response.headers.get("Content-Type")
+        buffer = bytearray()
+        checkpoint = FIRST_EXTRACT_CHECKPOINT
+        async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+            buffer += chunk
+            if len(buffer) >= self.policy.max_bytes:
+                body = bytes(buffer[: self.policy.max_bytes])
+                return body, await self._extract(body, content_type), True
+            if len(buffer) >= checkpoint:
+                checkpoint *= 2
+                extracted = await self._extract(bytes(buffer), content_type)
+                if extracted.truncated:
+                    return bytes(buffer), extracted, True
+
+        body = bytes(buffer)
+        return body, await self._extract(body, content_type), False
+
+    def _get_fallback(self) -> Optional[BaseCrawler]:
+        """JS描画ページ用のフォールバッククローラー（js_fallback の設定時のみ）"""
+        if self.fallback is None and self.config.get("js_fallback") == "firecrawl":
+            from .firecrawl_crawler import FirecrawlCrawler
+
+            self.fallback = FirecrawlCrawler(self.config)
+        return self.fallback
+
+    async def fetch_content(
+        self, url: str, validators: Optional[Dict[str, Any]] = None
+    ) -> CrawlResult:
+        """ウェブページを直接取得して本文を抽出（validators があれば条件付きGET）"""
+        await self._init_session()
+
+        try:
+            async with self.session.get(
+                url, headers=conditional_headers(validators)
+            ) as response:
+                metadata = {
+                    "status_code": response.status,
+                    "retry_after": response.headers.get("Retry-After"),
+                    "source_url": str(response.url),
+                    "content_type": response.headers.get("Content-Type"),
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+                if response.status == 304:
+                    metadata["not_modified"] = True
+                    return CrawlResult(content="", metadata=metadata)
+                if response.status >= 400:
+                    return CrawlResult(
+                        content="",
+                        metadata=metadata,
+                        error=f"HTTPエラー: {response.status}",
+                    )
+                # PDF・バイナリ・巨大なページは本文を読む前に拒否する
+                rejection = self.policy.check_headers(
+                    metadata["content_type"], response.headers.get("Content-Length")
+                )
+                if rejection:
+                    return CrawlResult(content="", metadata=metadata, error=rejection)
+                body, extracted, truncated = await self._read_body(response)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return CrawlResult(
+                content="",
+                metadata={"transient": True},
+                error=f"リクエストエラー: {str(e) or type(e).__name__}",
+            )
+        except ExtractionError as e:
+            logger.warning("%s: %s", url, e)
+            return CrawlResult(content="", metadata=metadata, error=str(e))
+
+        metadata["body_truncated"] = truncated
+        metadata["body_bytes"] = len(body)
+
+        fallback = self._get_fallback()
+        if fallback is not None and looks_js_rendered(body, extracted.text):
+            logger.info("JSで描画されるページのためFirecrawlで取得します: %s", url)
+            result = await fallback.fetch_content(url)
+            if not result.error:
+                return result
+
+        return CrawlResult(
+            content=format_content(extracted),
+            title=extracted.title,
+            description=extracted.description,
+            metadata=metadata,
+        )
+
+    async def cleanup(self):
+        """セッション（とフォールバッククローラー）のクリーンアップ"""
+        if self.fallback is not None:
+            await self.fallback.cleanup()
+            self.fallback = None
+        await self._close_session()
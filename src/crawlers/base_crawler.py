@@ -1,7 +1,33 @@
 # src/crawlers/base_crawler.py
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, Any
+from typing import Dict, FrozenSet, Optional, Any
 from dataclasses import dataclass
+import aiohttp
+from ..extraction import DEFAULT_MAX_CHARS
+from ..resilience import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, client_timeout
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024  # 読み込むレスポンス本文の最大バイト数
+DEFAULT_CONTENT_TYPES = frozenset({"text/html", "application/xhtml+xml", "text/plain"})
+DEFAULT_TIMEOUT = 30  # 1回の取得全体の上限（秒）
+
+
+def crawler_timeout(config: Dict[str, Any]):
+    """クローラーの設定（timeout, connect_timeout, read_timeout）からaiohttpのタイムアウトを生成"""
+    return client_timeout(
+        total=config.get("timeout", DEFAULT_TIMEOUT),
+        connect=config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+        read=config.get("read_timeout", DEFAULT_READ_TIMEOUT),
+    )
+
+
+def conditional_headers(validators: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """キャッシュの検証情報（etag, last_modified）から条件付きGETのヘッダーを生成"""
+    headers = {}
+    if validators and validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators and validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
 
 
 @dataclass
@@ -15,18 +41,107 @@ class CrawlResult:
     error: Optional[str] = None
 
 
+@dataclass(frozen=True)
+class FetchPolicy:
+    """
+    レスポンスの取得方針。
+    ヘッダーの段階でHTML以外やサイズ超過のレスポンスを拒否し、
+    本文は max_bytes まで、抽出は max_chars までに制限する。
+    """
+
+    max_bytes: int = DEFAULT_MAX_BYTES
+    max_chars: int = DEFAULT_MAX_CHARS
+    content_types: FrozenSet[str] = DEFAULT_CONTENT_TYPES
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "FetchPolicy":
+        """クローラーの設定（max_bytes, max_chars, content_types）から生成"""
+        return cls(
+            max_bytes=config.get("max_bytes", DEFAULT_MAX_BYTES),
+            max_chars=config.get("max_chars", DEFAULT_MAX_CHARS),
+            content_types=frozenset(config.get("content_types", DEFAULT_CONTENT_TYPES)),
+        )
+
+    def check_headers(
+        self, content_type: Optional[str], content_length: Optional[str]
+    ) -> Optional[str]:
+        """
+        レスポンスヘッダーから本文を読む前に取得可否を判定する。
+
+        Returns:
+            Optional[str]: 拒否する場合はその理由、取得してよい場合は None
+        """
+        if content_type:
+            mime = content_type.split(";", 1)[0].strip().lower()
+            if mime and mime not in self.content_types:
+                return f"対象外のコンテンツタイプです: {mime}"
+        if content_length and content_length.strip().isdigit():
+            if int(content_length) > self.max_bytes:
+                return f"レスポンスが大きすぎます: {int(content_length):,} バイト"
+        return None
+
+
 class BaseCrawler(ABC):
     """基本クローラークラス"""
 
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         self.config = config or {}
+        self.policy = FetchPolicy.from_config(self.config)
 
     @abstractmethod
-    async def fetch_content(self, url: str) -> CrawlResult:
-        """ウェブページのコンテンツを取得する抽象メソッド"""
+    async def fetch_content(
+        self, url: str, validators: Optional[Dict[str, Any]] = None
+    ) -> CrawlResult:
+        """
+        ウェブページのコンテンツを取得する抽象メソッド。
+
+        validators（キャッシュのetag, last_modified）が指定された場合は条件付きGETを送り、
+        304 Not Modified なら本文なしで metadata["not_modified"] を True にした結果を返す
+        （条件付きGETに対応しないクローラーは通常どおり取得してよい）。
+        """
         pass
 
     @abstractmethod
-    def cleanup(self):
+    async def cleanup(self):
         """リソースのクリーンアップのための抽象メソッド"""
         pass
+
+
+class PooledSessionMixin:
+    """
+    接続プール（キープアライブ・DNSキャッシュ付き）を持つaiohttpセッションを
+    共有するクローラーのミックスイン。接続数の上限とタイムアウトは
+    クローラーの設定（connection_limit, connection_limit_per_host, dns_cache_ttl,
+    keepalive_timeout, timeout, connect_timeout, read_timeout）から生成する。
+    """
+
+    config: Dict[str, Any]
+    session: Optional[aiohttp.ClientSession] = None
+
+    def _session_headers(self) -> Optional[Dict[str, str]]:
+        """セッションの全リクエストに付けるヘッダー（必要なクラスで上書きする）"""
+        return None
+
+    def _create_connector(self) -> aiohttp.TCPConnector:
+        """接続プール（キープアライブ・DNSキャッシュ付き）の生成"""
+        return aiohttp.TCPConnector(
+            limit=self.config.get("connection_limit", 100),
+            limit_per_host=self.config.get("connection_limit_per_host", 10),
+            ttl_dns_cache=self.config.get("dns_cache_ttl", 300),
+            keepalive_timeout=self.config.get("keepalive_timeout", 30),
+        )
+
+    async def _init_session(self):
+        """aiohttpセッションの初期化（既存のセッションがあれば再利用）"""
+        if not self.session or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=self._create_connector(),
+                timeout=crawler_timeout(self.config),
+                headers=self._session_headers(),
+            )
+
+    async def _close_session(self):
+        """セッションと接続プールを閉じる"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
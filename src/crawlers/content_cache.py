@@ -0,0 +1,129 @@
+# src/crawlers/content_cache.py
+import json
+import logging
+import sqlite3
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Optional
+from .base_crawler import BaseCrawler, CrawlResult
+from ..cache import DiskCache
+from ..instrumentation import counter
+
+CONTENT_CACHE_DIR = Path("cache/content")
+CONTENT_CACHE_FRESHNESS = 60 * 60  # 再検証なしで使用する期間（秒）
+CONTENT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+
+logger = logging.getLogger(__name__)
+
+
+class ContentCache:
+    """
+    URLをキーとしたCrawlResultのキャッシュ。
+    抽出済みコンテンツとETag/Last-Modifiedを圧縮してディスクに保存し、
+    鮮度切れのエントリは CachedCrawler がラップしたクローラーの条件付きGETで
+    再検証する（304なら再利用）。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = CONTENT_CACHE_DIR,
+        freshness: float = CONTENT_CACHE_FRESHNESS,
+        max_bytes: int = CONTENT_CACHE_MAX_BYTES,
+    ):
+        """
+        Parameters:
+            cache_dir (Path): キャッシュを保存するディレクトリ
+            freshness (float): 再検証なしで使用する期間（秒）
+            max_bytes (int): キャッシュ全体の最大サイズ（バイト）
+        """
+        self.freshness = freshness
+        # 鮮度切れのエントリも再検証に使うため、削除はサイズ上限によるLRUのみ
+        self.store = DiskCache(cache_dir, max_bytes=max_bytes, compress=True)
+
+    def get(self, url: str) -> Optional[tuple[CrawlResult, Dict[str, Any]]]:
+        """
+        キャッシュからエントリを取得
+
+        Returns:
+            Optional[tuple[CrawlResult, dict]]: 結果と検証情報
+                （etag, last_modified, fresh）、または None
+        """
+        try:
+            entry = self.store.get_entry(url)
+            if entry is None:
+                return None
+            record = json.loads(entry.value)
+        except (json.JSONDecodeError, OSError, sqlite3.Error):
+            self.store.delete(url)
+            return None
+
+        validators = {
+            "etag": record.pop("etag", None),
+            "last_modified": record.pop("last_modified", None),
+            "fresh": time.time() - entry.created_at <= self.freshness,
+        }
+        return CrawlResult(**record), validators
+
+    def set(self, url: str, result: CrawlResult):
+        """取得結果を保存（クローラーのメタデータにあるETag/Last-Modifiedも保存）"""
+        metadata = result.metadata or {}
+        record = asdict(result)
+        record["etag"] = metadata.get("etag")
+        record["last_modified"] = metadata.get("last_modified")
+        try:
+            value = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+            self.store.set(url, value.encode("utf-8"))
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("コンテンツキャッシュの保存中にエラーが発生しました: %s", e)
+
+    def touch(self, url: str):
+        """再検証で変更がなかったエントリを新しいものとして扱う"""
+        try:
+            self.store.touch(url)
+        except sqlite3.Error as e:
+            logger.warning("コンテンツキャッシュの更新中にエラーが発生しました: %s", e)
+
+
+class CachedCrawler(BaseCrawler):
+    """
+    任意のクローラーの前段にコンテンツキャッシュを置くラッパー。
+    鮮度切れのエントリはラップしたクローラー（スケジューラー・robots.txt・
+    サーキットブレーカーを含む）に検証情報を渡して条件付きGETで取得し、
+    304なら保存済みの結果を、200ならその取得結果をそのまま使う。
+    """
+
+    def __init__(self, crawler: BaseCrawler, cache: ContentCache):
+        super().__init__(crawler.config)
+        self.crawler = crawler
+        self.cache = cache
+
+    async def fetch_content(
+        self, url: str, validators: Optional[Dict[str, Any]] = None
+    ) -> CrawlResult:
+        """キャッシュ（必要なら再検証）を使用し、なければクローラーで取得"""
+        cached = self.cache.get(url)
+        cached_result = None
+        if cached is not None:
+            cached_result, cache_validators = cached
+            if cache_validators["fresh"]:
+                counter("content_cache_requests_total", result="hit")
+                return cached_result
+            if cache_validators["etag"] or cache_validators["last_modified"]:
+                validators = cache_validators
+
+        result = await self.crawler.fetch_content(url, validators)
+        if cached_result is not None and (result.metadata or {}).get("not_modified"):
+            logger.info("キャッシュを再検証しました（304）: %s", url)
+            counter("content_cache_requests_total", result="revalidated")
+            self.cache.touch(url)
+            return cached_result
+
+        counter("content_cache_requests_total", result="miss")
+        if not result.error and result.content:
+            self.cache.set(url, result)
+        return result
+
+    async def cleanup(self):
+        """ラップしたクローラーのクリーンアップ"""
+        await self.crawler.cleanup()
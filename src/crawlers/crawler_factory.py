@@ -1,24 +1,141 @@
 # src/crawlers/crawler_factory.py
-from typing import Dict, Any, Optional
+import importlib
+import inspect
+from typing import Dict, Any, Optional, Type
 from .base_crawler import BaseCrawler
-from .scrapy_crawler import ScrapyCrawler
-from .firecrawl_crawler import FirecrawlCrawler
+from .content_cache import CachedCrawler, ContentCache
+from .instrumented_crawler import InstrumentedCrawler
+from .resilient_crawler import ResilientCrawler
+from .scheduler import AdaptiveLimiter, HostScheduler, ScheduledCrawler
+from ..extraction_pool import shutdown_extraction_pool
+from ..resilience import BreakerRegistry, RetryPolicy
+
+# クローラータイプ -> "モジュール:クラス名"（選択されたクローラーのモジュールだけを読み込む）
+CRAWLER_REGISTRY: Dict[str, str] = {
+    "scrapy": ".scrapy_crawler:ScrapyCrawler",
+    "firecrawl": ".firecrawl_crawler:FirecrawlCrawler",
+    "aiohttp": ".aiohttp_crawler:AiohttpCrawler",
+}
 
 
 class CrawlerFactory:
     """クローラー生成のためのファクトリークラス"""
 
+    # タイプごとに共有されるクローラーインスタンス
+    _instances: Dict[str, BaseCrawler] = {}
+
     @staticmethod
-    def create_crawler(
-        crawler_type: str, config: Optional[Dict[str, Any]] = None
-    ) -> BaseCrawler:
-        """指定されたタイプのクローラーインスタンスを生成"""
-        crawlers = {"scrapy": ScrapyCrawler, "firecrawl": FirecrawlCrawler}
+    def register(crawler_type: str, path: str):
+        """クローラーを "モジュール:クラス名" の形式で登録（外部のクローラーの追加用）"""
+        CRAWLER_REGISTRY[crawler_type.lower()] = path
 
-        crawler_class = crawlers.get(crawler_type.lower())
-        if not crawler_class:
+    @staticmethod
+    def load_crawler_class(crawler_type: str) -> Type[BaseCrawler]:
+        """指定されたタイプのクローラークラスをインポートして返す"""
+        path = CRAWLER_REGISTRY.get(crawler_type.lower())
+        if not path:
             raise ValueError(
                 f"サポートされていないクローラータイプです: {crawler_type}"
             )
+        module_name, _, class_name = path.partition(":")
+        # ".xxx" はこのパッケージからの相対パスとして解決する
+        module = importlib.import_module(module_name, package=__package__)
+        return getattr(module, class_name)
+
+    @classmethod
+    def create_crawler(
+        cls, crawler_type: str, config: Optional[Dict[str, Any]] = None
+    ) -> BaseCrawler:
+        """指定されたタイプのクローラーインスタンスを生成"""
+        return cls.load_crawler_class(crawler_type)(config)
+
+    @classmethod
+    def get_crawler(
+        cls, crawler_type: str, config: Optional[Dict[str, Any]] = None
+    ) -> BaseCrawler:
+        """
+        指定されたタイプの共有クローラーインスタンスを取得する。
+        初回呼び出し時に生成し、close_all() まで同じインスタンスを返す。
+        設定は初回呼び出し時のものが使われる。
+        クローラーは計測用のラッパーで包み、
+        config の scheduler が有効な場合はホストごとのスケジューラーを通し、
+        resilience が有効な場合は再試行・ヘッジ・サーキットブレーカーを加え、
+        content_cache が有効な場合はコンテンツキャッシュでラップする
+        （キャッシュにヒットしたURLはスケジューラーの待ち行列に入らない）。
+        """
+        key = crawler_type.lower()
+        crawler = cls._instances.get(key)
+        if crawler is None:
+            config = config or {}
+            if config.get("scheduler"):
+                # 間隔とrobots.txtはスケジューラーが扱うため、クローラー側では無効にする
+                crawler = cls.create_crawler(
+                    crawler_type, {**config, "delay": 0, "respect_robots": False}
+                )
+                crawler = ScheduledCrawler(
+                    InstrumentedCrawler(crawler, key), cls._create_scheduler(config)
+                )
+            else:
+                crawler = InstrumentedCrawler(
+                    cls.create_crawler(crawler_type, config), key
+                )
+            if config.get("resilience"):
+                crawler = cls._create_resilient_crawler(crawler, config)
+            if config.get("content_cache"):
+                crawler = CachedCrawler(crawler, cls._create_content_cache(config))
+            cls._instances[key] = crawler
+        return crawler
+
+    @staticmethod
+    def _create_scheduler(config: Dict[str, Any]) -> HostScheduler:
+        """設定からホストごとのスケジューラーを生成"""
+        limiter_options = {
+            "initial": config.get("concurrency_initial"),
+            "maximum": config.get("concurrency_max"),
+            "target_latency": config.get("target_latency"),
+        }
+        limiter = AdaptiveLimiter(
+            **{k: v for k, v in limiter_options.items() if v is not None}
+        )
+        return HostScheduler(
+            per_host_limit=config.get("per_host_limit", 2),
+            min_delay=config.get("delay", 0),
+            respect_robots=config.get("respect_robots", True),
+            user_agent=config.get("user_agent", "*"),
+            limiter=limiter,
+        )
+
+    @staticmethod
+    def _create_resilient_crawler(
+        crawler: BaseCrawler, config: Dict[str, Any]
+    ) -> ResilientCrawler:
+        """設定から再試行・ヘッジ・サーキットブレーカーのラッパーを生成"""
+        return ResilientCrawler(
+            crawler,
+            retry=RetryPolicy(attempts=config.get("retry_attempts", 3)),
+            breakers=BreakerRegistry(
+                failure_threshold=config.get("breaker_failures", 5),
+                reset_timeout=config.get("breaker_reset", 30.0),
+            ),
+            hedge_quantile=config.get("hedge_quantile", 0.95),
+        )
+
+    @staticmethod
+    def _create_content_cache(config: Dict[str, Any]) -> ContentCache:
+        """設定からコンテンツキャッシュを生成"""
+        options = {
+            "cache_dir": config.get("content_cache_dir"),
+            "freshness": config.get("content_cache_freshness"),
+            "max_bytes": config.get("content_cache_max_bytes"),
+        }
+        return ContentCache(**{k: v for k, v in options.items() if v is not None})
 
-        return crawler_class(config)
+    @classmethod
+    async def close_all(cls):
+        """共有クローラーをすべてクリーンアップ（アプリ終了時に呼び出す）"""
+        instances, cls._instances = cls._instances, {}
+        for crawler in instances.values():
+            result = crawler.cleanup()
+            if inspect.isawaitable(result):
+                await result
+        shutdown_extraction_pool()
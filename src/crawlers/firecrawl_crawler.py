@@ -1,35 +1,78 @@
 # src/crawlers/firecrawl_crawler.py
 from typing import Dict, Any, Optional
-from .base_crawler import BaseCrawler, CrawlResult
+from .base_crawler import BaseCrawler, CrawlResult, PooledSessionMixin
+import asyncio
 import aiohttp
 import json
-from contextlib import AsyncExitStack
+import logging
+from ..instrumentation import counter
+from ..resilience import CircuitBreaker, is_retryable_status
 
+logger = logging.getLogger(__name__)
 
-class FirecrawlCrawler(BaseCrawler):
-    """ローカルにホストされているFirecrawl APIを使用したクローラーの実装"""
+
+class FirecrawlCrawler(PooledSessionMixin, BaseCrawler):
+    """ローカルにホストされているFirecrawl APIを使用したクローラーの実装
+
+    1つのインスタンスがキープアライブ付きのTCPConnectorを保持し、
+    cleanup() が呼ばれるまで全てのリクエストで接続を再利用する。
+    """
 
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         super().__init__(config)
-        self.exit_stack = AsyncExitStack()
-        self.session = None
-        self.api_url = config.get("api_url", "http://localhost:3002/v1/scrape")
-        self.timeout = aiohttp.ClientTimeout(total=config.get("timeout", 60))
-
-    async def _init_session(self):
-        """aiohttpセッションの初期化"""
-        if not self.session:
-            self.session = await self.exit_stack.enter_async_context(
-                aiohttp.ClientSession(timeout=self.timeout)
+        self.api_url = self.config.get("api_url", "http://localhost:3002/v1/scrape")
+        # Firecrawl API自体のサーキットブレーカー（停止中は全URLをすぐに失敗させる）
+        self.breaker = CircuitBreaker(
+            failure_threshold=self.config.get("breaker_failures", 5),
+            reset_timeout=self.config.get("breaker_reset", 30.0),
+        )
+
+    async def _read_limited(self, response: aiohttp.ClientResponse) -> Optional[bytes]:
+        """レスポンスを max_bytes まで読み込む（超えた場合は読み込みを止めて None）"""
+        if (response.content_length or 0) > self.policy.max_bytes:
+            return None
+        buffer = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            buffer += chunk
+            if len(buffer) > self.policy.max_bytes:
+                return None
+        return bytes(buffer)
+
+    async def fetch_content(
+        self, url: str, validators: Optional[Dict[str, Any]] = None
+    ) -> CrawlResult:
+        """
+        Firecrawl APIを使用してウェブページのコンテンツを取得
+        （APIは条件付きGETに対応しないため validators は使わず、常に取得する）
+        """
+        if not self.breaker.allow():
+            counter("circuit_rejections_total", target="firecrawl")
+            return CrawlResult(
+                content="",
+                error="Firecrawl APIへの接続が続けて失敗しているため取得を省略しました",
+                metadata={"circuit_open": True},
             )
+        try:
+            result = await self._scrape(url)
+        except BaseException:
+            # キャンセルされた場合は結果を記録せずに試行を終える
+            self.breaker.release()
+            raise
+        # APIの障害（接続エラー・タイムアウト・5xx）のみをブレーカーに記録する
+        if (result.metadata or {}).get("transient"):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return result
 
-    async def fetch_content(self, url: str) -> CrawlResult:
-        """Firecrawl APIを使用してウェブページのコンテンツを取得"""
+    async def _scrape(self, url: str) -> CrawlResult:
+        """Firecrawl APIの呼び出し"""
         await self._init_session()
 
         try:
-            payload = {"url": url, "formats": ["markdown", "html"]}
-            print(f"APIリクエスト: {url}")
+            # 使うのはマークダウンの本文のみ（HTMLは要求しない）
+            payload = {"url": url, "formats": ["markdown"], "onlyMainContent": True}
+            logger.debug("APIリクエスト: %s", url)
             headers = {
                 "Content-Type": "application/json",
                 "User-Agent": self.config.get(
@@ -42,9 +85,15 @@ class FirecrawlCrawler(BaseCrawler):
                 self.api_url, headers=headers, json=payload
             ) as response:
                 if response.status == 200:
+                    body = await self._read_limited(response)
+                    if body is None:
+                        return CrawlResult(
+                            content="",
+                            error=f"APIレスポンスが大きすぎます（上限 {self.policy.max_bytes:,} バイト）",
+                        )
                     try:
-                        result = await response.json()
-                    except json.JSONDecodeError:
+                        result = json.loads(body)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
                         return CrawlResult(
                             content="", error="JSONパースエラー: 無効なレスポンス形式"
                         )
@@ -55,9 +104,7 @@ class FirecrawlCrawler(BaseCrawler):
                     # データの取得
                     data = result.get("data", {})
 
-                    content = data.get("markdown", "")  # マークダウンを優先
-                    if not content:
-                        content = data.get("html", "")  # マークダウンがない場合はHTML
+                    content = (data.get("markdown") or "")[: self.policy.max_chars]
 
                     metadata = data.get("metadata", {})
 
@@ -71,22 +118,31 @@ class FirecrawlCrawler(BaseCrawler):
                             "source_url": metadata.get("sourceURL"),
                             "og_title": metadata.get("ogTitle"),
                             "og_description": metadata.get("ogDescription"),
+                            "body_bytes": len(body),
                         },
                     )
                 else:
-                    error_text = await response.text()
+                    error_text = (await response.content.read(1000)).decode(
+                        "utf-8", errors="replace"
+                    )
                     return CrawlResult(
                         content="",
                         error=f"Firecrawl APIエラー: {response.status} - {error_text}",
+                        metadata={
+                            "status_code": response.status,
+                            "transient": is_retryable_status(response.status),
+                        },
                     )
 
-        except aiohttp.ClientError as e:
-            return CrawlResult(content="", error=f"API接続エラー: {str(e)}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return CrawlResult(
+                content="",
+                error=f"API接続エラー: {str(e) or type(e).__name__}",
+                metadata={"transient": True},
+            )
         except Exception as e:
             return CrawlResult(content="", error=f"予期せぬエラー: {str(e)}")
 
     async def cleanup(self):
         """セッションのクリーンアップ"""
-        if self.exit_stack:
-            await self.exit_stack.aclose()
-            self.session = None
+        await self._close_session()
@@ -0,0 +1,40 @@
+# src/crawlers/instrumented_crawler.py
+from typing import Any, Dict, Optional
+from .base_crawler import BaseCrawler, CrawlResult
+from ..instrumentation import counter, span
+
+
+class InstrumentedCrawler(BaseCrawler):
+    """
+    クローラーの取得ごとの所要時間・結果・取得バイト数を記録するラッパー。
+    スケジューラーの内側に置き、待ち行列での待ち時間を含めずに計測する。
+    """
+
+    def __init__(self, crawler: BaseCrawler, crawler_type: str):
+        super().__init__(crawler.config)
+        self.crawler = crawler
+        self.crawler_type = crawler_type
+
+    async def fetch_content(
+        self, url: str, validators: Optional[Dict[str, Any]] = None
+    ) -> CrawlResult:
+        """クローラーで取得し、スパンとカウンターを記録"""
+        async with span("crawler_fetch", crawler=self.crawler_type) as fetch_span:
+            result = await self.crawler.fetch_content(url, validators)
+            fetch_span.set(result="error" if result.error else "ok")
+        metadata = result.metadata or {}
+        counter(
+            "crawler_fetch_bytes_total",
+            metadata.get("body_bytes") or 0,
+            crawler=self.crawler_type,
+        )
+        counter(
+            "crawler_fetches_total",
+            crawler=self.crawler_type,
+            result="error" if result.error else "ok",
+        )
+        return result
+
+    async def cleanup(self):
+        """ラップしたクローラーのクリーンアップ"""
+        await self.crawler.cleanup()
@@ -0,0 +1,120 @@
+# src/crawlers/resilient_crawler.py
+import asyncio
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+from .base_crawler import BaseCrawler, CrawlResult
+from ..instrumentation import counter
+from ..resilience import (
+    BreakerRegistry,
+    LatencyTracker,
+    RetryPolicy,
+    hedged,
+    is_retryable_status,
+)
+
+
+def is_transient(result: CrawlResult) -> bool:
+    """再試行すれば成功する可能性がある失敗（接続エラー・タイムアウト・429/5xx）"""
+    if not result.error:
+        return False
+    metadata = result.metadata or {}
+    return bool(metadata.get("transient")) or is_retryable_status(
+        metadata.get("status_code")
+    )
+
+
+class ResilientCrawler(BaseCrawler):
+    """
+    ホストごとのサーキットブレーカー、一時的な失敗の再試行（指数バックオフ）、
+    遅い取得のヘッジ（p95を超えたら2つ目の取得を開始）を行うラッパー。
+    スケジューラーの外側に置き、再試行・ヘッジの取得もホストごとの制限に従わせる。
+    """
+
+    def __init__(
+        self,
+        crawler: BaseCrawler,
+        retry: Optional[RetryPolicy] = None,
+        breakers: Optional[BreakerRegistry] = None,
+        hedge_quantile: Optional[float] = 0.95,
+    ):
+        """
+        Parameters:
+            crawler (BaseCrawler): ラップするクローラー
+            retry (Optional[RetryPolicy]): 再試行の設定
+            breakers (Optional[BreakerRegistry]): ホストごとのサーキットブレーカー
+            hedge_quantile (Optional[float]): ヘッジを開始するレイテンシのパーセンタイル
+                （None ならヘッジしない）
+        """
+        super().__init__(crawler.config)
+        self.crawler = crawler
+        self.retry = retry or RetryPolicy()
+        self.breakers = breakers or BreakerRegistry()
+        self.hedge_quantile = hedge_quantile
+        self.latency = LatencyTracker()
+
+    async def _fetch_once(
+        self, url: str, validators: Optional[Dict[str, Any]]
+    ) -> CrawlResult:
+        """
+        1回の取得（成功した取得のレイテンシをヘッジの基準として記録する）。
+        スケジューラーが取得時間（service_time）を返した場合はそれを使い、
+        待ち行列の時間をレイテンシに含めない。
+        """
+        start = time.perf_counter()
+        result = await self.crawler.fetch_content(url, validators)
+        if not result.error:
+            service_time = (result.metadata or {}).get("service_time")
+            if service_time is None:
+                service_time = time.perf_counter() - start
+            self.latency.record(service_time)
+        return result
+
+    async def fetch_content(
+        self, url: str, validators: Optional[Dict[str, Any]] = None
+    ) -> CrawlResult:
+        """ブレーカーを確認し、ヘッジ・再試行しながら取得"""
+        host = urlsplit(url).netloc.lower()
+        breaker = self.breakers.get(host)
+        result = None
+        for retry in range(self.retry.attempts):
+            if not breaker.allow():
+                counter("circuit_rejections_total", target="crawler")
+                return CrawlResult(
+                    content="",
+                    error=f"ホストへの接続が続けて失敗しているため取得を省略しました: {host}",
+                    metadata={"circuit_open": True},
+                )
+            delay = (
+                self.latency.quantile(self.hedge_quantile)
+                if self.hedge_quantile is not None
+                else None
+            )
+            try:
+                result = await hedged(
+                    lambda: self._fetch_once(url, validators),
+                    delay,
+                    succeeded=lambda r: not r.error,
+                    name="crawler",
+                )
+            except BaseException:
+                # キャンセル（ストリーミングの打ち切りなど）はホストの失敗として扱わない
+                breaker.release()
+                raise
+            if not is_transient(result):
+                # 成功、または再試行しても変わらない失敗（404・対象外のコンテンツなど）
+                breaker.record_success()
+                return result
+            breaker.record_failure()
+            if retry + 1 < self.retry.attempts:
+                counter("retries_total", target="crawler")
+                await asyncio.sleep(self.retry.backoff(retry))
+        return result
+
+    def breaker_states(self):
+        """開いているブレーカー（ヘルスチェック用）"""
+        return self.breakers.open_keys()
+
+    async def cleanup(self):
+        """ラップしたクローラーのクリーンアップ"""
+        await self.crawler.cleanup()
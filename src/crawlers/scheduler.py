@@ -0,0 +1,402 @@
+# src/crawlers/scheduler.py
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+import aiohttp
+from .base_crawler import BaseCrawler, CrawlResult
+
+ROBOTS_CACHE_TTL = 60 * 60 * 24  # robots.txtのキャッシュ期間（秒）
+MAX_BACKOFF = 300  # バックオフの最大秒数
+BACKOFF_STATUSES = {429, 500, 502, 503, 504}
+MAX_HOSTS = (
+    4096  # 状態・robots.txtを保持する最大ホスト数（超えたら使われていない古い順に削除）
+)
+
+
+class RobotsDisallowed(Exception):
+    """robots.txtで取得が禁止されている"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-Afterヘッダー（秒数またはHTTP日付）を待機秒数に変換"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    AIMD方式で全体の同時実行数を調整するリミッター。
+    レイテンシが目標以下の成功が続く間は上限を少しずつ上げ、
+    429/5xxや目標を超える遅延が起きたら上限を半分に下げる。
+    """
+
+    def __init__(
+        self,
+        initial: int = 5,
+        minimum: int = 1,
+        maximum: int = 50,
+        target_latency: float = 5.0,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        """
+        Parameters:
+            initial (int): 初期の同時実行数
+            minimum (int): 同時実行数の下限
+            maximum (int): 同時実行数の上限
+            target_latency (float): 健全とみなすレイテンシ（秒）
+            decrease_factor (float): 減少時に掛ける係数
+            cooldown (float): 連続して減少させない間隔（秒）
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.inflight = 0
+        self.waiting = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        """同時実行数の上限に空きができるまで待機"""
+        async with self._condition:
+            self.waiting += 1
+            try:
+                await self._condition.wait_for(lambda: self.inflight < int(self.limit))
+            finally:
+                self.waiting -= 1
+            self.inflight += 1
+
+    async def release(self, latency: Optional[float] = None, congested: bool = False):
+        """
+        実行の完了を記録し、結果に応じて上限を調整する。
+
+        Parameters:
+            latency (Optional[float]): レスポンスまでの秒数（Noneなら上限を調整しない）
+            congested (bool): 429/5xxなど混雑を示すレスポンスだったかどうか
+        """
+        async with self._condition:
+            self.inflight -= 1
+            now = time.monotonic()
+            if congested or (latency is not None and latency > self.target_latency):
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            elif latency is not None:
+                # 加算的増加（上限に達するまで1回の完了ごとに 1/limit ずつ）
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+@dataclass
+class HostState:
+    """ホストごとのスケジューリング状態"""
+
+    semaphore: asyncio.Semaphore
+    crawl_delay: float = 0.0
+    next_allowed_at: float = 0.0
+    failures: int = 0
+    waiting: int = 0
+    active: int = 0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def idle(self) -> bool:
+        """待機中・実行中のリクエストがなく、バックオフ・取得間隔の待ちもない"""
+        return (
+            not self.waiting
+            and not self.active
+            and self.next_allowed_at <= time.monotonic()
+        )
+
+
+class HostSlot:
+    """1回の取得に割り当てられたスロット（結果のステータスを記録する）"""
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+        self.started_at = time.monotonic()  # 待ち行列を抜けて取得を始めた時刻
+
+    def service_time(self) -> float:
+        """取得を始めてからの秒数（スケジューラーの待ち時間を含まない）"""
+        return time.monotonic() - self.started_at
+
+    def record(self, status: Optional[int], retry_after: Optional[str] = None):
+        """レスポンスのステータスコードとRetry-Afterを記録"""
+        self.status = status
+        self.retry_after = parse_retry_after(retry_after)
+
+
+class RobotsCache:
+    """オリジンごとのrobots.txtのキャッシュ（max_entries を超えたら古い順に削除）"""
+
+    def __init__(
+        self,
+        user_agent: str = "*",
+        ttl: float = ROBOTS_CACHE_TTL,
+        max_entries: int = MAX_HOSTS,
+    ):
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._parsers: "OrderedDict[str, tuple[Optional[RobotFileParser], float]]" = (
+            OrderedDict()
+        )
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _cached(self, origin: str) -> Optional[tuple[Optional[RobotFileParser], float]]:
+        cached = self._parsers.get(origin)
+        if cached and time.monotonic() - cached[1] < self.ttl:
+            self._parsers.move_to_end(origin)
+            return cached
+        return None
+
+    async def get(self, origin: str) -> Optional[RobotFileParser]:
+        """オリジンのrobots.txtを取得（取得できない場合は None で全て許可）"""
+        cached = self._cached(origin)
+        if cached:
+            return cached[0]
+
+        lock = self._locks.setdefault(origin, asyncio.Lock())
+        async with lock:
+            cached = self._cached(origin)
+            if cached:
+                return cached[0]
+            parser = await self._fetch(origin)
+            self._parsers[origin] = (parser, time.monotonic())
+            self._parsers.move_to_end(origin)
+        # 取得が終わったロックは残さない（同時に待っている呼び出しがなければ削除）
+        if not lock.locked() and self._locks.get(origin) is lock:
+            del self._locks[origin]
+        self._evict()
+        return parser
+
+    def _evict(self):
+        """保持するオリジン数が上限を超えている間、最も古いエントリから削除"""
+        while len(self._parsers) > self.max_entries:
+            self._parsers.popitem(last=False)
+
+    async def _fetch(self, origin: str) -> Optional[RobotFileParser]:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+        try:
+            async with self.session.get(f"{origin}/robots.txt") as response:
+                if response.status >= 400:
+                    return None
+                text = await response.text(errors="replace")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+        parser = RobotFileParser()
+        parser.parse(text.splitlines())
+        return parser
+
+    async def close(self):
+        """セッションのクリーンアップ"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+
+class HostScheduler:
+    """
+    ホストごとのキューと同時実行数の上限を持つスケジューラー。
+    robots.txtのcrawl-delayを守り、429/5xxやRetry-Afterで自動的にバックオフし、
+    全体の同時実行数はレイテンシに応じてAIMD方式で調整する。
+    """
+
+    def __init__(
+        self,
+        per_host_limit: int = 2,
+        min_delay: float = 0.0,
+        respect_robots: bool = True,
+        user_agent: str = "*",
+        limiter: Optional[AdaptiveLimiter] = None,
+        max_hosts: int = MAX_HOSTS,
+    ):
+        """
+        Parameters:
+            per_host_limit (int): ホストごとの同時実行数
+            min_delay (float): 同じホストへのリクエスト間隔の最小値（秒）
+            respect_robots (bool): robots.txtに従うかどうか
+            user_agent (str): robots.txtの判定に使うユーザーエージェント
+            limiter (Optional[AdaptiveLimiter]): 全体の同時実行数のリミッター
+            max_hosts (int): 状態・robots.txtを保持する最大ホスト数
+                （超えたら使われていないホストを古い順に削除）
+        """
+        self.per_host_limit = per_host_limit
+        self.min_delay = min_delay
+        self.respect_robots = respect_robots
+        self.user_agent = user_agent
+        self.limiter = limiter or AdaptiveLimiter()
+        self.max_hosts = max_hosts
+        self.robots = RobotsCache(user_agent, max_entries=max_hosts)
+        self.hosts: "OrderedDict[str, HostState]" = OrderedDict()
+
+    def _host_state(self, host: str) -> HostState:
+        state = self.hosts.get(host)
+        if state is None:
+            state = HostState(
+                semaphore=asyncio.Semaphore(self.per_host_limit),
+                crawl_delay=self.min_delay,
+            )
+            self._evict_hosts()
+            self.hosts[host] = state
+        else:
+            self.hosts.move_to_end(host)
+        return state
+
+    def _evict_hosts(self):
+        """
+        ホスト数が上限を超えている間、使われていないホストの状態を古い順に削除する
+        （リクエスト中・バックオフ中のホストは残す）。
+        """
+        excess = len(self.hosts) + 1 - self.max_hosts  # これから追加する分を含める
+        if excess <= 0:
+            return
+        idle = []
+        for host, state in self.hosts.items():
+            if state.idle():
+                idle.append(host)
+                if len(idle) >= excess:
+                    break
+        for host in idle:
+            del self.hosts[host]
+
+    async def _check_robots(self, url: str) -> Optional[float]:
+        """robots.txtを確認し、crawl-delayを返す（指定がなければ None）"""
+        parts = urlsplit(url)
+        parser = await self.robots.get(f"{parts.scheme}://{parts.netloc}")
+        if parser is None:
+            return None
+        if not parser.can_fetch(self.user_agent, url):
+            raise RobotsDisallowed(f"robots.txtで禁止されています: {url}")
+        delay = parser.crawl_delay(self.user_agent)
+        return float(delay) if delay else None
+
+    async def _wait_turn(self, state: HostState):
+        """ホストへの次のリクエストが許可される時刻まで待機"""
+        async with state.lock:
+            wait = state.next_allowed_at - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            state.next_allowed_at = time.monotonic() + state.crawl_delay
+
+    def _record_result(self, state: HostState, slot: HostSlot) -> bool:
+        """結果に応じてホストのバックオフを更新（成功なら True）"""
+        if slot.status in BACKOFF_STATUSES:
+            state.failures += 1
+            backoff = slot.retry_after
+            if backoff is None:
+                backoff = min(MAX_BACKOFF, 2**state.failures)
+            state.next_allowed_at = max(
+                state.next_allowed_at, time.monotonic() + min(backoff, MAX_BACKOFF)
+            )
+            return False
+        state.failures = 0
+        return True
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[HostSlot]:
+        """
+        URLの取得を許可されるまで待機し、取得用のスロットを返す。
+
+        Raises:
+            RobotsDisallowed: robots.txtで取得が禁止されている場合
+        """
+        host = urlsplit(url).netloc.lower()
+        delay = await self._check_robots(url) if self.respect_robots else None
+        # 状態の取得から待機数の加算までの間に await を挟まない（削除されないように）
+        state = self._host_state(host)
+        if delay:
+            state.crawl_delay = max(self.min_delay, delay)
+
+        state.waiting += 1
+        try:
+            await state.semaphore.acquire()
+        finally:
+            state.waiting -= 1
+        state.active += 1
+        try:
+            await self._wait_turn(state)
+            await self.limiter.acquire()
+            slot = HostSlot()
+            latency: Optional[float] = None
+            congested = False
+            try:
+                yield slot
+                # レスポンスを受け取った場合のみ上限を調整する
+                # （キャンセルや接続エラーは混雑の兆候として扱わない）
+                if slot.status is not None:
+                    latency = slot.service_time()
+                congested = not self._record_result(state, slot)
+            finally:
+                await self.limiter.release(latency, congested)
+        finally:
+            state.active -= 1
+            state.semaphore.release()
+
+    def queue_depth(self) -> Dict[str, Any]:
+        """待機中のリクエスト数（ホストごと・全体）"""
+        per_host = {
+            host: state.waiting for host, state in self.hosts.items() if state.waiting
+        }
+        return {
+            "per_host": per_host,
+            "global_waiting": self.limiter.waiting,
+            "inflight": self.limiter.inflight,
+            "concurrency_limit": int(self.limiter.limit),
+        }
+
+    async def close(self):
+        """robots.txt取得用セッションのクリーンアップ"""
+        await self.robots.close()
+
+
+class ScheduledCrawler(BaseCrawler):
+    """ホストごとのスケジューラーを通してクローラーを呼び出すラッパー"""
+
+    def __init__(self, crawler: BaseCrawler, scheduler: HostScheduler):
+        super().__init__(crawler.config)
+        self.crawler = crawler
+        self.scheduler = scheduler
+
+    async def fetch_content(
+        self, url: str, validators: Optional[Dict[str, Any]] = None
+    ) -> CrawlResult:
+        """
+        スケジューラーの許可を待ってからクローラーで取得。
+        待ち時間を除いた取得時間を metadata の service_time に入れて返す。
+        """
+        try:
+            async with self.scheduler.slot(url) as slot:
+                result = await self.crawler.fetch_content(url, validators)
+                metadata = result.metadata or {}
+                slot.record(metadata.get("status_code"), metadata.get("retry_after"))
+                result.metadata = {**metadata, "service_time": slot.service_time()}
+                return result
+        except RobotsDisallowed as e:
+            return CrawlResult(content="", error=str(e))
+
+    async def cleanup(self):
+        """ラップしたクローラーとスケジューラーのクリーンアップ"""
+        await self.crawler.cleanup()
+        await self.scheduler.close()
@@ -1,47 +1,353 @@
 # src/crawlers/scrapy_crawler.py
+import asyncio
 import scrapy
-from scrapy.crawler import CrawlerProcess
+from scrapy.crawler import CrawlerRunner
 from scrapy import signals
-from scrapy.signalmanager import dispatcher
+from scrapy.exceptions import StopDownload
 from scrapy.settings import Settings
-from typing import Dict, Any, Optional
-from .base_crawler import BaseCrawler, CrawlResult
+from scrapy_user_agents.middlewares import RandomUserAgentMiddleware
+from typing import Dict, Any, List, Optional
+from .base_crawler import (
+    DEFAULT_TIMEOUT,
+    BaseCrawler,
+    CrawlResult,
+    FetchPolicy,
+    conditional_headers,
+)
+from ..extraction import format_content
+from ..extraction_pool import ExtractionError, ExtractionPool, get_extraction_pool
 
 SUPPORTED_BROWSERS = ["Chrome", "Firefox", "Safari", "Edge"]
+ASYNCIO_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 
 
 def filter_user_agent(ua):
     return any(browser in ua for browser in SUPPORTED_BROWSERS)
 
 
+class SharedRandomUserAgentMiddleware(RandomUserAgentMiddleware):
+    """
+    User-Agent一覧の解析結果をクロール間で共有する RandomUserAgentMiddleware。
+    一覧の解析には数秒かかり、常駐エンジンはバッチごとにクローラー
+    （ミドルウェア）を生成するため、設定が同じなら解析済みのものを再利用する。
+    """
+
+    _pickers: Dict[tuple, Any] = {}
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        key = (
+            settings.get("RANDOM_UA_FILE"),
+            settings.get("RANDOM_UA_TYPE", "desktop.chrome"),
+            settings.getbool("RANDOM_UA_SAME_OS_FAMILY", True),
+            settings.getbool("RANDOM_UA_PER_PROXY", False),
+            settings.get("RANDOM_UA_FALLBACK"),
+        )
+        picker = self._pickers.get(key)
+        if picker is None:
+            super().__init__(crawler)
+            self._pickers[key] = self.ua_picker
+        else:
+            self.ua_picker = picker
+
+
 class ContentSpider(scrapy.Spider):
     """ウェブページの内容を取得するSpider"""
 
     name = "content_spider"
 
-    def __init__(self, url, *args, **kwargs):
+    def __init__(
+        self,
+        url=None,
+        urls=None,
+        policy=None,
+        extraction=None,
+        validators=None,
+        *args,
+        **kwargs,
+    ):
         super(ContentSpider, self).__init__(*args, **kwargs)
-        self.start_urls = [url]
-
-    def parse(self, response):
-        """ページ内のすべてのテキストを抽出"""
-        content = {
-            "text": response.xpath("//body//text()").getall(),
-            "title": response.css("title::text").get(),
-            "meta": response.css('meta[name="description"]::attr(content)').get(),
+        self.start_urls = list(urls or []) + ([url] if url else [])
+        # URL -> キャッシュの検証情報（条件付きGETに使う）
+        self.validators = validators or {}
+        self.policy = policy or FetchPolicy()
+        self.extraction = extraction or ExtractionPool(workers=0)
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.on_headers, signal=signals.headers_received)
+        crawler.signals.connect(spider.on_bytes, signal=signals.bytes_received)
+        return spider
+
+    def on_headers(self, headers, body_length, request, spider):
+        """本文を受信する前に、対象外のコンテンツタイプやサイズのレスポンスを拒否"""
+        rejection = self.policy.check_headers(
+            headers.get("Content-Type", b"").decode("latin-1"),
+            str(body_length) if body_length and body_length > 0 else None,
+        )
+        if rejection:
+            request.meta["rejected"] = rejection
+            raise StopDownload(fail=True)
+
+    def on_bytes(self, data, request, spider):
+        """受信量が max_bytes に達したら残りを読まずに、そこまでの本文で解析する"""
+        received = request.meta.get("received_bytes", 0) + len(data)
+        request.meta["received_bytes"] = received
+        if received >= self.policy.max_bytes:
+            request.meta["body_truncated"] = True
+            raise StopDownload(fail=False)
+
+    def start_requests(self):
+        """元のURLをmetaに保持してリクエストを生成（リダイレクト後も結果を対応付けるため）"""
+        for url in self.start_urls:
+            yield scrapy.Request(
+                url,
+                callback=self.parse,
+                errback=self.handle_error,
+                headers=conditional_headers(self.validators.get(url)),
+                # 304 Not Modified もエラーにせず parse で受け取る
+                meta={"source_url": url, "handle_httpstatus_list": [304]},
+                dont_filter=True,
+            )
+
+    async def parse(self, response):
+        """
+        ページの本文を抽出（本文以外の要素を読み飛ばし、文字数の上限で打ち切る）。
+        大きなページは抽出プールのワーカープロセスで解析し、リアクターを止めない。
+        """
+        if response.status == 304:
+            yield {
+                "url": response.meta.get("source_url", response.url),
+                "content": "",
+                "status": 304,
+                "not_modified": True,
+            }
+            return
+
+        # 解析・計測とも AiohttpCrawler と同じく max_bytes までの本文を対象にする
+        body = response.body[: self.policy.max_bytes]
+        try:
+            extracted = await self.extraction.extract(
+                body,
+                encoding=getattr(response, "encoding", None),
+                max_chars=self.policy.max_chars,
+            )
+        except ExtractionError as e:
+            yield {
+                "url": response.meta.get("source_url", response.url),
+                "content": "",
+                "status": response.status,
+                "error": str(e),
+            }
+            return
+        full_content = format_content(extracted)
+
+        yield {
+            "url": response.meta.get("source_url", response.url),
+            "content": full_content,
+            "status": response.status,
+            "title": extracted.title,
+            "description": extracted.description,
+            "etag": response.headers.get("ETag", b"").decode("latin-1") or None,
+            "last_modified": response.headers.get("Last-Modified", b"").decode(
+                "latin-1"
+            )
+            or None,
+            "body_truncated": response.meta.get("body_truncated", False)
+            or len(response.body) > len(body),
+            "body_bytes": len(body),
         }
 
-        cleaned_text = [text.strip() for text in content["text"] if text.strip()]
-        full_content = "\n".join(
-            [
-                f"タイトル: {content['title']}" if content["title"] else "",
-                f"説明: {content['meta']}" if content["meta"] else "",
-                "本文:",
-                "\n".join(cleaned_text),
-            ]
-        ).strip()
+    def handle_error(self, failure):
+        """リクエスト失敗時にエラー情報をアイテムとして返す"""
+        request = failure.request
+        item = {
+            "url": request.meta.get("source_url", request.url),
+            "content": "",
+            "error": request.meta.get("rejected")
+            or f"リクエストエラー: {failure.getErrorMessage()}",
+        }
+        # HTTPエラーの場合はステータスとRetry-Afterを渡す（スケジューラーのバックオフ用）
+        response = getattr(failure.value, "response", None)
+        if response is not None:
+            item["status"] = response.status
+            item["retry_after"] = (
+                response.headers.get("Retry-After", b"").decode("latin-1") or None
+            )
+        elif not request.meta.get("rejected"):
+            # 接続エラー・タイムアウト（再試行の対象）
+            item["transient"] = True
+        yield item
+
+
+class ScrapyEngine:
+    """asyncioリアクター上で常駐し、URLをまとめて1回のクロールで取得するエンジン
+
+    fetch_content から投入されたURLを batch_window 秒だけ溜めてから
+    1つのクロールとしてスケジュールし、URLごとの Future を CrawlResult で解決する。
+    ドメインごとの並列数やDOWNLOAD_DELAYはScrapy自身のスロット管理に任せる。
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        batch_window: float = 0.05,
+        policy: Optional[FetchPolicy] = None,
+        extraction: Optional[ExtractionPool] = None,
+    ):
+        self.settings = settings
+        self.batch_window = batch_window
+        self.policy = policy or FetchPolicy()
+        self.extraction = extraction
+        self.closed = False
+        self._runner: Optional[CrawlerRunner] = None
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        # URL -> 条件付きGETの検証情報（同じURLの呼び出し元の間で異なる場合は None）
+        self._validators: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._crawls: set = set()
+
+    def _ensure_reactor(self):
+        """実行中のasyncioループ上でTwistedリアクターを起動"""
+        if self._runner is not None:
+            return
+
+        from twisted.internet import asyncioreactor, error
+
+        loop = asyncio.get_running_loop()
+        try:
+            asyncioreactor.install(eventloop=loop)
+        except error.ReactorAlreadyInstalledError:
+            pass
+
+        from twisted.internet import reactor
+
+        if getattr(reactor, "_asyncioEventloop", None) is not loop:
+            raise RuntimeError(
+                "Twistedリアクターが別のイベントループに既にインストールされています"
+            )
+        if not reactor.running:
+            reactor.startRunning(installSignalHandlers=False)
+
+        self._runner = CrawlerRunner(self.settings)
+
+    def submit(
+        self, url: str, validators: Optional[Dict[str, Any]] = None
+    ) -> asyncio.Future:
+        """URLをバッチに追加し、結果を受け取るFutureを返す"""
+        if self.closed:
+            raise RuntimeError("Scrapyエンジンは既に停止しています")
+        self._ensure_reactor()
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if url not in self._pending:
+            self._validators[url] = validators
+        elif self._validators.get(url) != validators:
+            # 304 を受け取れない呼び出し元があるため、通常のGETにする
+            self._validators[url] = None
+        self._pending.setdefault(url, []).append(future)
 
-        yield {"content": full_content}
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return future
+
+    def _flush(self):
+        """溜まったURLを1つのクロールとして開始"""
+        self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        validators, self._validators = self._validators, {}
+        task = asyncio.ensure_future(self._crawl(batch, validators))
+        self._crawls.add(task)
+        task.add_done_callback(self._crawls.discard)
+
+    async def _crawl(
+        self,
+        batch: Dict[str, List[asyncio.Future]],
+        validators: Dict[str, Optional[Dict[str, Any]]],
+    ):
+        """バッチ内の全URLを1つのクロールで取得"""
+        from scrapy.utils.defer import deferred_to_future
+
+        def resolve(url: str, result: CrawlResult):
+            for future in batch.get(url, []):
+                if not future.done():
+                    future.set_result(result)
+
+        def collect_content(item, response, spider):
+            resolve(
+                item["url"],
+                CrawlResult(
+                    content=item.get("content", ""),
+                    title=item.get("title"),
+                    description=item.get("description"),
+                    metadata={
+                        "etag": item.get("etag"),
+                        "last_modified": item.get("last_modified"),
+                        "status_code": item.get("status"),
+                        "retry_after": item.get("retry_after"),
+                        "body_truncated": item.get("body_truncated"),
+                        "body_bytes": item.get("body_bytes", 0),
+                        "transient": item.get("transient", False),
+                        "not_modified": item.get("not_modified", False),
+                    },
+                    error=item.get("error"),
+                ),
+            )
+
+        crawler = self._runner.create_crawler(ContentSpider)
+        crawler.signals.connect(collect_content, signal=signals.item_scraped)
+
+        error = "コンテンツが見つかりませんでした"
+        try:
+            await deferred_to_future(
+                self._runner.crawl(
+                    crawler,
+                    urls=list(batch),
+                    policy=self.policy,
+                    extraction=self.extraction,
+                    validators=validators,
+                )
+            )
+        except Exception as e:
+            error = f"クロールエラー: {str(e)}"
+        finally:
+            # アイテムが得られなかったURLはエラーとして解決する
+            for url in batch:
+                resolve(url, CrawlResult(content="", error=error))
+
+    async def close(self):
+        """待機中のバッチを流し切り、実行中のクロールの完了を待って停止"""
+        self.closed = True
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush()
+        if self._crawls:
+            await asyncio.gather(*self._crawls, return_exceptions=True)
+
+        if self._runner is not None:
+            from twisted.internet import reactor
+
+            # リアクターのスレッドプール（DNS解決用）を停止する
+            if reactor.threadpool is not None:
+                reactor.threadpool.stop()
+                reactor.threadpool = None
+            self._runner = None
+
+
+# プロセス全体で共有するScrapyエンジン
+_engine: Optional[ScrapyEngine] = None
+
+
+async def shutdown_engine():
+    """共有Scrapyエンジンを停止"""
+    global _engine
+    if _engine is not None:
+        await _engine.close()
+        _engine = None
 
 
 class ScrapyCrawler(BaseCrawler):
@@ -49,7 +355,6 @@ class ScrapyCrawler(BaseCrawler):
 
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         super().__init__(config)
-        self.contents = []
 
         # Scrapy設定の初期化
         self.settings = Settings()
@@ -68,12 +373,23 @@ class ScrapyCrawler(BaseCrawler):
         self.settings.set("ROBOTSTXT_OBEY", self.config.get("respect_robots", False))
         self.settings.set("DOWNLOAD_DELAY", self.config.get("delay", 2))
 
+        # 常駐エンジン用の設定（DOWNLOAD_DELAYはドメインごとのスロットに適用される）
+        self.settings.set("TWISTED_REACTOR", ASYNCIO_REACTOR)
+        self.settings.set(
+            "CONCURRENT_REQUESTS", self.config.get("concurrent_requests", 16)
+        )
+        self.settings.set(
+            "CONCURRENT_REQUESTS_PER_DOMAIN",
+            self.config.get("concurrent_requests_per_domain", 2),
+        )
+        self.settings.set("TELNETCONSOLE_ENABLED", False)
+
         # DOWNLOADER_MIDDLEWARESを追加
         self.settings.set(
             "DOWNLOADER_MIDDLEWARES",
             {
                 "scrapy.downloadermiddlewares.useragent.UserAgentMiddleware": None,
-                "scrapy_user_agents.middlewares.RandomUserAgentMiddleware": 400,
+                SharedRandomUserAgentMiddleware: 400,
                 "scrapy.downloadermiddlewares.retry.RetryMiddleware": 90,
                 "scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware": 110,
             },
@@ -83,7 +399,16 @@ class ScrapyCrawler(BaseCrawler):
         )
 
         self.settings.set("COOKIES_ENABLED", True)
-        self.settings.set("DOWNLOAD_TIMEOUT", 180)
+        # Scrapyには接続・読み込みを分けたタイムアウトがないため、全体の上限のみ設定する
+        self.settings.set(
+            "DOWNLOAD_TIMEOUT", self.config.get("timeout", DEFAULT_TIMEOUT)
+        )
+        # 再試行を ResilientCrawler が行う場合はScrapyの再試行を無効にする（二重の再試行を防ぐ）
+        self.settings.set("RETRY_ENABLED", not self.config.get("resilience", False))
+        # 受信は max_bytes で打ち切る（bytes_received）。圧縮展開後のサイズの上限として
+        # DOWNLOAD_MAXSIZE にも余裕を持たせた値を設定する
+        self.settings.set("DOWNLOAD_MAXSIZE", self.policy.max_bytes * 8)
+        self.settings.set("DOWNLOAD_WARNSIZE", self.policy.max_bytes * 4)
 
         self.settings.set(
             "DEFAULT_REQUEST_HEADERS",
@@ -96,23 +421,24 @@ class ScrapyCrawler(BaseCrawler):
             },
         )
 
-    async def fetch_content(self, url: str) -> CrawlResult:
-        """Scrapyを使用してウェブページのコンテンツを取得"""
-        self.contents = []
-
-        def collect_content(item, response, spider):
-            self.contents.append(item["content"])
-
-        dispatcher.connect(collect_content, signal=signals.item_scraped)
-
-        process = CrawlerProcess(self.settings)
-        process.crawl(ContentSpider, url=url)
-        process.start()
+    def _get_engine(self) -> ScrapyEngine:
+        """共有Scrapyエンジンを取得（未起動なら生成）"""
+        global _engine
+        if _engine is None or _engine.closed:
+            _engine = ScrapyEngine(
+                self.settings,
+                batch_window=self.config.get("batch_window", 0.05),
+                policy=self.policy,
+                extraction=get_extraction_pool(self.config),
+            )
+        return _engine
 
-        if self.contents:
-            return CrawlResult(content=self.contents[0])
-        return CrawlResult(content="", error="コンテンツが見つかりませんでした")
+    async def fetch_content(
+        self, url: str, validators: Optional[Dict[str, Any]] = None
+    ) -> CrawlResult:
+        """共有Scrapyエンジンを使用してウェブページのコンテンツを取得"""
+        return await self._get_engine().submit(url, validators)
 
-    def cleanup(self):
-        """リソースのクリーンアップ"""
-        self.contents = []
+    async def cleanup(self):
+        """リソースのクリーンアップ（共有Scrapyエンジンを停止）"""
+        await shutdown_engine()
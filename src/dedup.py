@@ -0,0 +1,240 @@
+# src/dedup.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from .ranking import tokenize
+from .url_utils import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+MAX_FINGERPRINT_CHARS = 20000  # フィンガープリントに使う先頭の文字数
+
+
+def _lane_table() -> List[int]:
+    """1バイトの各ビットを16ビット幅のレーンに展開する変換表"""
+    table = []
+    for byte in range(256):
+        value = 0
+        for bit in range(8):
+            if byte >> bit & 1:
+                value |= 1 << (16 * bit)
+        table.append(value)
+    return table
+
+
+LANE_TABLE = _lane_table()
+LANE_MASK = (1 << 16) - 1
+
+
+def simhash(text: str) -> int:
+    """
+    テキストの64ビットSimHashを計算する。
+    トークンの3-gramをハッシュ化し、ビットごとの出現数の多数決で値を決める。
+    ビットごとの集計は16ビット幅のレーンに詰めた整数の加算でまとめて行う。
+    """
+    tokens = tokenize(text[:MAX_FINGERPRINT_CHARS])
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = {" ".join(tokens)} if tokens else set()
+    else:
+        shingles = {
+            " ".join(tokens[i : i + SHINGLE_SIZE])
+            for i in range(len(tokens) - SHINGLE_SIZE + 1)
+        }
+    if not shingles:
+        return 0
+
+    # バイト位置ごとに、各ビットの出現数をレーン単位で加算する
+    lanes = [0] * (FINGERPRINT_BITS // 8)
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+        for i, byte in enumerate(digest):
+            lanes[i] += LANE_TABLE[byte]
+
+    threshold = len(shingles) / 2
+    fingerprint = 0
+    for i, lane in enumerate(lanes):
+        for bit in range(8):
+            if (lane >> (16 * bit)) & LANE_MASK > threshold:
+                fingerprint |= 1 << (8 * i + bit)
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """2つのフィンガープリントの異なるビット数"""
+    return bin(a ^ b).count("1")
+
+
+def canonical_duplicates(urls: List[str]) -> Dict[int, int]:
+    """
+    正規URLが同じものを重複として検出する（取得前に使用）。
+
+    Returns:
+        Dict[int, int]: 重複したURLのインデックス -> 代表（最初に現れた）URLのインデックス
+    """
+    first: Dict[str, int] = {}
+    duplicates = {}
+    for i, url in enumerate(urls):
+        key = canonicalize_url(url)
+        if key in first:
+            duplicates[i] = first[key]
+        else:
+            first[key] = i
+    return duplicates
+
+
+def content_duplicates(
+    fingerprints: Dict[int, int], max_distance: int = 3
+) -> Dict[int, int]:
+    """
+    フィンガープリントが近いページを重複として検出する（取得後に使用）。
+
+    Parameters:
+        fingerprints (Dict[int, int]): ソースのインデックス -> フィンガープリント
+        max_distance (int): 重複とみなす最大ハミング距離
+
+    Returns:
+        Dict[int, int]: 重複したソースのインデックス -> 代表ソースのインデックス
+    """
+    duplicates: Dict[int, int] = {}
+    kept: List[int] = []
+    for index in sorted(fingerprints):
+        for representative in kept:
+            if (
+                hamming_distance(fingerprints[index], fingerprints[representative])
+                <= max_distance
+            ):
+                duplicates[index] = representative
+                break
+        else:
+            kept.append(index)
+    return duplicates
+
+
+class SimHashIndex:
+    """
+    URLごとのフィンガープリントを保持するインデックス。
+    取得前の重複検出（known_duplicates）で、過去に取得したURLの内容を照合する。
+    SQLiteに保存し、save() では前回の保存以降に変更された分だけを書き込む。
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_entries: int = 100000):
+        """
+        Parameters:
+            path (Optional[Path]): 保存先のSQLiteファイル（Noneなら保存しない）
+            max_entries (int): 保持する最大URL数（超えた分は古い順に削除）
+        """
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.fingerprints: Dict[str, int] = {}
+        # 未保存の変更（正規URL -> フィンガープリント、削除は None）
+        self._pending: Dict[str, Optional[int]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if self.path and self.path.exists():
+            self.load()
+
+    def _connect(self) -> sqlite3.Connection:
+        """スレッド・プロセスごとの接続を取得"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                " key TEXT PRIMARY KEY,"
+                " fingerprint TEXT NOT NULL,"
+                " added_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def add(self, url: str, fingerprint: int):
+        """URLのフィンガープリントを登録"""
+        key = canonicalize_url(url)
+        with self._lock:
+            self.fingerprints.pop(key, None)  # 登録し直したURLを最新として扱う
+            self.fingerprints[key] = fingerprint
+            self._pending[key] = fingerprint
+            while len(self.fingerprints) > self.max_entries:
+                oldest = next(iter(self.fingerprints))
+                del self.fingerprints[oldest]
+                self._pending[oldest] = None
+
+    def get(self, url: str) -> Optional[int]:
+        """URLの登録済みフィンガープリント"""
+        return self.fingerprints.get(canonicalize_url(url))
+
+    def known_duplicates(
+        self, urls: List[str], max_distance: int = 3
+    ) -> Dict[int, int]:
+        """
+        過去に取得した内容から、URLリスト内の重複を取得前に検出する。
+
+        Returns:
+            Dict[int, int]: 重複したURLのインデックス -> 代表URLのインデックス
+        """
+        fingerprints = {}
+        for i, url in enumerate(urls):
+            fingerprint = self.get(url)
+            if fingerprint is not None:
+                fingerprints[i] = fingerprint
+        return content_duplicates(fingerprints, max_distance)
+
+    def load(self):
+        """ファイルからインデックスを読み込む"""
+        try:
+            rows = (
+                self._connect()
+                .execute("SELECT key, fingerprint FROM fingerprints ORDER BY added_at")
+                .fetchall()
+            )
+        except sqlite3.Error as e:
+            logger.warning(
+                "重複検出インデックスの読み込み中にエラーが発生しました: %s", e
+            )
+            return
+        self.fingerprints = {key: int(fingerprint, 16) for key, fingerprint in rows}
+
+    def save(self):
+        """
+        前回の保存以降の変更をファイルに書き込む。
+        変更分だけの書き込みのため、イベントループからは asyncio.to_thread で呼び出せる。
+        """
+        if self.path is None:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO fingerprints (key, fingerprint, added_at)"
+                    " VALUES (?, ?, ?)",
+                    [
+                        (key, f"{fp:016x}", now)
+                        for key, fp in pending.items()
+                        if fp is not None
+                    ],
+                )
+                conn.executemany(
+                    "DELETE FROM fingerprints WHERE key = ?",
+                    [(key,) for key, fp in pending.items() if fp is None],
+                )
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("重複検出インデックスの保存中にエラーが発生しました: %s", e)
+            with self._lock:  # 次回の保存で書き込み直す（その後の変更を優先）
+                self._pending = {**pending, **self._pending}
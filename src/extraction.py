@@ -0,0 +1,328 @@
+# src/extraction.py
+import codecs
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Union
+from lxml import etree
+from lxml import html as lxml_html
+
+DEFAULT_MAX_CHARS = 20000
+
+# 本文として扱わない要素（サブツリーごと読み飛ばす）
+SKIP_TAGS = {
+    "head",
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "nav",
+    "header",
+    "footer",
+    "aside",
+    "form",
+    "button",
+    "select",
+    "iframe",
+    "svg",
+    "canvas",
+}
+
+# 改行で区切るブロック要素
+BLOCK_TAGS = {
+    "address",
+    "article",
+    "blockquote",
+    "br",
+    "dd",
+    "div",
+    "dl",
+    "dt",
+    "figcaption",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "hr",
+    "li",
+    "main",
+    "ol",
+    "p",
+    "pre",
+    "section",
+    "table",
+    "td",
+    "th",
+    "tr",
+    "ul",
+}
+
+# class のいずれかのトークン、または id がこれらに一致する要素は定型部分
+# （メニューや広告など）として読み飛ばす。"has-sidebar" のような修飾のクラスを
+# 誤って除外しないよう、部分一致ではなくトークン全体で比較する
+BOILERPLATE_TOKENS = frozenset(
+    {
+        "nav",
+        "navbar",
+        "navigation",
+        "menu",
+        "sidebar",
+        "footer",
+        "site-footer",
+        "header",
+        "site-header",
+        "breadcrumb",
+        "breadcrumbs",
+        "cookie",
+        "cookie-banner",
+        "cookie-consent",
+        "consent",
+        "advert",
+        "advertisement",
+        "ad",
+        "ads",
+        "share",
+        "share-buttons",
+        "social",
+        "social-share",
+        "related",
+        "related-posts",
+        "popup",
+        "modal",
+        "banner",
+    }
+)
+# 定型部分に見えても、ページのテキストのこの割合以上を含む要素は読み飛ばさない
+BOILERPLATE_MAX_SHARE = 0.5
+# 定型部分に見えても、リンク以外のテキストがこの文字数以上ある要素は読み飛ばさない
+BOILERPLATE_MAX_TEXT_CHARS = 500
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# <meta charset="..."> / <meta http-equiv="Content-Type" content="...; charset=...">
+META_CHARSET_PATTERN = re.compile(
+    rb"<meta[^>]+charset\s*=\s*[\"']?\s*([a-zA-Z0-9_.:-]+)", re.IGNORECASE
+)
+XML_DECLARATION_PATTERN = re.compile(r"^\s*<\?xml[^>]*\?>")
+CHARSET_SNIFF_BYTES = 4096  # metaタグを探す先頭のバイト数
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+
+@dataclass
+class ExtractedContent:
+    """HTMLから抽出した本文とメタ情報"""
+
+    text: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    truncated: bool = False  # 文字数の上限で抽出を打ち切ったかどうか
+
+
+def _find_main_content(root: etree._Element) -> etree._Element:
+    """本文を含む要素を推定（main > role=main > 単一のarticle > body）"""
+    for candidates in (
+        root.xpath("//main"),
+        root.xpath("//*[@role='main']"),
+    ):
+        if candidates:
+            return candidates[0]
+
+    articles = root.xpath("//article")
+    if len(articles) == 1:
+        return articles[0]
+
+    body = root.find("body")
+    return body if body is not None else root
+
+
+def _has_boilerplate_name(element: etree._Element) -> bool:
+    """class のトークンまたは id が定型部分の名前に一致するかどうか"""
+    tokens = element.get("class", "").lower().split()
+    element_id = element.get("id", "").strip().lower()
+    if element_id:
+        tokens.append(element_id)
+    return any(token in BOILERPLATE_TOKENS for token in tokens)
+
+
+def _is_boilerplate(element: etree._Element, page_chars: int) -> bool:
+    """
+    class/id とテキストの量から定型部分の要素かどうかを判定する。
+    名前が一致しても、ページの本文の大半を含む要素や、リンク以外のテキストが
+    多い要素（本文のラッパー）は定型部分とみなさない。
+
+    Parameters:
+        page_chars (int): 本文を含む要素全体のテキストの文字数
+    """
+    if not _has_boilerplate_name(element):
+        return False
+    text_chars = len(WHITESPACE_PATTERN.sub(" ", element.text_content()).strip())
+    if page_chars and text_chars >= page_chars * BOILERPLATE_MAX_SHARE:
+        return False
+    link_chars = sum(
+        len(WHITESPACE_PATTERN.sub(" ", link.text_content()).strip())
+        for link in element.iter("a")
+    )
+    return text_chars - link_chars < BOILERPLATE_MAX_TEXT_CHARS
+
+
+def _collect_text(content_root: etree._Element, max_chars: int) -> tuple[str, bool]:
+    """本文以外のサブツリーを読み飛ばしながらテキストを収集（上限に達したら打ち切る）"""
+    lines: List[str] = []
+    line: List[str] = []
+    total = 0
+    truncated = False
+    page_chars: Optional[int] = None  # 定型部分の候補が見つかった時点で数える
+
+    def add(text: Optional[str]):
+        nonlocal total
+        if text:
+            text = WHITESPACE_PATTERN.sub(" ", text)
+            if text.strip():
+                line.append(text)
+                total += len(text)
+
+    def break_line():
+        if line:
+            joined = "".join(line).strip()
+            if joined:
+                lines.append(joined)
+            line.clear()
+
+    walker = etree.iterwalk(content_root, events=("start", "end", "comment", "pi"))
+    for event, element in walker:
+        if event in ("comment", "pi"):
+            add(element.tail)
+        elif event == "start":
+            tag = element.tag if isinstance(element.tag, str) else ""
+            if tag in SKIP_TAGS:
+                walker.skip_subtree()
+                continue
+            if element is not content_root and _has_boilerplate_name(element):
+                if page_chars is None:
+                    page_chars = len(
+                        WHITESPACE_PATTERN.sub(" ", content_root.text_content()).strip()
+                    )
+                if _is_boilerplate(element, page_chars):
+                    walker.skip_subtree()
+                    continue
+            if tag in BLOCK_TAGS:
+                break_line()
+            add(element.text)
+        else:
+            if element is content_root:
+                break
+            if element.tag in BLOCK_TAGS:
+                break_line()
+            add(element.tail)
+
+        if total >= max_chars:
+            truncated = True
+            break
+
+    break_line()
+    text = "\n".join(lines)
+    return text[:max_chars].rstrip(), truncated
+
+
+def _valid_encoding(name: Optional[str]) -> Optional[str]:
+    """Pythonで扱える文字コード名なら正規化して返す"""
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name.strip().strip("\"'")).name
+    except LookupError:
+        return None
+
+
+def sniff_encoding(body: bytes, content_type: Optional[str] = None) -> str:
+    """
+    HTMLのバイト列の文字コードを判定する。
+    BOM、Content-Typeヘッダーのcharset、先頭部分のmetaタグの順に確認し、
+    いずれもなければUTF-8とみなす。
+    """
+    for bom, name in BOMS:
+        if body.startswith(bom):
+            return name
+
+    if content_type:
+        for param in content_type.split(";")[1:]:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "charset":
+                encoding = _valid_encoding(value)
+                if encoding:
+                    return encoding
+
+    match = META_CHARSET_PATTERN.search(body[:CHARSET_SNIFF_BYTES])
+    if match:
+        encoding = _valid_encoding(match.group(1).decode("ascii", "ignore"))
+        if encoding:
+            return encoding
+    return "utf-8"
+
+
+def decode_html(body: bytes, content_type: Optional[str] = None) -> str:
+    """
+    判定した文字コードでHTMLを文字列に変換する。
+    lxmlは文字コード宣言付きの文字列を受け付けないため、XML宣言は取り除く。
+    """
+    text = body.decode(sniff_encoding(body, content_type), errors="replace")
+    return XML_DECLARATION_PATTERN.sub("", text, count=1).lstrip("\ufeff")
+
+
+def extract_content(
+    html: Union[str, bytes],
+    max_chars: int = DEFAULT_MAX_CHARS,
+    encoding: Optional[str] = None,
+) -> ExtractedContent:
+    """
+    HTMLから本文テキストを抽出する。
+    script/style やナビゲーションなどのサブツリーを読み飛ばし、
+    max_chars に達した時点で抽出を打ち切る。
+
+    Parameters:
+        html (Union[str, bytes]): HTML文字列またはバイト列
+        max_chars (int): 抽出する最大文字数
+        encoding (Optional[str]): バイト列の文字コード（省略時はmetaタグから判定）
+
+    Returns:
+        ExtractedContent: 抽出した本文とタイトル・説明
+    """
+    if not html:
+        return ExtractedContent(text="")
+
+    try:
+        if isinstance(html, bytes) and encoding:
+            parser = lxml_html.HTMLParser(encoding=encoding)
+            root = lxml_html.document_fromstring(html, parser=parser)
+        else:
+            root = lxml_html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return ExtractedContent(text="")
+
+    title = root.findtext(".//title")
+    descriptions = root.xpath("//meta[@name='description']/@content")
+    text, truncated = _collect_text(_find_main_content(root), max_chars)
+
+    return ExtractedContent(
+        text=text,
+        title=title.strip() if title else None,
+        description=descriptions[0].strip() if descriptions else None,
+        truncated=truncated,
+    )
+
+
+def format_content(extracted: ExtractedContent) -> str:
+    """抽出結果をタイトル・説明・本文をまとめたテキストに整形"""
+    return "\n".join(
+        [
+            f"タイトル: {extracted.title}" if extracted.title else "",
+            f"説明: {extracted.description}" if extracted.description else "",
+            "本文:",
+            extracted.text,
+        ]
+    ).strip()
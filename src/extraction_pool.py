@@ -0,0 +1,186 @@
+# src/extraction_pool.py
+"""
+本文抽出（HTMLの解析）をプロセスプールで実行するステージ。
+
+lxmlによる解析はCPUを使い、イベントループ上で大きなページを解析すると
+実行中の他の取得やストリーミングが止まる。このモジュールは本文のバイト列を
+ワーカープロセスに渡し、抽出結果（ExtractedContent）だけを受け取る。
+
+- 小さなページ（inline_bytes 未満）はシリアライズのコストの方が大きいため、
+  イベントループ上でそのまま抽出する
+- プールに投入中の抽出の数を max_pending で制限し、超えた分は空きを待つ
+  （取得の速度が抽出の速度を上回ったときのバックプレッシャー）
+- ワーカーが異常終了してプールが壊れた場合は、プールを作り直し、
+  その抽出だけはイベントループ上で行う
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+from .extraction import (
+    DEFAULT_MAX_CHARS,
+    ExtractedContent,
+    decode_html,
+    extract_content,
+)
+from .instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INLINE_BYTES = 64 * 1024  # これ未満のページはイベントループ上で抽出する
+
+
+class ExtractionError(Exception):
+    """本文の抽出に失敗した（クローラーはこれを CrawlResult のエラーに変換する）"""
+
+
+def extract_from_bytes(
+    body: bytes,
+    content_type: Optional[str] = None,
+    encoding: Optional[str] = None,
+    max_chars: int = DEFAULT_MAX_CHARS,
+) -> ExtractedContent:
+    """
+    本文のバイト列から抽出する（ワーカープロセスで実行される）。
+    encoding があればそのまま lxml に渡し、なければ Content-Type とmetaタグから判定する。
+    """
+    if encoding:
+        return extract_content(body, max_chars=max_chars, encoding=encoding)
+    return extract_content(decode_html(body, content_type), max_chars=max_chars)
+
+
+class ExtractionPool:
+    """本文抽出用のプロセスプール（ワーカーは最初の抽出時に起動する）"""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        inline_bytes: int = DEFAULT_INLINE_BYTES,
+        max_pending: Optional[int] = None,
+    ):
+        """
+        Parameters:
+            workers (Optional[int]): ワーカープロセス数（None ならCPU数、0 なら常にイベントループ上で抽出）
+            inline_bytes (int): これ未満のページはイベントループ上で抽出する
+            max_pending (Optional[int]): プールに投入中の抽出の上限（None ならワーカー数の4倍）
+        """
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.inline_bytes = inline_bytes
+        self.max_pending = max_pending or max(1, self.workers) * 4
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.waiting = 0  # 投入の空きを待っている抽出の数
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ExtractionPool":
+        """クローラーの設定（extraction_workers, extraction_inline_bytes, extraction_max_pending）から生成"""
+        return cls(
+            workers=config.get("extraction_workers"),
+            inline_bytes=config.get("extraction_inline_bytes", DEFAULT_INLINE_BYTES),
+            max_pending=config.get("extraction_max_pending"),
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """プロセスプールを取得（未起動なら生成）"""
+        if self.executor is None:
+            # イベントループやTwistedのスレッドを複製しないよう spawn で起動する
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self.executor
+
+    async def extract(
+        self,
+        body: bytes,
+        content_type: Optional[str] = None,
+        encoding: Optional[str] = None,
+        max_chars: int = DEFAULT_MAX_CHARS,
+    ) -> ExtractedContent:
+        """
+        本文を抽出（大きなページはワーカープロセスで、小さなページはその場で）。
+        解析中の例外は ExtractionError として送出する。
+        """
+        try:
+            return await self._extract(body, content_type, encoding, max_chars)
+        except Exception as e:
+            raise ExtractionError(
+                f"本文の抽出に失敗しました: {str(e) or type(e).__name__}"
+            ) from e
+
+    async def _extract(
+        self,
+        body: bytes,
+        content_type: Optional[str],
+        encoding: Optional[str],
+        max_chars: int,
+    ) -> ExtractedContent:
+        """抽出の本体（プールが壊れていたら作り直し、その抽出はその場で行う）"""
+        if self.workers <= 0 or len(body) < self.inline_bytes:
+            with span("extraction", mode="inline"):
+                return extract_from_bytes(body, content_type, encoding, max_chars)
+
+        executor = self._get_executor()
+        slots = self._slots
+        self.waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            async with span("extraction", mode="pool"):
+                return await asyncio.get_running_loop().run_in_executor(
+                    executor,
+                    extract_from_bytes,
+                    body,
+                    content_type,
+                    encoding,
+                    max_chars,
+                )
+        except BrokenProcessPool:
+            logger.warning("抽出ワーカーが異常終了しました。プールを作り直します")
+            self._discard(executor)
+        finally:
+            slots.release()
+
+        with span("extraction", mode="inline"):
+            return extract_from_bytes(body, content_type, encoding, max_chars)
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        """壊れたプロセスプールを破棄（次の抽出で新しいプールを起動する）"""
+        if self.executor is executor:
+            self.executor = None
+            self._slots = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        """ワーカープロセスを停止（実行中の抽出は待たない）"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self._slots = None
+
+
+# プロセス全体で共有する抽出プール（初回使用時の設定で生成する）
+_pool: Optional[ExtractionPool] = None
+
+
+def get_extraction_pool(config: Dict[str, Any]) -> ExtractionPool:
+    """共有の抽出プールを取得（未生成なら生成）"""
+    global _pool
+    if _pool is None:
+        _pool = ExtractionPool.from_config(config)
+    return _pool
+
+
+def shutdown_extraction_pool():
+    """共有の抽出プールを停止"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
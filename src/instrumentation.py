@@ -0,0 +1,299 @@
+# src/instrumentation.py
+"""
+パイプラインの計測（スパン・カウンター・ヒストグラム）と構造化ログ。
+
+計測は configure(enabled=True) で有効にするまで何もしない（span() は共有の
+何もしないオブジェクトを返し、counter()/observe() は即座に戻る）。
+有効時はメトリクスをPrometheusのテキスト形式で出力でき、opentelemetry が
+インストールされていれば otel=True でトレースも送信する。
+ログには質問ごとのトレースIDを付与する。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # OpenTelemetryは任意の依存
+    otel_trace = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# 現在の質問のトレースID
+trace_id_var: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """累積バケット形式のヒストグラム"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def _escape(value: str) -> str:
+    """ラベル値のエスケープ（バックスラッシュ・ダブルクォート・改行）"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """カウンターとヒストグラムを保持し、Prometheusのテキスト形式で出力する"""
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(labels: Dict[str, Any]) -> LabelKey:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float, labels: Dict[str, Any]):
+        key = self._key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Dict[str, Any]):
+        key = self._key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    @staticmethod
+    def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(key) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render_prometheus(self) -> str:
+        """Prometheusのテキスト形式（exposition format 0.0.4）"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{self._format_labels(key)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        labels = self._format_labels(key, ("le", str(bound)))
+                        lines.append(f"{name}_bucket{labels} {count}")
+                    labels = self._format_labels(key, ("le", "+Inf"))
+                    lines.append(f"{name}_bucket{labels} {histogram.count}")
+                    lines.append(
+                        f"{name}_sum{self._format_labels(key)} {histogram.sum}"
+                    )
+                    lines.append(
+                        f"{name}_count{self._format_labels(key)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+_enabled = False
+_tracer = None
+
+
+def configure(enabled: bool = True, otel: bool = False):
+    """
+    計測を有効化・無効化する。
+
+    Parameters:
+        enabled (bool): スパン・メトリクスを記録するかどうか
+        otel (bool): OpenTelemetryにもスパンを送るかどうか（未インストールなら無視）
+    """
+    global _enabled, _tracer
+    _enabled = enabled
+    _tracer = otel_trace.get_tracer(__name__) if otel and otel_trace else None
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class Span:
+    """所要時間を <name>_seconds ヒストグラムに記録するスパン（同期・非同期兼用）"""
+
+    __slots__ = ("name", "labels", "start", "_otel")
+
+    def __init__(self, name: str, labels: Dict[str, Any]):
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+        self._otel = None
+
+    def set(self, **labels: Any):
+        """スパン終了時に記録するラベルを追加（結果の種類など）"""
+        self.labels.update(labels)
+
+    def __enter__(self) -> "Span":
+        if _tracer is not None:
+            self._otel = _tracer.start_as_current_span(self.name)
+            self._otel.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if exc_type is not None and "result" not in self.labels:
+            self.labels["result"] = "exception"
+        registry.observe(f"{self.name}_seconds", elapsed, self.labels)
+        if self._otel is not None:
+            otel_span = otel_trace.get_current_span()
+            for key, value in self.labels.items():
+                otel_span.set_attribute(key, str(value))
+            trace_id = trace_id_var.get()
+            if trace_id:
+                otel_span.set_attribute("query.trace_id", trace_id)
+            self._otel.__exit__(exc_type, exc, tb)
+        return False
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class _NoopSpan:
+    """計測が無効な場合に返す何もしないスパン"""
+
+    __slots__ = ()
+
+    def set(self, **labels: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **labels: Any):
+    """処理の所要時間を計測するスパン（with / async with で使用）"""
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, labels)
+
+
+def counter(name: str, value: float = 1, **labels: Any):
+    """カウンターを加算"""
+    if _enabled:
+        registry.inc(name, value, labels)
+
+
+def observe(name: str, value: float, **labels: Any):
+    """ヒストグラムに値を記録"""
+    if _enabled:
+        registry.observe(name, value, labels)
+
+
+def render_prometheus() -> str:
+    """記録したメトリクスをPrometheusのテキスト形式で返す"""
+    return registry.render_prometheus()
+
+
+@contextmanager
+def new_trace(trace_id: Optional[str] = None) -> Iterator[str]:
+    """質問1件分のトレースIDを設定する（ログとスパンに付与される）"""
+    trace_id = trace_id or os.urandom(8).hex()
+    token = trace_id_var.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        trace_id_var.reset(token)
+
+
+class TraceIdFilter(logging.Filter):
+    """ログレコードに現在のトレースIDを付与するフィルター"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get() or "-"
+        return True
+
+
+# LogRecord の標準属性（これ以外の extra の値を構造化ログのフィールドとして出力する）
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "trace_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1件のJSON形式のログ"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", None),
+            "message": record.getMessage(),
+        }
+        entry.update(
+            {k: v for k, v in vars(record).items() if k not in _STANDARD_ATTRS}
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(fmt: str = "text", level: Union[int, str] = logging.INFO):
+    """
+    ログ出力を設定する。
+
+    Parameters:
+        fmt (str): "json"（構造化ログ）、"text"（トレースID付きの1行）、
+            "plain"（メッセージのみ、CLI向け）
+        level (Union[int, str]): 出力するログレベル（"DEBUG" などの名前も可）
+    """
+    handler = logging.StreamHandler()
+    handler.addFilter(TraceIdFilter())
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    elif fmt == "plain":
+        handler.setFormatter(logging.Formatter("%(message)s"))
+    else:
+        handler.setFormatter(
+            logging.Formatter(
+                "%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"
+            )
+        )
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
@@ -0,0 +1,524 @@
+# src/pipeline.py
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from .answer_cache import AnswerCache, source_fingerprint
+from .chatgpt import AsyncOpenAIClient, GenerationMetrics, generation_params
+from .crawlers.crawler_factory import CrawlerFactory
+from .crawlers.resilient_crawler import ResilientCrawler
+from .crawlers.scheduler import ScheduledCrawler
+from .dedup import SimHashIndex, canonical_duplicates, content_duplicates, simhash
+from .instrumentation import counter, new_trace, span
+from .prompt_builder import BuiltPrompt, PromptBuilder
+from .ranking import select_chunks
+from .singleflight import SingleFlight
+from .url_utils import normalize_url
+from .web_search import AsyncBingSearchClient, BingConfig, BingSearchCache
+
+STAGES = ("search", "fetch", "prompt", "generate")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PipelineResult:
+    """1つの質問に対するパイプラインの実行結果"""
+
+    query: str
+    answer: str = ""
+    sources: List[Dict[str, Any]] = field(default_factory=list)
+    prompt_tokens: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)  # ステージごとの秒数
+    ttft: Optional[float] = None  # 最初のトークンまでの時間（秒）
+    error: Optional[str] = None
+    trace_id: Optional[str] = None  # ログ・スパンと対応付けるためのトレースID
+    cached: bool = False  # 応答キャッシュの応答を使用したかどうか
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "query": self.query,
+            "answer": self.answer,
+            "sources": self.sources,
+            "prompt_tokens": self.prompt_tokens,
+            "timings": self.timings,
+            "ttft": self.ttft,
+            "error": self.error,
+            "trace_id": self.trace_id,
+            "cached": self.cached,
+        }
+
+
+class Pipeline:
+    """
+    検索 → 取得 → プロンプト生成 → 応答生成 のパイプライン。
+    Bing・クローラー・OpenAIのクライアントと重複検出インデックスを保持し、
+    複数の質問の間で接続プールとキャッシュを共有する。
+    ステージごとに同時実行数の上限を設定できる。
+    """
+
+    def __init__(
+        self,
+        crawler_type: str,
+        crawler_config: Dict[str, Any],
+        fetch_config: Dict[str, Any],
+        ranking_config: Dict[str, Any],
+        prompt_config: Dict[str, Any],
+        dedup_config: Dict[str, Any],
+        openai_api_key: Optional[str],
+        openai_api_url: str,
+        bing_config: Optional[BingConfig] = None,
+        bing_cache: Optional[BingSearchCache] = None,
+        stage_concurrency: Optional[Dict[str, int]] = None,
+        answer_cache_config: Optional[Dict[str, Any]] = None,
+        verbose: bool = True,
+    ):
+        """
+        Parameters:
+            crawler_type (str): 使用するクローラーのタイプ
+            crawler_config (Dict[str, Any]): クローラーの設定
+            fetch_config (Dict[str, Any]): 取得の設定（mode, latency_budget, target_pages）
+            ranking_config (Dict[str, Any]): チャンク選択の設定（token_budget, chunk_chars）
+            prompt_config (Dict[str, Any]): プロンプトの設定（model, total_budget, per_source_budget）
+            dedup_config (Dict[str, Any]): 重複検出の設定（max_distance, index_path）
+            openai_api_key (Optional[str]): OpenAIのAPIキー
+            openai_api_url (str): Chat Completions APIのURL
+            bing_config (Optional[BingConfig]): Bing検索の設定（省略時は環境変数から生成）
+            bing_cache (Optional[BingSearchCache]): Bing検索結果のキャッシュ（省略時は共有キャッシュ）
+            stage_concurrency (Optional[Dict[str, int]]): ステージ名 -> 同時実行数の上限
+            answer_cache_config (Optional[Dict[str, Any]]): 応答キャッシュの設定
+                （enabled, cache_dir, ttl, max_bytes, memory_max_entries, near_duplicates）
+            verbose (bool): 進捗をINFOレベルでログに出すかどうか（False ならDEBUG）
+        """
+        self.crawler_type = crawler_type
+        self.crawler_config = crawler_config
+        self.fetch_config = fetch_config
+        self.ranking_config = ranking_config
+        self.prompt_config = prompt_config
+        self.dedup_config = dedup_config
+        self.verbose = verbose
+
+        self.bing = AsyncBingSearchClient(bing_config, cache=bing_cache)
+        self.openai = AsyncOpenAIClient(
+            openai_api_key, openai_api_url, model=prompt_config["model"]
+        )
+        self.prompt_builder = PromptBuilder(
+            model=prompt_config["model"],
+            total_budget=prompt_config["total_budget"],
+            per_source_budget=prompt_config["per_source_budget"],
+        )
+        # 同じ質問・同じソースに対する応答のキャッシュ（生成を省略する）
+        self.answer_cache = (
+            AnswerCache.from_config(answer_cache_config)
+            if answer_cache_config and answer_cache_config.get("enabled", True)
+            else None
+        )
+        # 応答に影響するパラメータ（応答キャッシュのキーに含める）
+        self.answer_params = {
+            **generation_params(prompt_config["model"]),
+            "prompt": prompt_config,
+            "ranking": ranking_config,
+        }
+        # 同じURLへの同時リクエストを1つにまとめる
+        self.url_flight = SingleFlight("fetch")
+        # 取得済みページのフィンガープリント（コンテンツキャッシュと同じ場所に保存）
+        self.dedup_index = SimHashIndex(Path(dedup_config["index_path"]))
+        self.stage_limits = {
+            stage: asyncio.Semaphore(limit)
+            for stage, limit in (stage_concurrency or {}).items()
+        }
+        # ステージごとの待機中・実行中の数（ヘルスチェック用）
+        self.stage_waiting = {stage: 0 for stage in STAGES}
+        self.stage_active = {stage: 0 for stage in STAGES}
+
+    def _log(self, message: str):
+        logger.log(logging.INFO if self.verbose else logging.DEBUG, message)
+
+    @asynccontextmanager
+    async def stage(self, name: str, timings: Optional[Dict[str, float]] = None):
+        """
+        ステージの同時実行数を制限し、所要時間を timings とスパンに記録する
+        （同時実行数の上限による待ち時間は含めない）。
+        """
+        limit = self.stage_limits.get(name)
+        if limit is not None:
+            self.stage_waiting[name] += 1
+            try:
+                await limit.acquire()
+            finally:
+                self.stage_waiting[name] -= 1
+        self.stage_active[name] += 1
+        start = time.perf_counter()
+        try:
+            with span("pipeline_stage", stage=name):
+                yield
+        finally:
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+            self.stage_active[name] -= 1
+            if limit is not None:
+                limit.release()
+
+    def queue_depth(self) -> Dict[str, Any]:
+        """
+        ステージごとの待機中・実行中の数と、クローラーのホストごとの待ち行列、
+        開いているサーキットブレーカー、検索・取得の合流の統計
+        """
+        crawler = CrawlerFactory.get_crawler(self.crawler_type, self.crawler_config)
+        # キャッシュなどのラッパーをたどってスケジューラーと再試行のラッパーを探す
+        scheduled = resilient = None
+        while crawler is not None:
+            if isinstance(crawler, ScheduledCrawler):
+                scheduled = crawler
+            elif isinstance(crawler, ResilientCrawler):
+                resilient = crawler
+            crawler = getattr(crawler, "crawler", None)
+        open_breakers = resilient.breaker_states() if resilient else {}
+        if self.bing.breaker.state != "closed":
+            open_breakers["bing"] = self.bing.breaker.state
+        return {
+            "stages": {
+                stage: {
+                    "waiting": self.stage_waiting[stage],
+                    "active": self.stage_active[stage],
+                }
+                for stage in STAGES
+            },
+            "crawler": scheduled.scheduler.queue_depth() if scheduled else None,
+            "open_breakers": open_breakers,
+            "singleflight": {
+                "search": self.bing.singleflight.stats(),
+                "fetch": self.url_flight.stats(),
+            },
+        }
+
+    async def search(self, query: str) -> List[Dict[str, Any]]:
+        """Azure Web Search APIで検索し、ウェブページの検索結果を返す"""
+        search_results = await self.bing.search(query)
+        return search_results.get("webPages", {}).get("value", [])
+
+    async def fetch_webpage_content(self, url: str) -> tuple[str, str, str]:
+        """ウェブページのコンテンツを取得（同じURLへの同時リクエストは1つにまとめる）"""
+        return await self.url_flight.do(
+            normalize_url(url), lambda: self._fetch_webpage_content(url)
+        )
+
+    async def _fetch_webpage_content(self, url: str) -> tuple[str, str, str]:
+        """クローラーでウェブページのコンテンツを取得"""
+        # 共有クローラーを使用（接続プールはアプリ終了時まで再利用される）
+        # 同時接続数と取得間隔はクローラーのホストごとのスケジューラーが制御する
+        crawler = CrawlerFactory.get_crawler(self.crawler_type, self.crawler_config)
+        result = await crawler.fetch_content(url)
+        content = result.content if not result.error else ""
+        title = result.title if hasattr(result, "title") else ""
+        error = result.error if hasattr(result, "error") else ""
+        return content, title, error
+
+    async def process_urls(self, urls: list) -> list:
+        """URLリストを並列で処理"""
+        tasks = []
+
+        for i, url in enumerate(urls, 1):
+            self._log(f"[{i}/{len(urls)}] 取得中: {url}")
+            task = asyncio.create_task(self.fetch_webpage_content(url))
+            tasks.append((url, task))
+
+        results = []
+        for url, task in tasks:
+            content, title, error = await task
+            if error:
+                self._log(f"エラー ({url}): {error}")
+            results.append(content)
+
+        return results
+
+    async def process_urls_streaming(
+        self, urls: list, latency_budget: float, target_pages: int
+    ) -> tuple[list, list]:
+        """
+        URLリストを並列で処理し、完了した順にコンテンツを取り込む。
+        レイテンシ予算を使い切るか十分なページ数が揃った時点で打ち切り、
+        残りのリクエストはキャンセルする。
+
+        Returns:
+            tuple[list, list]: URLと同じ順序のコンテンツ（未取得は空文字）と、
+                各ソースの状態（fetched / error / cutoff）
+        """
+
+        async def fetch(index: int, url: str) -> tuple[int, str, str]:
+            content, _, error = await self.fetch_webpage_content(url)
+            return index, content, error
+
+        tasks = []
+        for i, url in enumerate(urls):
+            self._log(f"[{i + 1}/{len(urls)}] 取得中: {url}")
+            tasks.append(asyncio.create_task(fetch(i, url)))
+
+        contents = [""] * len(urls)
+        statuses = ["cutoff"] * len(urls)
+        fetched = 0
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=latency_budget):
+                index, content, error = await next_done
+                if error or not content:
+                    self._log(f"エラー ({urls[index]}): {error}")
+                    statuses[index] = "error"
+                    continue
+
+                contents[index] = content
+                statuses[index] = "fetched"
+                fetched += 1
+                if fetched >= target_pages:
+                    self._log(
+                        f"{fetched}件のページを取得したため残りの取得を打ち切ります"
+                    )
+                    break
+        except asyncio.TimeoutError:
+            self._log(
+                f"レイテンシ予算（{latency_budget}秒）を超えたため取得を打ち切ります"
+            )
+        finally:
+            # 間に合わなかったリクエストをキャンセル
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        sources = [
+            {"url": url, "status": status} for url, status in zip(urls, statuses)
+        ]
+        return contents, sources
+
+    async def fetch(
+        self, web_pages: List[Dict[str, Any]]
+    ) -> tuple[list, list, Dict[int, int]]:
+        """
+        検索結果のページを取得し、重複を検出する。
+
+        Returns:
+            tuple[list, list, Dict[int, int]]: 検索結果と同じ順序のコンテンツと
+                ソースの状態、重複したソースのインデックス -> 代表ソースのインデックス
+        """
+        urls = [page.get("url") for page in web_pages]
+        max_distance = self.dedup_config["max_distance"]
+
+        # 正規URLが同じもの・過去に同内容と分かっているものは取得しない
+        duplicate_of = canonical_duplicates(urls)
+        remaining = [i for i in range(len(urls)) if i not in duplicate_of]
+        known = self.dedup_index.known_duplicates(
+            [urls[i] for i in remaining], max_distance
+        )
+        for dup, representative in known.items():
+            duplicate_of[remaining[dup]] = remaining[representative]
+        fetch_indices = [i for i in range(len(urls)) if i not in duplicate_of]
+        fetch_urls = [urls[i] for i in fetch_indices]
+        if duplicate_of:
+            self._log(f"重複のため{len(duplicate_of)}件のURLの取得を省略します")
+
+        # 並列処理でコンテンツを取得
+        if self.fetch_config["mode"] == "streaming":
+            fetched_contents, fetched_sources = await self.process_urls_streaming(
+                fetch_urls,
+                latency_budget=self.fetch_config["latency_budget"],
+                target_pages=self.fetch_config["target_pages"],
+            )
+            used = [s["url"] for s in fetched_sources if s["status"] == "fetched"]
+            self._log(f"カットオフに間に合ったソース ({len(used)}/{len(fetch_urls)}):")
+            for url in used:
+                self._log(f"  - {url}")
+        else:
+            fetched_contents = await self.process_urls(fetch_urls)
+            fetched_sources = [
+                {"url": url, "status": "fetched" if content else "error"}
+                for url, content in zip(fetch_urls, fetched_contents)
+            ]
+
+        contents = [""] * len(urls)
+        sources = [{"url": url, "status": "duplicate"} for url in urls]
+        for i, content, source in zip(fetch_indices, fetched_contents, fetched_sources):
+            contents[i] = content
+            sources[i] = source
+
+        # 取得した内容のフィンガープリントで重複ページを検出し、代表ソースにまとめる
+        # （SimHashの計算は1ページ数十ミリ秒かかるため、インデックスの保存とともに
+        # イベントループの外で行う）
+        def index_fingerprints() -> Dict[int, int]:
+            fingerprints = {
+                i: simhash(contents[i]) for i in fetch_indices if contents[i]
+            }
+            for i, fingerprint in fingerprints.items():
+                self.dedup_index.add(urls[i], fingerprint)
+            self.dedup_index.save()
+            return fingerprints
+
+        fingerprints = await asyncio.to_thread(index_fingerprints)
+        duplicate_of.update(content_duplicates(fingerprints, max_distance))
+        for dup, representative in list(duplicate_of.items()):
+            while representative in duplicate_of:  # 代表ソース自体が重複の場合
+                representative = duplicate_of[representative]
+            duplicate_of[dup] = representative
+            contents[dup] = ""
+            sources[dup]["status"] = "duplicate"
+
+        return contents, sources, duplicate_of
+
+    def build_prompt(
+        self,
+        query: str,
+        web_pages: List[Dict[str, Any]],
+        contents: list,
+        sources: list,
+        duplicate_of: Dict[int, int],
+    ) -> BuiltPrompt:
+        """質問との関連度が高いチャンクを選択し、トークン予算内でプロンプトを組み立てる"""
+        urls = [page.get("url") for page in web_pages]
+        duplicates: Dict[int, list] = {}
+        for dup, representative in duplicate_of.items():
+            duplicates.setdefault(representative, []).append(urls[dup])
+
+        summaries = [
+            {
+                "title": page.get("name"),
+                "url": page.get("url"),
+                "snippet": page.get("snippet"),
+                "status": source["status"],
+                "duplicates": duplicates.get(i, []),
+            }
+            for i, (page, source) in enumerate(zip(web_pages, sources))
+        ]
+
+        # ページをチャンクに分割し、質問との関連度が高いチャンクを予算内で選択する
+        # （取得できなかったページは検索結果の概要で代用し、重複ページは除外する）。
+        # ソースごとの選択量はプロンプトのソースごとの予算に合わせ、1つの長いソースが
+        # 全体の予算を使い切って他のソースが選ばれなくなるのを防ぐ
+        documents = [
+            "" if i in duplicate_of else content or page.get("snippet", "")
+            for i, (page, content) in enumerate(zip(web_pages, contents))
+        ]
+        selected_chunks = select_chunks(
+            query,
+            documents,
+            token_budget=self.ranking_config["token_budget"],
+            chunk_chars=self.ranking_config["chunk_chars"],
+            count_tokens=self.prompt_builder.counter.count,
+            per_source_budget=self.prompt_builder.content_budget(summaries),
+        )
+
+        # 検索結果と選択したチャンクを組み合わせる（チャンクが選ばれなかったソースは除外）
+        detailed_summaries = [
+            {**summary, "content": "\n…\n".join(selected_chunks[i])}
+            for i, summary in enumerate(summaries)
+            if i in selected_chunks
+        ]
+
+        # OpenAIのプロンプトをトークン予算内で生成
+        return self.prompt_builder.build(query, detailed_summaries)
+
+    async def generate(
+        self, prompt: str, on_delta: Optional[Callable[[str], Any]] = None
+    ) -> tuple[str, GenerationMetrics]:
+        """応答をストリーミングで生成し、受信した差分を on_delta に渡す"""
+        stream = self.openai.stream(prompt)
+        async for delta in stream:
+            if on_delta is not None:
+                on_delta(delta)
+        return stream.text, stream.metrics
+
+    async def answer(
+        self,
+        query: str,
+        on_delta: Optional[Callable[[str], Any]] = None,
+        trace_id: Optional[str] = None,
+    ) -> PipelineResult:
+        """
+        質問に対してパイプライン全体を実行する。
+
+        Parameters:
+            query (str): ユーザーの質問
+            on_delta (Optional[Callable[[str], Any]]): 応答の差分を受け取るコールバック
+            trace_id (Optional[str]): ログに付与するトレースID（省略時は生成）
+
+        Returns:
+            PipelineResult: 応答とソース、ステージごとの所要時間
+        """
+        with new_trace(trace_id) as trace_id:
+            result = PipelineResult(query=query, trace_id=trace_id)
+            self._log(f"質問: {query}")
+            await self._answer(query, on_delta, result)
+            counter("pipeline_queries_total", result="error" if result.error else "ok")
+            if result.error:
+                logger.warning("質問の処理に失敗しました: %s", result.error)
+            return result
+
+    async def _answer(
+        self,
+        query: str,
+        on_delta: Optional[Callable[[str], Any]],
+        result: PipelineResult,
+    ):
+        """answer() の本体（結果は result に書き込む）"""
+        try:
+            async with self.stage("search", result.timings):
+                web_pages = await self.search(query)
+            if not web_pages:
+                result.error = "検索結果が見つかりませんでした。"
+                return
+
+            async with self.stage("fetch", result.timings):
+                contents, sources, duplicate_of = await self.fetch(web_pages)
+            result.sources = [
+                {"url": source["url"], "title": page.get("name"), **source}
+                for page, source in zip(web_pages, sources)
+            ]
+
+            # 同じ質問・同じソースの応答がキャッシュにあれば、プロンプト生成と応答生成を省略する
+            cache_key = None
+            if self.answer_cache is not None:
+                cache_key = self.answer_cache.key(
+                    query,
+                    self.answer_params,
+                    source_fingerprint(
+                        [page.get("url") for page in web_pages], contents
+                    ),
+                )
+                cached = self.answer_cache.get(cache_key)
+                if cached is not None:
+                    self._log("キャッシュされた応答を使用します")
+                    result.answer = cached["answer"]
+                    result.cached = True
+                    if on_delta is not None:
+                        on_delta(result.answer)
+                    return
+
+            async with self.stage("prompt", result.timings):
+                built_prompt = await asyncio.to_thread(
+                    self.build_prompt,
+                    query,
+                    web_pages,
+                    contents,
+                    sources,
+                    duplicate_of,
+                )
+            result.prompt_tokens = built_prompt.total_tokens
+            counter("prompt_tokens_total", built_prompt.total_tokens)
+            self._log(built_prompt.report())
+
+            self._log("OpenAI GPTモデルに応答をリクエストしています...")
+            async with self.stage("generate", result.timings):
+                result.answer, metrics = await self.generate(
+                    built_prompt.text, on_delta
+                )
+            result.ttft = metrics.ttft
+            if cache_key is not None and result.answer:
+                self.answer_cache.set(cache_key, query, result.answer)
+        except Exception as e:
+            result.error = str(e)
+
+    async def close(self):
+        """共有クライアント（接続プール・常駐Scrapyエンジン）を停止"""
+        await self.bing.close()
+        await self.openai.close()
+        await CrawlerFactory.close_all()
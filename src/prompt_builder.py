@@ -0,0 +1,234 @@
+# src/prompt_builder.py
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from .chatgpt import MAX_TOKENS, SYSTEM_PROMPT
+from .ranking import estimate_tokens
+
+try:
+    import tiktoken
+except ImportError:  # tiktokenがない環境では概算で数える
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# モデルごとのコンテキストウィンドウ（トークン数）
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# チャット形式のメッセージごとに加算されるトークン数の目安
+MESSAGE_OVERHEAD_TOKENS = 8
+
+
+class TokenCounter:
+    """モデルに対応するトークナイザーでトークン数を数える（利用できなければ概算）"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self.encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self.encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                # エンコーディングファイルを取得できない場合など
+                logger.warning(
+                    "トークナイザーを読み込めないため概算を使用します: %s", e
+                )
+
+    @property
+    def exact(self) -> bool:
+        """トークナイザーによる正確な数え方かどうか"""
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        """テキストのトークン数"""
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return estimate_tokens(text)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """先頭から max_tokens トークン分のテキストを返す"""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            return self.encoding.decode(tokens[:max_tokens])
+
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        # 概算の場合は二分探索で収まる文字数を求める
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if estimate_tokens(text[:mid]) <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        return text[:low]
+
+
+@dataclass
+class SectionTokens:
+    """プロンプトのセクションごとのトークン数"""
+
+    name: str
+    tokens: int
+    truncated: bool = False
+
+
+@dataclass
+class BuiltPrompt:
+    """組み立てたプロンプトとトークン数の内訳"""
+
+    text: str
+    total_tokens: int
+    budget: int
+    sections: List[SectionTokens] = field(default_factory=list)
+    dropped_sources: List[str] = field(default_factory=list)
+
+    def report(self) -> str:
+        """トークン数の内訳を表示用の文字列にする"""
+        lines = [f"プロンプト: {self.total_tokens}/{self.budget} トークン"]
+        for section in self.sections:
+            mark = "（切り詰め）" if section.truncated else ""
+            lines.append(f"  {section.name}: {section.tokens}{mark}")
+        for url in self.dropped_sources:
+            lines.append(f"  {url}: 予算超過のため除外")
+        return "\n".join(lines)
+
+
+class PromptBuilder:
+    """
+    ソースごと・全体のトークン予算を守ってプロンプトを組み立てる。
+    全体の予算はコンテキストウィンドウから応答用の max_tokens と
+    システムプロンプトの分を差し引いた値を上限とする。
+    """
+
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        max_tokens: int = MAX_TOKENS,
+        total_budget: Optional[int] = None,
+        per_source_budget: Optional[int] = None,
+        context_window: Optional[int] = None,
+    ):
+        """
+        Parameters:
+            model (str): 使用するGPTモデル
+            max_tokens (int): 応答用に確保するトークン数
+            total_budget (Optional[int]): プロンプト全体のトークン数の上限
+            per_source_budget (Optional[int]): ソース1件あたりのトークン数の上限
+            context_window (Optional[int]): モデルのコンテキストウィンドウ
+        """
+        self.counter = TokenCounter(model)
+        self.per_source_budget = per_source_budget
+
+        window = context_window or MODEL_CONTEXT_WINDOWS.get(
+            model, DEFAULT_CONTEXT_WINDOW
+        )
+        available = (
+            window
+            - max_tokens
+            - self.counter.count(SYSTEM_PROMPT)
+            - 2 * MESSAGE_OVERHEAD_TOKENS
+        )
+        self.budget = min(total_budget, available) if total_budget else available
+
+    @staticmethod
+    def _header(query: str) -> str:
+        return (
+            f"以下は '{query}' に関するウェブ検索の結果です。各ソースの情報を総合的に分析し、"
+            f"矛盾する情報がある場合はそれを指摘し、情報の信頼性も考慮して回答してください:\n\n"
+        )
+
+    @staticmethod
+    def _source_prefix(source: Dict[str, Any]) -> str:
+        duplicates = source.get("duplicates")
+        return (
+            f"ソース: {source['url']}\n"
+            + (f"同内容のソース: {', '.join(duplicates)}\n" if duplicates else "")
+            + f"タイトル: {source['title']}\n"
+            f"概要: {source['snippet']}\n"
+            f"内容: "
+        )
+
+    def content_budget(self, sources: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        ソースごとの予算から見出し部分（URL・タイトル・概要）を除いた本文の予算。
+        チャンク選択で1つのソースが選びすぎないよう、最も長い見出しを基準にする。
+
+        Returns:
+            Optional[int]: 本文のトークン数の上限（per_source_budget がなければ None）
+        """
+        if self.per_source_budget is None:
+            return None
+        prefix_tokens = max(
+            (self.counter.count(self._source_prefix(source)) + 1 for source in sources),
+            default=0,
+        )
+        return max(self.per_source_budget - prefix_tokens, 0)
+
+    def build(self, query: str, sources: List[Dict[str, Any]]) -> BuiltPrompt:
+        """
+        プロンプトを組み立てる。
+
+        Parameters:
+            query (str): ユーザーの質問
+            sources (List[Dict[str, Any]]): url, title, snippet, content を持つソースのリスト
+
+        Returns:
+            BuiltPrompt: プロンプトとトークン数の内訳
+        """
+        header = self._header(query)
+        header_tokens = self.counter.count(header)
+        parts = [header]
+        sections = [SectionTokens("ヘッダー", header_tokens)]
+        dropped = []
+        remaining = self.budget - header_tokens
+
+        for source in sources:
+            prefix = self._source_prefix(source)
+            prefix_tokens = self.counter.count(prefix) + 1  # 末尾の改行分
+            content_budget = remaining - prefix_tokens
+            if self.per_source_budget is not None:
+                content_budget = min(
+                    content_budget, self.per_source_budget - prefix_tokens
+                )
+            if content_budget <= 0:
+                dropped.append(source["url"])
+                continue
+
+            content = source.get("content") or ""
+            truncated_content = self.counter.truncate(content, content_budget)
+            section = f"{prefix}{truncated_content}\n\n"
+            tokens = self.counter.count(section)
+
+            parts.append(section)
+            sections.append(
+                SectionTokens(
+                    source["url"],
+                    tokens,
+                    truncated=len(truncated_content) < len(content),
+                )
+            )
+            remaining -= tokens
+
+        text = "".join(parts)
+        return BuiltPrompt(
+            text=text,
+            total_tokens=self.counter.count(text),
+            budget=self.budget,
+            sections=sections,
+            dropped_sources=dropped,
+        )
@@ -0,0 +1,161 @@
+# src/ranking.py
+import math
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+# 英数字は単語単位、日本語（かな・漢字）は文字bigram単位でトークン化する
+WORD_PATTERN = re.compile(r"[a-z0-9]+|[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]+")
+CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]")
+
+
+def tokenize(text: str) -> List[str]:
+    """検索用のトークン列に変換（NFKC正規化・小文字化、日本語は文字bigram）"""
+    tokens = []
+    for word in WORD_PATTERN.findall(unicodedata.normalize("NFKC", text).lower()):
+        if CJK_PATTERN.match(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i : i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """おおよそのトークン数（日本語は1文字≒1トークン、英語は4文字≒1トークン）"""
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def split_chunks(text: str, chunk_chars: int = 500) -> List[str]:
+    """テキストを行単位でまとめて chunk_chars 文字程度のチャンクに分割"""
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        # 長すぎる行は固定長で分割
+        pieces = [line[i : i + chunk_chars] for i in range(0, len(line), chunk_chars)]
+        for piece in pieces:
+            if current and size + len(piece) > chunk_chars:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class BM25:
+    """Okapi BM25によるスコアリング（文書ごとの単語頻度を事前に集計）"""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(doc) for doc in documents]
+        self.doc_lengths = [len(doc) for doc in documents]
+        self.avg_length = sum(self.doc_lengths) / len(documents) if documents else 0.0
+
+        doc_freqs: Counter = Counter()
+        for tf in self.term_freqs:
+            doc_freqs.update(tf.keys())
+        n = len(documents)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+
+    def scores(self, query: List[str]) -> List[float]:
+        """クエリに対する各文書のスコア"""
+        terms = [term for term in set(query) if term in self.idf]
+        results = []
+        for tf, length in zip(self.term_freqs, self.doc_lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            results.append(score)
+        return results
+
+
+@dataclass
+class Chunk:
+    """ソース内のチャンクとそのスコア"""
+
+    source_index: int
+    position: int
+    text: str
+    score: float = 0.0
+
+
+def select_chunks(
+    query: str,
+    documents: List[str],
+    token_budget: int,
+    chunk_chars: int = 500,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+    per_source_budget: Optional[int] = None,
+) -> Dict[int, List[str]]:
+    """
+    全ソースのチャンクをクエリとの関連度で順位付けし、
+    トークン予算に収まるまで関連度の高い順に選択する。
+    per_source_budget を指定すると1つのソースが予算を使い切らないよう
+    ソースごとの選択量も制限する（プロンプトのソースごとの予算に合わせる）。
+
+    Parameters:
+        query (str): ユーザーの質問
+        documents (List[str]): ソースごとのテキスト
+        token_budget (int): 選択するチャンク全体のトークン数の上限
+        chunk_chars (int): チャンクの目安の文字数
+        count_tokens: トークン数を数える関数
+        per_source_budget (Optional[int]): ソース1件あたりのチャンクのトークン数の上限
+
+    Returns:
+        Dict[int, List[str]]: ソースのインデックスごとの選択されたチャンク（文書内の順序）
+    """
+    chunks = [
+        Chunk(source_index=i, position=j, text=text)
+        for i, document in enumerate(documents)
+        for j, text in enumerate(split_chunks(document or "", chunk_chars))
+    ]
+    if not chunks:
+        return {}
+
+    bm25 = BM25([tokenize(chunk.text) for chunk in chunks])
+    for chunk, score in zip(chunks, bm25.scores(tokenize(query))):
+        chunk.score = score
+
+    ranked = [chunk for chunk in chunks if chunk.score > 0]
+    if ranked:
+        ranked.sort(key=lambda c: (-c.score, c.source_index, c.position))
+    else:
+        # クエリと一致する語がない場合は各ソースの先頭から順に使う
+        ranked = sorted(chunks, key=lambda c: (c.position, c.source_index))
+
+    selected: List[Chunk] = []
+    used = 0
+    used_per_source: Dict[int, int] = {}
+    for chunk in ranked:
+        tokens = count_tokens(chunk.text)
+        if used + tokens > token_budget:
+            continue
+        source_used = used_per_source.get(chunk.source_index, 0)
+        if per_source_budget is not None and source_used + tokens > per_source_budget:
+            continue
+        selected.append(chunk)
+        used += tokens
+        used_per_source[chunk.source_index] = source_used + tokens
+
+    result: Dict[int, List[str]] = {}
+    for chunk in sorted(selected, key=lambda c: (c.source_index, c.position)):
+        result.setdefault(chunk.source_index, []).append(chunk.text)
+    return result
@@ -0,0 +1,279 @@
+# src/resilience.py
+"""
+外部呼び出し（Bing・OpenAI・クローラー・Firecrawl）の耐障害性のための部品。
+
+- タイムアウト: 接続と読み込みを分けて指定する（client_timeout / REQUESTS_TIMEOUT）
+- 再試行: 一時的なエラー（接続エラー・タイムアウト・429/5xx）を指数バックオフ
+  （フルジッター）で再試行する（retry_async / retry_sync）
+- ヘッジ: 呼び出しが直近のレイテンシのパーセンタイル（p95）を超えたら
+  2つ目の試行を開始し、先に成功した方を使う（hedged）
+- サーキットブレーカー: 連続して失敗した依存先（ホスト・Firecrawl）への
+  呼び出しを一定時間すぐに失敗させる（CircuitBreaker / BreakerRegistry）
+"""
+
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+
+from .instrumentation import counter
+
+T = TypeVar("T")
+
+DEFAULT_CONNECT_TIMEOUT = 5.0  # 接続確立までの上限（秒）
+DEFAULT_READ_TIMEOUT = 30.0  # 受信の間隔の上限（秒）
+# requests用の (接続, 読み込み) タイムアウト
+REQUESTS_TIMEOUT = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)
+
+MAX_BREAKERS = 4096  # 保持するブレーカーの最大数（超えたら閉じている古い順に削除）
+
+# 再試行すれば成功する可能性があるHTTPステータス
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+def client_timeout(
+    total: Optional[float],
+    connect: float = DEFAULT_CONNECT_TIMEOUT,
+    read: float = DEFAULT_READ_TIMEOUT,
+) -> aiohttp.ClientTimeout:
+    """全体・接続・読み込み（受信の間隔）のタイムアウトを指定したClientTimeout"""
+    return aiohttp.ClientTimeout(total=total, connect=connect, sock_read=read)
+
+
+def is_retryable_status(status: Optional[int]) -> bool:
+    return status in RETRYABLE_STATUSES
+
+
+def is_retryable_exception(exc: BaseException) -> bool:
+    """
+    再試行すべき例外かどうか。
+    HTTPエラーはステータスで判定し（aiohttp・requestsの両方）、
+    接続エラー・タイムアウトは再試行する。
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    status = getattr(exc, "status", None)  # aiohttp.ClientResponseError
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if status is not None:
+        return is_retryable_status(status)
+    # requestsの例外（ConnectionError・Timeout）は OSError のサブクラス
+    return isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError, OSError))
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """指数バックオフ（フルジッター）による再試行の設定"""
+
+    attempts: int = 3  # 最初の試行を含む最大試行回数
+    base_delay: float = 0.2  # 1回目の再試行前の待ち時間の上限（秒）
+    max_delay: float = 5.0  # 待ち時間の上限（秒）
+
+    def backoff(self, retry: int) -> float:
+        """retry 回目（0始まり）の再試行前の待ち時間"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+
+
+async def retry_async(
+    call: Callable[[], Awaitable[T]],
+    policy: RetryPolicy,
+    retryable: Callable[[BaseException], bool] = is_retryable_exception,
+    name: str = "",
+) -> T:
+    """再試行すべき例外の間、call を指数バックオフで再試行する"""
+    for retry in range(policy.attempts):
+        try:
+            return await call()
+        except Exception as e:
+            if retry + 1 >= policy.attempts or not retryable(e):
+                raise
+            counter("retries_total", target=name)
+            await asyncio.sleep(policy.backoff(retry))
+    raise AssertionError("unreachable")
+
+
+def retry_sync(
+    call: Callable[[], T],
+    policy: RetryPolicy,
+    retryable: Callable[[BaseException], bool] = is_retryable_exception,
+    name: str = "",
+) -> T:
+    """retry_async の同期版（requestsを使う関数用）"""
+    for retry in range(policy.attempts):
+        try:
+            return call()
+        except Exception as e:
+            if retry + 1 >= policy.attempts or not retryable(e):
+                raise
+            counter("retries_total", target=name)
+            time.sleep(policy.backoff(retry))
+    raise AssertionError("unreachable")
+
+
+class LatencyTracker:
+    """直近の呼び出しのレイテンシからパーセンタイルを求める（ヘッジの開始時間用）"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """パーセンタイル（q は 0〜1）。サンプルが足りない場合は None"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def hedged(
+    call: Callable[[], Awaitable[T]],
+    delay: Optional[float],
+    succeeded: Callable[[T], bool] = lambda _: True,
+    name: str = "",
+) -> T:
+    """
+    call を実行し、delay 秒たっても終わらなければ2つ目の試行を開始する。
+    先に成功（succeeded が True）した結果を返し、残りの試行はキャンセルする。
+    両方とも失敗した場合は後に終わった方の結果（または例外）を返す。
+    delay が None の場合はヘッジしない。
+    """
+    first = asyncio.ensure_future(call())
+    if delay is None:
+        return await first
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+    except asyncio.CancelledError:
+        first.cancel()
+        raise
+    if done:
+        return first.result()
+
+    counter("hedged_requests_total", target=name)
+    second = asyncio.ensure_future(call())
+    pending = {first, second}
+    outcome: Optional[asyncio.Future] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                outcome = task
+                if task.exception() is None and succeeded(task.result()):
+                    if task is second:
+                        counter("hedge_wins_total", target=name)
+                    return task.result()
+        return outcome.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いているため呼び出さなかった"""
+
+
+class CircuitBreaker:
+    """
+    連続 failure_threshold 回の失敗で開き（呼び出しを拒否）、reset_timeout 秒後に
+    1回だけ試行を許可する（半開）。その試行が成功すれば閉じ、失敗すれば再び開く。
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """呼び出してよいかどうか（半開状態では1つの試行だけを許可する）"""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """
+        結果を記録せずに試行を終える（キャンセルされた場合など）。
+        半開状態の試行枠を空け、次の呼び出しで改めて試行できるようにする。
+        """
+        self._probing = False
+
+
+class BreakerRegistry:
+    """
+    キー（ホストなど）ごとのサーキットブレーカー。
+    max_entries を超えたら、閉じているブレーカーを最後に使った古い順に削除する
+    （開いている・半開のブレーカーは状態を失わないよう残す）。
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_entries: int = MAX_BREAKERS,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_entries = max_entries
+        self.breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+
+    def get(self, key: str) -> CircuitBreaker:
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            self._evict()
+            self.breakers[key] = breaker
+        else:
+            self.breakers.move_to_end(key)
+        return breaker
+
+    def _evict(self):
+        """ブレーカー数が上限を超えている間、閉じているブレーカーを古い順に削除する"""
+        excess = len(self.breakers) + 1 - self.max_entries  # これから追加する分を含める
+        if excess <= 0:
+            return
+        closed = []
+        for key, breaker in self.breakers.items():
+            if breaker.state == "closed":
+                closed.append(key)
+                if len(closed) >= excess:
+                    break
+        for key in closed:
+            del self.breakers[key]
+
+    def open_keys(self) -> Dict[str, Any]:
+        """開いている（半開を含む）ブレーカーのキーと状態"""
+        return {
+            key: breaker.state
+            for key, breaker in self.breakers.items()
+            if breaker.state != "closed"
+        }
@@ -0,0 +1,74 @@
+# src/singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from .instrumentation import counter
+
+
+class SingleFlight:
+    """
+    同じキーに対する同時呼び出しを1つの実行にまとめる（リクエストの合流）。
+    実行中のキーに対する後続の呼び出しは、最初の呼び出しの結果を待つ。
+    呼び出し数と合流数は singleflight_calls_total / singleflight_coalesced_total
+    （ラベル flight）にも記録する。
+    """
+
+    def __init__(self, name: str = ""):
+        """
+        Parameters:
+            name (str): メトリクスのラベルに使う名前（例: "search", "fetch"）
+        """
+        self.name = name
+        # key -> (実行中のタスク, 待機している呼び出し元の数)
+        self._inflight: Dict[Hashable, list] = {}
+        self.calls = 0  # 呼び出しの総数
+        self.coalesced = 0  # 実行中の呼び出しに合流した数
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        キーに対する処理を実行し、結果を返す。
+
+        Parameters:
+            key: 合流の判定に使うキー
+            fn: 実行する処理（コルーチンを返す関数）
+        """
+        self.calls += 1
+        counter("singleflight_calls_total", flight=self.name)
+        flight = self._inflight.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(fn())
+            flight = [task, 0]
+            self._inflight[key] = flight
+            task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+            counter("singleflight_coalesced_total", flight=self.name)
+
+        task = flight[0]
+        flight[1] += 1
+        try:
+            # 1つの呼び出し元がキャンセルされても他の呼び出し元の処理は継続する
+            return await asyncio.shield(task)
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not task.done():
+                # 待機している呼び出し元がいなくなった場合は処理をキャンセル
+                task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: Hashable, flight: list):
+        """完了（またはキャンセル）した実行を登録から外す"""
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    @property
+    def inflight(self) -> int:
+        """実行中のキーの数"""
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        """合流の統計情報"""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "inflight": self.inflight,
+        }
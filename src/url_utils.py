@@ -0,0 +1,84 @@
+# src/url_utils.py
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    同じリソースを指すURLを同一の文字列にそろえる。
+    スキームとホストを小文字化し、既定のポートとフラグメントを除去する。
+
+    Parameters:
+        url (str): 正規化するURL
+
+    Returns:
+        str: 正規化されたURL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+
+    netloc = host
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+# 同じページを指すURLから取り除くトラッキング用のクエリパラメータ
+# （ref・output など内容を切り替えるパラメータは含めない）
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "yclid",
+    "msclkid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "ref_src",
+    "spm",
+    "_ga",
+}
+TRACKING_PREFIXES = ("utm_",)
+# AMP用のパス（/amp, .amp）。前に空でないパスが残る場合のみ取り除く
+AMP_PATH_PATTERN = re.compile(
+    r"(?<=[^/])(?:/amp/?$|\.amp$|/amp(?=/)|\.amp(?=\.html?$))"
+)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    ミラーやバリエーションを同一視するための正規URLを生成する（重複判定用）。
+    normalize_url に加えて、スキームの違い・www./amp. サブドメイン・
+    AMP用のパス・トラッキングパラメータ・末尾のスラッシュを取り除く。
+
+    Parameters:
+        url (str): 正規化するURL
+
+    Returns:
+        str: 重複判定用の正規URL（取得には使用しない）
+    """
+    parts = urlsplit(normalize_url(url))
+    host = parts.netloc
+    for prefix in ("www.", "amp."):
+        if host.startswith(prefix):
+            host = host[len(prefix) :]
+
+    path = AMP_PATH_PATTERN.sub("", parts.path).rstrip("/") or "/"
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parts.query, keep_blank_values=True)
+            if key.lower() not in TRACKING_PARAMS
+            and not key.lower().startswith(TRACKING_PREFIXES)
+        )
+    )
+    return urlunsplit(("https", host, path, query, ""))
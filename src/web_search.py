@@ -2,29 +2,87 @@
 
 import os
 import json
+import logging
 import time
+import asyncio
+import sqlite3
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, Optional
-import requests
-from dotenv import load_dotenv
+from typing import Dict, Any, Iterable, List, Optional, Union
+import aiohttp
+from .cache import CacheStats, DiskCache, MemoryCache
+from .instrumentation import counter, span
+from .resilience import (
+    REQUESTS_TIMEOUT,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    client_timeout,
+    is_retryable_exception,
+    retry_async,
+    retry_sync,
+)
+from .singleflight import SingleFlight
 
-# 環境変数をロードする
-load_dotenv()
-
-# Azure Web Search API 設定
-BING_SUBSCRIPTION_KEY = os.getenv("BING_SEARCH_V7_SUBSCRIPTION_KEY")
-BING_ENDPOINT = os.getenv("BING_SEARCH_V7_ENDPOINT") + "v7.0/search"
+# 契約ティアの秒間クエリ数上限（F1: 3 QPS）
+DEFAULT_BING_SEARCH_QPS = 3.0
 
 # キャッシュの設定
 CACHE_DIR = Path("cache/bing_search")
 CACHE_DURATION = 60 * 60 * 24  # 24時間（秒単位）
+CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+MEMORY_CACHE_MAX_ENTRIES = 1024
+MEMORY_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64MB
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BingConfig:
+    """Azure Web Search APIの設定"""
+
+    subscription_key: Optional[str]
+    endpoint: str
+    qps: float = DEFAULT_BING_SEARCH_QPS
+
+    @classmethod
+    def from_env(cls) -> "BingConfig":
+        """
+        環境変数（BING_SEARCH_V7_SUBSCRIPTION_KEY, BING_SEARCH_V7_ENDPOINT,
+        BING_SEARCH_QPS）から設定を生成する。.env の読み込みは呼び出し側で行う。
+
+        Raises:
+            ValueError: BING_SEARCH_V7_ENDPOINT が設定されていない場合
+        """
+        endpoint = os.getenv("BING_SEARCH_V7_ENDPOINT")
+        if not endpoint:
+            raise ValueError("環境変数 BING_SEARCH_V7_ENDPOINT が設定されていません")
+        return cls(
+            subscription_key=os.getenv("BING_SEARCH_V7_SUBSCRIPTION_KEY"),
+            endpoint=endpoint,
+            qps=float(os.getenv("BING_SEARCH_QPS", DEFAULT_BING_SEARCH_QPS)),
+        )
+
+    @property
+    def search_url(self) -> str:
+        """Web Search APIのURL"""
+        return self.endpoint + "v7.0/search"
 
 
 class BingSearchCache:
-    """Bing検索結果のキャッシュを管理するクラス"""
+    """
+    Bing検索結果のキャッシュを管理するクラス。
+    デコード済みの結果を保持するメモリ層（L1）と DiskCache（L2）の2層構成で、
+    書き込みは両方の層に行う（ライトスルー）。
+    """
 
     def __init__(
-        self, cache_dir: Path = CACHE_DIR, cache_duration: int = CACHE_DURATION
+        self,
+        cache_dir: Path = CACHE_DIR,
+        cache_duration: int = CACHE_DURATION,
+        max_bytes: int = CACHE_MAX_BYTES,
+        memory_max_entries: int = MEMORY_CACHE_MAX_ENTRIES,
+        memory_max_bytes: Optional[int] = MEMORY_CACHE_MAX_BYTES,
     ):
         """
         キャッシュマネージャーの初期化
@@ -32,16 +90,24 @@ class BingSearchCache:
         Parameters:
             cache_dir (Path): キャッシュファイルを保存するディレクトリ
             cache_duration (int): キャッシュの有効期間（秒）
+            max_bytes (int): ディスクキャッシュ全体の最大サイズ（バイト）
+            memory_max_entries (int): メモリ層に保持する最大エントリ数
+            memory_max_bytes (Optional[int]): メモリ層に保持する結果の合計サイズ上限（バイト）
         """
         self.cache_dir = cache_dir
         self.cache_duration = cache_duration
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.memory = MemoryCache(
+            max_entries=memory_max_entries,
+            max_bytes=memory_max_bytes,
+            ttl=cache_duration,
+        )
+        self.store = DiskCache(cache_dir, ttl=cache_duration, max_bytes=max_bytes)
+        self.stats = {"memory": CacheStats(), "disk": CacheStats()}
 
-    def _get_cache_path(self, query: str, count: int, mkt: str) -> Path:
-        """キャッシュファイルのパスを生成"""
-        # クエリパラメータからキャッシュキーを生成
-        cache_key = f"{query}_{count}_{mkt}".replace("/", "_")
-        return self.cache_dir / f"{cache_key}.json"
+    @staticmethod
+    def _cache_key(query: str, count: int, mkt: str) -> str:
+        """クエリパラメータからキャッシュキーを生成（DiskCacheでハッシュ化される）"""
+        return json.dumps([query, count, mkt], ensure_ascii=False)
 
     def get(self, query: str, count: int, mkt: str) -> Optional[Dict[str, Any]]:
         """
@@ -50,25 +116,35 @@ class BingSearchCache:
         Returns:
             Optional[Dict[str, Any]]: キャッシュされたデータ、または None
         """
-        cache_path = self._get_cache_path(query, count, mkt)
-
-        if not cache_path.exists():
-            return None
+        key = self._cache_key(query, count, mkt)
+        result = self.memory.get(key)
+        if result is not None:
+            self.stats["memory"].hits += 1
+            counter("bing_cache_requests_total", layer="memory", result="hit")
+            return result
+        self.stats["memory"].misses += 1
+        counter("bing_cache_requests_total", layer="memory", result="miss")
 
         try:
-            with cache_path.open("r", encoding="utf-8") as f:
-                cached_data = json.load(f)
-
-            # キャッシュの有効期限をチェック
-            if time.time() - cached_data["timestamp"] > self.cache_duration:
-                cache_path.unlink()  # 期限切れのキャッシュを削除
+            entry = self.store.get_fresh_entry(key)
+            if entry is None:
+                self.stats["disk"].misses += 1
+                counter("bing_cache_requests_total", layer="disk", result="miss")
                 return None
+            result = json.loads(entry.value)
+            self.stats["disk"].hits += 1
+            counter("bing_cache_requests_total", layer="disk", result="hit")
 
-            return cached_data["data"]
-
-        except (json.JSONDecodeError, KeyError, OSError):
-            # キャッシュファイルが破損している場合は削除
-            cache_path.unlink(missing_ok=True)
+            # ディスクの残り有効期間だけメモリ層に保持する
+            remaining = self.cache_duration - (time.time() - entry.created_at)
+            self.memory.set(key, result, size=len(entry.value), ttl=max(remaining, 0))
+            return result
+        except json.JSONDecodeError:
+            # キャッシュが破損している場合は削除
+            self.store.delete(key)
+            return None
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("キャッシュの読み込み中にエラーが発生しました: %s", e)
             return None
 
     def set(self, query: str, count: int, mkt: str, data: Dict[str, Any]):
@@ -78,23 +154,50 @@ class BingSearchCache:
         Parameters:
             data (Dict[str, Any]): キャッシュするデータ
         """
-        cache_path = self._get_cache_path(query, count, mkt)
-
+        key = self._cache_key(query, count, mkt)
+        value = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+        self.memory.set(key, data, size=len(value))
         try:
-            cache_data = {"timestamp": time.time(), "data": data}
+            self.store.set(key, value)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("キャッシュの保存中にエラーが発生しました: %s", e)
+
 
-            with cache_path.open("w", encoding="utf-8") as f:
-                json.dump(cache_data, f, ensure_ascii=False, indent=2)
+# プロセス内で共有するキャッシュ（初回使用時に生成する）
+_default_cache: Optional[BingSearchCache] = None
 
-        except OSError as e:
-            print(f"キャッシュの保存中にエラーが発生しました: {e}")
 
+def get_default_cache() -> BingSearchCache:
+    """共有のBing検索キャッシュを取得（未生成なら生成）"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = BingSearchCache()
+    return _default_cache
 
-# キャッシュマネージャーのインスタンスを作成
-cache_manager = BingSearchCache()
+
+def _build_request(
+    query: str, count: int, mkt: str, subscription_key: Optional[str]
+) -> tuple[dict, dict]:
+    """Bing Web Search APIのリクエストヘッダーとパラメータを生成"""
+    headers = {"Ocp-Apim-Subscription-Key": subscription_key}
+    params = {
+        "q": query,
+        "count": count,
+        "mkt": mkt,
+        "textDecorations": "true",
+        "textFormat": "HTML",
+    }
+    return headers, params
 
 
-def bing_web_search(query: str, count: int = 10, mkt: str = "en-US") -> Dict[str, Any]:
+def bing_web_search(
+    query: str,
+    count: int = 10,
+    mkt: str = "en-US",
+    config: Optional[BingConfig] = None,
+) -> Dict[str, Any]:
     """
     Bing Web Search APIを使用して指定されたクエリに対する検索結果を取得する。
     キャッシュがある場合はそれを使用し、なければAPIを呼び出す。
@@ -103,32 +206,211 @@ def bing_web_search(query: str, count: int = 10, mkt: str = "en-US") -> Dict[str
         query (str): 検索クエリ
         count (int): 取得する検索結果の数
         mkt (str): マーケットコード（例: 'en-US'）
+        config (Optional[BingConfig]): APIの設定（省略時は環境変数から生成）
 
     Returns:
         dict: APIからのJSONレスポンス
     """
+    import requests
+
     # キャッシュをチェック
-    cached_result = cache_manager.get(query, count, mkt)
+    cache = get_default_cache()
+    cached_result = cache.get(query, count, mkt)
     if cached_result is not None:
-        print(f"キャッシュされた結果を使用: {query}")
+        logger.info("キャッシュされた結果を使用: %s", query)
         return cached_result
 
     # APIを呼び出し
-    headers = {"Ocp-Apim-Subscription-Key": BING_SUBSCRIPTION_KEY}
-    params = {
-        "q": query,
-        "count": count,
-        "mkt": mkt,
-        "textDecorations": True,
-        "textFormat": "HTML",
-    }
+    config = config or BingConfig.from_env()
+    headers, params = _build_request(query, count, mkt, config.subscription_key)
+
+    def call() -> Dict[str, Any]:
+        response = requests.get(
+            config.search_url, headers=headers, params=params, timeout=REQUESTS_TIMEOUT
+        )
+        response.raise_for_status()
+        return response.json()
 
-    print(f"APIを呼び出し: {query}")
-    response = requests.get(BING_ENDPOINT, headers=headers, params=params)
-    response.raise_for_status()
+    logger.info("APIを呼び出し: %s", query)
+    with span("bing_search", source="api"):
+        # 一時的なエラー（接続エラー・タイムアウト・429/5xx）は再試行する
+        result = retry_sync(call, RetryPolicy(), name="bing")
 
     # 結果をキャッシュに保存
-    result = response.json()
-    cache_manager.set(query, count, mkt, result)
+    cache.set(query, count, mkt, result)
 
     return result
+
+
+class RateLimiter:
+    """トークンバケット方式のレートリミッター（秒間リクエスト数を制限）"""
+
+    def __init__(self, qps: float, burst: Optional[int] = None):
+        """
+        Parameters:
+            qps (float): 1秒あたりに許可するリクエスト数
+            burst (Optional[int]): 一度に許可する最大リクエスト数
+        """
+        self.qps = qps
+        self.capacity = burst or max(1, int(qps))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """トークンが得られるまで待機"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.qps
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.qps)
+
+
+class AsyncBingSearchClient:
+    """
+    共有aiohttpセッションを使用する非同期Bing Web Searchクライアント。
+    キャッシュ済みのクエリはネットワークにアクセスせず、
+    APIへのリクエストはティアのQPS上限に合わせてレート制限される。
+    同じ (query, count, mkt) に対する同時リクエストは1回のAPI呼び出しにまとめる。
+    一時的なエラーは再試行し、失敗が続く間はサーキットブレーカーで呼び出しを止める
+    （クォータを消費するためヘッジは行わない）。
+    """
+
+    def __init__(
+        self,
+        config: Optional[BingConfig] = None,
+        cache: Optional[BingSearchCache] = None,
+        timeout: int = 30,
+        connection_limit: int = 20,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        """
+        Parameters:
+            config (Optional[BingConfig]): APIの設定（省略時は環境変数から生成）
+            cache (Optional[BingSearchCache]): 検索結果のキャッシュ（省略時は共有キャッシュ）
+            timeout (int): リクエストのタイムアウト（秒）
+            connection_limit (int): 接続プールの最大接続数
+            retry (Optional[RetryPolicy]): 一時的なエラーの再試行の設定
+            breaker (Optional[CircuitBreaker]): APIのサーキットブレーカー
+        """
+        self.config = config or BingConfig.from_env()
+        self.cache = cache or get_default_cache()
+        self.rate_limiter = RateLimiter(self.config.qps)
+        self.timeout = client_timeout(total=timeout)
+        self.connection_limit = connection_limit
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.singleflight = SingleFlight("search")
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """共有セッションを取得（未生成なら生成）"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.connection_limit, ttl_dns_cache=300
+                ),
+                timeout=self.timeout,
+            )
+        return self.session
+
+    async def search(
+        self, query: str, count: int = 10, mkt: str = "en-US"
+    ) -> Dict[str, Any]:
+        """
+        指定されたクエリの検索結果を取得する。
+        キャッシュがある場合はそれを使用し、なければAPIを呼び出す。
+
+        Parameters:
+            query (str): 検索クエリ
+            count (int): 取得する検索結果の数
+            mkt (str): マーケットコード（例: 'en-US'）
+
+        Returns:
+            dict: APIからのJSONレスポンス
+        """
+        cached_result = self.cache.get(query, count, mkt)
+        if cached_result is not None:
+            logger.info("キャッシュされた結果を使用: %s", query)
+            return cached_result
+
+        return await self.singleflight.do(
+            (query, count, mkt), lambda: self._request(query, count, mkt)
+        )
+
+    async def _request(self, query: str, count: int, mkt: str) -> Dict[str, Any]:
+        """APIを呼び出し、結果をキャッシュに保存"""
+        headers, params = _build_request(
+            query, count, mkt, self.config.subscription_key
+        )
+
+        if not self.breaker.allow():
+            counter("circuit_rejections_total", target="bing")
+            raise CircuitOpenError(
+                "Bing APIへの接続が続けて失敗しているため呼び出しを省略しました"
+            )
+
+        async def call() -> Dict[str, Any]:
+            # 再試行もレート制限の対象にする（待ち時間は bing_search とは別に計測する）
+            async with span("bing_rate_limit_wait"):
+                await self.rate_limiter.acquire()
+            async with self._get_session().get(
+                self.config.search_url, headers=headers, params=params
+            ) as response:
+                response.raise_for_status()
+                return await response.json()
+
+        logger.info("APIを呼び出し: %s", query)
+        try:
+            async with span("bing_search", source="api"):
+                result = await retry_async(call, self.retry, name="bing")
+        except Exception as e:
+            if is_retryable_exception(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except BaseException:
+            # キャンセルされた場合は結果を記録せずに試行を終える
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+
+        self.cache.set(query, count, mkt, result)
+        return result
+
+    async def search_many(
+        self, queries: Iterable[Union[str, Dict[str, Any]]]
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        複数のクエリを並列に検索する（クエリ書き換えや複数マーケットの検索用）。
+
+        Parameters:
+            queries: クエリ文字列、または search() の引数（query, count, mkt）を持つ辞書
+
+        Returns:
+            list: クエリと同じ順序の検索結果。失敗したクエリは例外オブジェクトになる。
+        """
+        tasks = [
+            self.search(q) if isinstance(q, str) else self.search(**q) for q in queries
+        ]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        """セッションのクリーンアップ"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
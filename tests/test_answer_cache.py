@@ -0,0 +1,23 @@
+from src.answer_cache import AnswerCache, loose_query
+
+
+def test_loose_query_only_ignores_trailing_punctuation():
+    assert loose_query("東京の天気は？") == loose_query("東京の天気は")
+    assert loose_query("What is Python ?") == loose_query("what   is python")
+    assert loose_query("ＡＢＣとは") == loose_query("abcとは")
+
+
+def test_loose_query_keeps_operators_and_word_boundaries():
+    for a, b in (
+        ("C++ tutorial", "C tutorial"),
+        ("a-b", "ab"),
+        ("1+1", "11"),
+        ("東京 の天気", "東京の天気"),
+        ("price > 100", "price 100"),
+    ):
+        assert loose_query(a) != loose_query(b)
+
+
+def test_near_duplicates_are_opt_in(tmp_path):
+    assert not AnswerCache(cache_dir=tmp_path).near_duplicates
+    assert not AnswerCache.from_config({"cache_dir": tmp_path}).near_duplicates
@@ -0,0 +1,39 @@
+from src.cache import DiskCache
+
+
+def _summed_size(cache: DiskCache) -> int:
+    conn = cache._connect()
+    return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+def test_total_size_tracks_sets_overwrites_and_deletes(tmp_path):
+    cache = DiskCache(tmp_path)
+    cache.set("a", b"x" * 100)
+    cache.set("b", b"x" * 50)
+    cache.set("a", b"x" * 10)  # 上書きは差分だけ増減する
+    cache.delete("b")
+    assert cache.total_size() == 10 == _summed_size(cache)
+
+
+def test_total_size_survives_reopen(tmp_path):
+    DiskCache(tmp_path).set("a", b"x" * 100)
+    assert DiskCache(tmp_path).total_size() == 100
+
+
+def test_evicts_least_recently_used_over_limit(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=250)
+    for key in ("a", "b", "c"):
+        cache.set(key, b"x" * 100)
+    assert cache.get("a") is None
+    assert cache.get("b") is not None and cache.get("c") is not None
+    assert cache.total_size() == 200 == _summed_size(cache)
+
+
+def test_recent_reads_do_not_write_the_index(tmp_path):
+    cache = DiskCache(tmp_path)
+    cache.set("a", b"value")
+    conn = cache._connect()
+    before = conn.total_changes
+    for _ in range(10):
+        assert cache.get("a") == b"value"
+    assert conn.total_changes == before
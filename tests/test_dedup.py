@@ -0,0 +1,32 @@
+from src.dedup import SimHashIndex
+
+
+def test_save_writes_changes_incrementally(tmp_path):
+    path = tmp_path / "simhash_index.sqlite"
+    index = SimHashIndex(path, max_entries=2)
+    index.add("https://example.com/a", 1)
+    index.add("https://example.com/b", 2)
+    index.save()
+    index.add("https://example.com/c", 3)  # 最も古い a が削除される
+    index.save()
+
+    reloaded = SimHashIndex(path, max_entries=2)
+    assert reloaded.get("https://example.com/a") is None
+    assert reloaded.get("https://example.com/b") == 2
+    assert reloaded.get("https://example.com/c") == 3
+
+
+def test_known_duplicates_uses_saved_fingerprints(tmp_path):
+    path = tmp_path / "simhash_index.sqlite"
+    index = SimHashIndex(path)
+    index.add("https://example.com/a", 0b1111)
+    index.add("https://example.org/copy", 0b1110)
+    index.save()
+
+    reloaded = SimHashIndex(path)
+    urls = [
+        "https://example.com/a",
+        "https://example.net/new",
+        "https://example.org/copy",
+    ]
+    assert reloaded.known_duplicates(urls, max_distance=3) == {2: 0}
@@ -0,0 +1,43 @@
+from src.extraction import extract_content
+
+ARTICLE = "<p>" + "本文の段落です。" * 40 + "</p>"
+
+
+def _page(body: str) -> str:
+    return f"<html><head><title>t</title></head><body>{body}</body></html>"
+
+
+def test_modifier_classes_are_not_pruned():
+    for attrs in (
+        'class="layout has-sidebar"',
+        'class="entry-content share-buttons-enabled"',
+        'class="sticky-header-offset"',
+    ):
+        extracted = extract_content(_page(f"<div {attrs}>{ARTICLE}</div>"))
+        assert "本文の段落です。" in extracted.text, attrs
+
+
+def test_boilerplate_tokens_are_pruned():
+    html = _page(
+        f"<div>{ARTICLE}</div>"
+        '<div class="sidebar"><a href="/a">関連リンク</a></div>'
+        '<ul id="menu"><li><a href="/">ホーム</a></li></ul>'
+        '<div class="cookie-banner">Cookieを使用しています</div>'
+    )
+    text = extract_content(html).text
+    assert "本文の段落です。" in text
+    assert "関連リンク" not in text
+    assert "ホーム" not in text
+    assert "Cookie" not in text
+
+
+def test_element_holding_most_of_the_page_text_is_kept():
+    # 本文全体を包む要素のクラスが定型部分の名前に一致しても読み飛ばさない
+    html = _page(f'<div class="banner">{ARTICLE}</div><p>短い補足</p>')
+    assert "本文の段落です。" in extract_content(html).text
+
+
+def test_long_non_link_text_is_kept():
+    long_text = "<p>" + "サイドバーに置かれた長い解説文。" * 40 + "</p>"
+    html = _page(f'{ARTICLE}{ARTICLE}<div class="related">{long_text}</div>')
+    assert "長い解説文" in extract_content(html).text
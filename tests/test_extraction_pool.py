@@ -0,0 +1,38 @@
+import asyncio
+import os
+
+import pytest
+
+from src import extraction_pool
+from src.extraction_pool import ExtractionError, ExtractionPool
+
+PAGE = b"<html><head><title>Example</title></head><body><p>" + b"x" * 200 + b"</p>"
+
+
+def test_broken_worker_is_replaced():
+    async def run():
+        pool = ExtractionPool(workers=1, inline_bytes=0)
+        try:
+            await pool.extract(PAGE)
+            broken = pool.executor
+            # ワーカーを異常終了させてプールを壊す
+            with pytest.raises(Exception):
+                broken.submit(os._exit, 1).result()
+            recovered = await pool.extract(PAGE)
+            assert pool.executor is not broken
+            again = await pool.extract(PAGE)
+            return recovered, again
+        finally:
+            pool.shutdown()
+
+    recovered, again = asyncio.run(run())
+    assert recovered.title == again.title == "Example"
+
+
+def test_extraction_failures_raise_extraction_error(monkeypatch):
+    def fail(*args, **kwargs):
+        raise ValueError("壊れたHTML")
+
+    monkeypatch.setattr(extraction_pool, "extract_from_bytes", fail)
+    with pytest.raises(ExtractionError):
+        asyncio.run(ExtractionPool(workers=0).extract(PAGE))
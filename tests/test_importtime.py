@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+# クローラータイプ -> 読み込まれてはいけないモジュール
+CRAWLER_FORBIDDEN_MODULES = {
+    "firecrawl": ["scrapy", "twisted"],
+    "aiohttp": ["scrapy", "twisted"],
+}
+
+
+@pytest.mark.parametrize("crawler_type", sorted(CRAWLER_FORBIDDEN_MODULES))
+def test_crawler_does_not_import_other_backends(crawler_type):
+    forbidden = CRAWLER_FORBIDDEN_MODULES[crawler_type]
+    code = (
+        "import sys\n"
+        "from src.crawlers.crawler_factory import CrawlerFactory\n"
+        f"CrawlerFactory.create_crawler({crawler_type!r}, {{}})\n"
+        f"print(' '.join(m for m in {forbidden!r} if m in sys.modules))\n"
+    )
+    # インポート時に環境変数に依存しないことも確認するため、Bingの設定は外す
+    env = {k: v for k, v in os.environ.items() if not k.startswith("BING_SEARCH_V7")}
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.split() == []
@@ -0,0 +1,12 @@
+from src.ranking import estimate_tokens, select_chunks
+
+
+def test_per_source_budget_keeps_other_sources():
+    documents = ["python asyncio event loop " * 2000] + [
+        "python asyncio tutorial basics. " * 20 for _ in range(4)
+    ]
+    selected = select_chunks(
+        "python asyncio", documents, token_budget=3000, per_source_budget=500
+    )
+    assert sorted(selected) == [0, 1, 2, 3, 4]
+    assert sum(estimate_tokens(chunk) for chunk in selected[0]) <= 500
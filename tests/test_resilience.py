@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from src.crawlers.base_crawler import BaseCrawler, CrawlResult
+from src.crawlers.resilient_crawler import ResilientCrawler
+from src.resilience import BreakerRegistry, CircuitBreaker
+
+RESET_TIMEOUT = 0.05
+
+
+class HangingCrawler(BaseCrawler):
+    """応答しないクローラー（取得はキャンセルされるまで終わらない）"""
+
+    async def fetch_content(self, url, validators=None) -> CrawlResult:
+        await asyncio.sleep(10)
+        return CrawlResult(content="")
+
+    async def cleanup(self):
+        pass
+
+
+def _open(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    time.sleep(RESET_TIMEOUT * 2)
+
+
+def test_cancelled_half_open_probe_releases_the_breaker():
+    async def run():
+        breakers = BreakerRegistry(failure_threshold=1, reset_timeout=RESET_TIMEOUT)
+        crawler = ResilientCrawler(
+            HangingCrawler(), breakers=breakers, hedge_quantile=None
+        )
+        breaker = breakers.get("example.com")
+        _open(breaker)
+
+        task = asyncio.create_task(crawler.fetch_content("https://example.com/"))
+        await asyncio.sleep(0.01)
+        assert breaker.state == "half_open"
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return breaker
+
+    breaker = asyncio.run(run())
+    time.sleep(RESET_TIMEOUT * 2)
+    assert breaker.allow()
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=RESET_TIMEOUT)
+    _open(breaker)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_breaker_registry_evicts_closed_breakers_first():
+    breakers = BreakerRegistry(failure_threshold=1, max_entries=3)
+    breakers.get("down.example").record_failure()
+    for i in range(10):
+        breakers.get(f"host{i}.example")
+    assert len(breakers.breakers) == 3
+    assert breakers.open_keys() == {"down.example": "open"}
+    assert "host9.example" in breakers.breakers
+
+
+def test_latency_excludes_scheduler_queueing():
+    class QueuedCrawler(HangingCrawler):
+        async def fetch_content(self, url, validators=None) -> CrawlResult:
+            await asyncio.sleep(0.05)  # スケジューラーの待ち行列で待った時間
+            return CrawlResult(content="ok", metadata={"service_time": 0.001})
+
+    crawler = ResilientCrawler(QueuedCrawler(), hedge_quantile=None)
+    asyncio.run(crawler.fetch_content("https://example.com/"))
+    assert list(crawler.latency.samples) == [0.001]
@@ -0,0 +1,116 @@
+import asyncio
+
+from src.crawlers.base_crawler import BaseCrawler, CrawlResult
+from src.crawlers.scheduler import (
+    AdaptiveLimiter,
+    HostScheduler,
+    RobotsCache,
+    ScheduledCrawler,
+)
+
+
+def _scheduler() -> HostScheduler:
+    limiter = AdaptiveLimiter(initial=16, cooldown=0)
+    return HostScheduler(respect_robots=False, limiter=limiter)
+
+
+def test_cancelled_and_failed_fetches_keep_the_limit():
+    async def run():
+        scheduler = _scheduler()
+
+        async def hang(url):
+            async with scheduler.slot(url):
+                await asyncio.sleep(10)
+
+        for i in range(4):
+            task = asyncio.create_task(hang(f"https://example{i}.com/"))
+            await asyncio.sleep(0)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        try:
+            async with scheduler.slot("https://example.com/"):
+                raise ConnectionError("接続できません")
+        except ConnectionError:
+            pass
+        return scheduler.limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.limit == 16
+    assert limiter.inflight == 0
+
+
+def test_congestion_status_lowers_the_limit():
+    async def run():
+        scheduler = _scheduler()
+        async with scheduler.slot("https://example.com/") as slot:
+            slot.record(503)
+        return scheduler.limiter
+
+    assert asyncio.run(run()).limit == 8
+
+
+def test_idle_hosts_are_evicted_and_busy_hosts_kept():
+    async def run():
+        scheduler = HostScheduler(respect_robots=False, max_hosts=3)
+        busy = asyncio.Event()
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("https://busy.example/"):
+                busy.set()
+                await release.wait()
+
+        task = asyncio.create_task(hold())
+        await busy.wait()
+        for i in range(10):
+            async with scheduler.slot(f"https://host{i}.example/"):
+                pass
+        hosts = list(scheduler.hosts)
+        release.set()
+        await task
+        return hosts
+
+    hosts = asyncio.run(run())
+    assert len(hosts) == 3
+    assert "busy.example" in hosts
+    assert "host9.example" in hosts
+
+
+def test_robots_cache_is_bounded():
+    class LocalRobotsCache(RobotsCache):
+        async def _fetch(self, origin):
+            return None
+
+    async def run():
+        robots = LocalRobotsCache(max_entries=2)
+        for i in range(5):
+            await robots.get(f"https://host{i}.example")
+        return robots
+
+    robots = asyncio.run(run())
+    assert list(robots._parsers) == ["https://host3.example", "https://host4.example"]
+    assert not robots._locks
+
+
+def test_scheduled_crawler_reports_service_time():
+    class SlowCrawler(BaseCrawler):
+        async def fetch_content(self, url, validators=None) -> CrawlResult:
+            await asyncio.sleep(0.05)
+            return CrawlResult(content="ok", metadata={"status_code": 200})
+
+        async def cleanup(self):
+            pass
+
+    async def run():
+        scheduler = HostScheduler(respect_robots=False, per_host_limit=1)
+        crawler = ScheduledCrawler(SlowCrawler(), scheduler)
+        return await asyncio.gather(
+            crawler.fetch_content("https://example.com/a"),
+            crawler.fetch_content("https://example.com/b"),
+        )
+
+    first, second = asyncio.run(run())
+    # 2つ目は1つ目の取得を待つが、待ち時間は service_time に含まれない
+    assert first.metadata["service_time"] < 0.09
+    assert second.metadata["service_time"] < 0.09
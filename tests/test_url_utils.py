@@ -0,0 +1,32 @@
+from src.url_utils import canonicalize_url
+
+
+def test_tracking_params_and_variants_are_merged():
+    assert canonicalize_url(
+        "http://www.example.com/news/123/?utm_source=x&gclid=y&id=1"
+    ) == canonicalize_url("https://example.com/news/123?id=1")
+    assert canonicalize_url("https://example.com/news/123/amp") == canonicalize_url(
+        "https://example.com/news/123"
+    )
+    assert canonicalize_url("https://example.com/news/123.amp.html") == (
+        canonicalize_url("https://example.com/news/123.html")
+    )
+
+
+def test_content_selecting_params_are_kept():
+    for a, b in (
+        ("https://example.com/repo?ref=main", "https://example.com/repo?ref=dev"),
+        ("https://example.com/report?output=pdf", "https://example.com/report"),
+        ("https://example.com/data?outputtype=csv", "https://example.com/data"),
+        ("https://example.com/page?amp=1", "https://example.com/page"),
+    ):
+        assert canonicalize_url(a) != canonicalize_url(b)
+
+
+def test_amp_path_without_a_preceding_path_is_kept():
+    assert canonicalize_url("https://example.com/amp") != canonicalize_url(
+        "https://example.com/"
+    )
+    assert canonicalize_url("https://example.com/amp/guide") != canonicalize_url(
+        "https://example.com/guide"
+    )